@@ -12,7 +12,8 @@ from web3.gas_strategies.time_based import medium_gas_price_strategy  #Transacti
 from web3.gas_strategies.time_based import fast_gas_price_strategy    #Transaction mined within 1 minutes
 from web3 import middleware
 
-web3 = Web3(HTTPProvider(config.eth_rpc))
+# web3 keeps the session alive for the endpoint, so only the timeout is required here
+web3 = Web3(HTTPProvider(config.eth_rpc, request_kwargs={'timeout': 60}))
 web3.eth.defaultAccount = config.account_address
 
 print("isConnected:", web3.isConnected())
@@ -0,0 +1,265 @@
+"""Author: Trinity Core Team 
+
+MIT License
+
+Copyright (c) 2018 Trinity
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+import json
+import time
+from threading import Condition, Event, Lock, Thread
+from websocket import create_connection, WebSocketTimeoutException
+from common.log import LOG
+from common.singleton import SingletonClass
+
+
+class BlockHeightCache(metaclass=SingletonClass):
+    """
+        Descriptions    : Block height shared by all of the subsystems in this process. The chain is only queried
+                          when the cached height is older than max_staleness seconds or fresh height is required.
+    """
+    def __init__(self, fetch_block_count, max_staleness=3):
+        """
+
+        :param fetch_block_count: callback to get the block count from the chain
+        :param max_staleness: seconds that the cached height could be used
+        """
+        self._fetch_block_count = fetch_block_count
+        self.max_staleness = max_staleness
+
+        self.block_height = None
+        self.updated_at = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = Lock()
+        self._fetch_lock = Lock()
+
+    def get(self, fresh=False):
+        """
+
+        :param fresh: True means the height MUST be fetched from the chain
+        :return: block height
+        """
+        if not fresh:
+            with self._lock:
+                if self.is_valid():
+                    self.hits += 1
+                    return self.block_height
+
+        # only one caller fetches from the chain, the others wait and reuse the result
+        with self._fetch_lock:
+            with self._lock:
+                if not fresh and self.is_valid():
+                    self.hits += 1
+                    return self.block_height
+                self.misses += 1
+
+            self.update(self._fetch_block_count())
+
+        return self.block_height
+
+    def update(self, block_height):
+        block_height = int(block_height)
+        with self._lock:
+            if self.block_height is None or block_height >= self.block_height:
+                self.block_height = block_height
+                self.updated_at = time.time()
+
+    def is_valid(self):
+        return self.block_height is not None and time.time() - self.updated_at <= self.max_staleness
+
+    @property
+    def statistics(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0
+        }
+
+
+class BlockHeadSource(metaclass=SingletonClass):
+    """
+        Descriptions    : Track the head of the chain and wake up the waiters once a new block is found.
+                          The heads are pushed by eth_subscribe("newHeads") if the websocket url is given.
+                          Otherwise, or if the subscription is lost, the heads are polled by HTTP, and the
+                          polling interval is backed off while the head is stable.
+    """
+    _subscribe_timeout = 30     # about 2 blocks. Refresh the head by HTTP if no head is pushed in this time
+
+    def __init__(self, fetch_block_count, ws_url=None, min_poll_interval=1, max_poll_interval=8,
+                 resubscribe_interval=60, on_new_head=None):
+        """
+
+        :param fetch_block_count: callback to get the block count from the chain
+        :param ws_url: websocket url of the full-node which supports eth_subscribe
+        :param min_poll_interval: polling interval in seconds once the head is changed
+        :param max_poll_interval: the max polling interval when the head is stable
+        :param resubscribe_interval: seconds to poll before trying to subscribe again
+        :param on_new_head: callback with the new block height
+        """
+        self._fetch_block_count = fetch_block_count
+        self._on_new_head = on_new_head
+        self.ws_url = ws_url
+        self.min_poll_interval = min_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.resubscribe_interval = resubscribe_interval
+
+        self.block_height = None
+        self.is_subscribed = False
+
+        self._conn = None
+        self._thread = None
+        self._stopped = Event()
+        self._condition = Condition()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stopped.clear()
+        self._thread = Thread(target=self.run, name='BlockHeadSource', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self.close()
+
+        # wake up all of the waiters
+        with self._condition:
+            self._condition.notify_all()
+
+    @property
+    def is_running(self):
+        return not self._stopped.is_set()
+
+    def update(self, block_height):
+        """
+        Description: record the new head and notify the waiters.
+        :param block_height:
+        :return: True if the head is changed
+        """
+        block_height = int(block_height)
+        with self._condition:
+            if self.block_height is not None and block_height <= self.block_height:
+                return False
+
+            self.block_height = block_height
+            self._condition.notify_all()
+
+        if self._on_new_head:
+            self._on_new_head(block_height)
+
+        return True
+
+    def wait_for_new_head(self, known_height=None, timeout=None):
+        """
+        Description: block the caller until the head is higher than the known_height.
+        :param known_height: the latest block height handled by caller
+        :param timeout: seconds to wait
+        :return: current head, None if no head has been found yet
+        """
+        def has_new_head():
+            if self._stopped.is_set():
+                return True
+            if self.block_height is None:
+                return False
+            return known_height is None or self.block_height > known_height
+
+        with self._condition:
+            self._condition.wait_for(has_new_head, timeout)
+            return self.block_height
+
+    def refresh(self):
+        try:
+            return self.update(self._fetch_block_count())
+        except Exception as error:
+            LOG.warning('Failed to get block count from the chain. Exception: {}'.format(error))
+            return False
+
+    def run(self):
+        while self.is_running:
+            if self.ws_url:
+                self.subscribe()
+                self.poll(self.resubscribe_interval)
+            else:
+                self.poll()
+
+    def subscribe(self):
+        try:
+            self._conn = create_connection(self.ws_url, timeout=self._subscribe_timeout)
+            self._conn.send(json.dumps({'jsonrpc': '2.0', 'id': 1,
+                                        'method': 'eth_subscribe', 'params': ['newHeads']}))
+            response = json.loads(self._conn.recv())
+            if not response.get('result'):
+                raise ValueError(response.get('error'))
+        except Exception as error:
+            LOG.warning('Failed to subscribe newHeads from {}. Exception: {}'.format(self.ws_url, error))
+            self.close()
+            return
+
+        LOG.info('Subscribed newHeads from {}'.format(self.ws_url))
+        self.is_subscribed = True
+
+        # to get the head which was produced before the subscription
+        self.refresh()
+        try:
+            while self.is_running:
+                try:
+                    message = json.loads(self._conn.recv())
+                except WebSocketTimeoutException:
+                    # subscription might be stale, so refresh the head by HTTP
+                    self.refresh()
+                    continue
+
+                head = message.get('params', {}).get('result', {})
+                if head.get('number'):
+                    self.update(int(head.get('number'), 16))
+        except Exception as error:
+            if self.is_running:
+                LOG.warning('Subscription of newHeads is lost. Exception: {}'.format(error))
+        finally:
+            self.is_subscribed = False
+            self.close()
+
+    def poll(self, duration=None):
+        """
+        Description: poll the head of chain until the duration is expired.
+        :param duration: seconds to poll, None means polling until stopped
+        :return:
+        """
+        end_time = time.time() + duration if duration else None
+        interval = self.min_poll_interval
+        while self.is_running and (end_time is None or time.time() < end_time):
+            if self.refresh():
+                interval = self.min_poll_interval
+            else:
+                # the head is stable, back off the polling
+                interval = min(interval * 2, self.max_poll_interval)
+
+            self._stopped.wait(interval)
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn:
+            try:
+                conn.close()
+            except Exception as error:
+                LOG.debug('Close subscription connection error: {}'.format(error))
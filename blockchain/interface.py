@@ -22,6 +22,8 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE."""
 from .web3client import Client
+from .block_head import BlockHeadSource, BlockHeightCache
+from .log_indexer import ContractEventDecoder
 from trinity import Configure
 from common.log import LOG
 from lightwallet.Settings import settings
@@ -37,8 +39,54 @@ NetUrl = Configure['BlockChain']['EthNetUrl']
 def send_raw(raw_data):
     return settings.EthClient.broadcast(raw_data)
 
-def get_block_count():
-    return settings.EthClient.get_block_count()
+def get_block_count(fresh=False):
+    """
+
+    :param fresh: True means bypassing the cached block height
+    :return: block height
+    """
+    return get_block_height_cache().get(fresh)
+
+
+def get_block_height_cache():
+    return BlockHeightCache(settings.EthClient.get_block_count,
+                            Configure['BlockChain'].get('BlockHeightMaxStaleness', 3))
+
+
+def get_block_head():
+    """
+    Description: the block head source shared in this process. newHeads are subscribed from settings.NODE_WS_URL
+                 if it is set, or polled from the chain.
+    :return: BlockHeadSource instance
+    """
+    return BlockHeadSource(lambda: get_block_count(fresh=True), settings.NODE_WS_URL,
+                           on_new_head=get_block_height_cache().update)
+
+
+_contract_event_decoder = None
+
+
+def get_contract_event_decoder():
+    """
+    Description: decoders of the Trinity contract events, compiled only once in this process.
+    :return: ContractEventDecoder instance
+    """
+    global _contract_event_decoder
+    if _contract_event_decoder is None:
+        _contract_event_decoder = ContractEventDecoder(settings.Eth_Contract_abi)
+
+    return _contract_event_decoder
+
+
+def get_contract_logs(from_block, to_block, topics=None):
+    """
+
+    :param from_block: first block of the range
+    :param to_block: last block of the range, included
+    :param topics: topic filters
+    :return: raw logs of the Trinity contract
+    """
+    return settings.EthClient.get_logs(from_block, to_block, settings.Eth_Contract_address, topics)
 
 
 def get_block(index):
@@ -66,6 +114,31 @@ def get_balance(address, asset_type, asset_address=None, asset_abi=None):
             return 0
 
 
+def get_balances(address, asset_type_list):
+    """
+    Description: get the balances of the assets by one batch request
+    :param address:
+    :param asset_type_list: asset symbols
+    :return: dict of asset symbol and balance
+    """
+    batch = settings.EthClient.batch()
+    index_of_assets = {}
+    for asset_type in asset_type_list:
+        if asset_type.upper() == "ETH":
+            index_of_assets[asset_type] = batch.get_balance_of_eth(address)
+        elif asset_type.upper() == "TNC":
+            index_of_assets[asset_type] = batch.get_balance_of_erc20(settings.TNC, settings.TNC_abi, address)
+
+    result = [None] * len(batch)
+    try:
+        result = batch.execute()
+    except Exception as e:
+        LOG.error(e)
+
+    return {asset_type: (result[index_of_assets[asset_type]] or 0) if asset_type in index_of_assets else 0
+            for asset_type in asset_type_list}
+
+
 def get_application_log(filter_id):
     return settings.EthClient.get_fitler_log(filter_id)
 
@@ -0,0 +1,264 @@
+"""Author: Trinity Core Team 
+
+MIT License
+
+Copyright (c) 2018 Trinity
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+import time
+from threading import Event, Lock, Thread
+from eth_abi import decode_abi
+from ethereum.utils import sha3
+from common.log import LOG
+
+
+class ContractEventDecoder(object):
+    """
+        Descriptions    : Decoders of the contract events, compiled from the abi once. The event is found by the first
+                          topic of the log, and the static arguments are converted from their 32-byte words directly,
+                          only the events with dynamic arguments are decoded by eth_abi.
+    """
+    def __init__(self, abi, events=None):
+        """
+
+        :param abi: abi of the contract
+        :param events: names of the events to decode, all events of the abi by default
+        """
+        self._decoders = {}     # topic of the event: (event name, decoder)
+        for item in abi:
+            if 'event' != item.get('type') or item.get('anonymous'):
+                continue
+            if events and item.get('name') not in events:
+                continue
+
+            inputs = item.get('inputs', [])
+            signature = '{}({})'.format(item.get('name'), ','.join(arg.get('type') for arg in inputs))
+            topic = '0x' + sha3(signature.encode()).hex()
+            self._decoders[topic] = (item.get('name'), self.compile(inputs))
+
+    @property
+    def topics(self):
+        return list(self._decoders.keys())
+
+    def decode(self, log):
+        """
+
+        :param log: raw log whose topics and data are hex strings
+        :return: event name, {argument name: value}. None if the log is not one of the events
+        """
+        topics = log.get('topics') or []
+        decoder = self._decoders.get(topics[0].lower()) if topics else None
+        if decoder is None:
+            return None
+
+        name, decode = decoder
+        return name, decode(topics[1:], log.get('data', '0x')[2:])
+
+    @classmethod
+    def compile(cls, inputs):
+        """
+        Description: build the decoder of the event arguments
+        :param inputs: inputs of the event in the abi
+        :return: callback to decode (indexed topics, hex data without '0x')
+        """
+        indexed = [(arg.get('name'), cls.converter_of(arg.get('type'), True))
+                   for arg in inputs if arg.get('indexed')]
+        names = [arg.get('name') for arg in inputs if not arg.get('indexed')]
+        types = [arg.get('type') for arg in inputs if not arg.get('indexed')]
+        converters = [cls.converter_of(arg_type) for arg_type in types]
+
+        if all(converters):
+            def decode_data(data):
+                return [convert(data[64*index:64*(index+1)]) for index, convert in enumerate(converters)]
+        else:
+            def decode_data(data):
+                return decode_abi(types, bytes.fromhex(data))
+
+        def decode(topics, data):
+            args = {name: convert(topic[2:]) for (name, convert), topic in zip(indexed, topics)}
+            args.update(zip(names, decode_data(data)))
+            return args
+
+        return decode
+
+    @staticmethod
+    def converter_of(arg_type, indexed=False):
+        """
+
+        :param arg_type: solidity type of the argument
+        :param indexed: the indexed dynamic argument is the hash of its value
+        :return: callback to convert one 32-byte word in hex, None if the type is dynamic
+        """
+        if 'address' == arg_type:
+            return lambda word: '0x' + word[24:]
+        elif 'bool' == arg_type:
+            return lambda word: 0 != int(word, 16)
+        elif arg_type.startswith('uint') and '[' not in arg_type:
+            return lambda word: int(word, 16)
+        elif arg_type.startswith('int') and '[' not in arg_type:
+            return lambda word: int(word, 16) - (1 << 256) if '8' <= word[0] else int(word, 16)
+        elif arg_type.startswith('bytes') and arg_type[5:].isdigit():
+            size = int(arg_type[5:])
+            return lambda word: '0x' + word[:2*size]
+        elif indexed:
+            return lambda word: '0x' + word
+
+        return None
+
+
+class ContractLogIndexer(object):
+    """
+        Descriptions    : Follow the logs of the contract events in this process. The logs are fetched by eth_getLogs
+                          in fixed-size block ranges, so catching up after downtime costs a bounded number of queries.
+                          Only the blocks which are reorg_depth blocks behind the head are indexed, and the handled
+                          block is persisted as the cursor once its range is handled.
+    """
+    _retry_interval = 5     # seconds to wait before retrying the failed range
+    _idle_timeout = 15      # the max seconds to wait for a new block
+
+    def __init__(self, decoder, fetch_logs, load_cursor, save_cursor, on_event, window=1000, reorg_depth=6):
+        """
+
+        :param decoder: ContractEventDecoder instance
+        :param fetch_logs: callback to get the raw logs of (from block, to block, topics)
+        :param load_cursor: callback to get the last handled block, None if the indexer has never run
+        :param save_cursor: callback to persist the last handled block
+        :param on_event: called with (log block height, event name, decoded arguments, raw log)
+        :param window: blocks queried by one eth_getLogs
+        :param reorg_depth: blocks behind the head that the logs could be regarded as final
+        """
+        self.decoder = decoder
+        self._fetch_logs = fetch_logs
+        self._load_cursor = load_cursor
+        self._save_cursor = save_cursor
+        self._on_event = on_event
+        self.window = max(int(window), 1)
+        self.reorg_depth = max(int(reorg_depth), 0)
+
+        self.cursor = None
+        self._lock = Lock()
+        self._thread = None
+        self._stopped = Event()
+
+        self.queries = 0
+        self.events = 0
+        self.errors = 0
+        self.last_query_time = 0
+
+    def start(self, block_head):
+        """
+
+        :param block_head: BlockHeadSource instance which wakes up the indexer for new blocks
+        :return:
+        """
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stopped.clear()
+        self._thread = Thread(target=self.run, args=(block_head,), name='ContractLogIndexer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    @property
+    def is_running(self):
+        return not self._stopped.is_set()
+
+    def run(self, block_head):
+        known_height = None
+        while self.is_running:
+            block_height = block_head.wait_for_new_head(known_height, self._idle_timeout)
+            if not (block_height and self.is_running):
+                continue
+
+            try:
+                self.update(block_height)
+                known_height = block_height
+            except Exception as error:
+                self.errors += 1
+                LOG.warning('Failed to index the contract logs at block<{}>. Exception: {}'.format(block_height, error))
+                self._stopped.wait(self._retry_interval)
+
+    def update(self, block_height):
+        """
+        Description: handle the logs of the blocks between the cursor and the final block of the chain.
+        :param block_height: current block height of the chain
+        :return: count of the handled events
+        """
+        final_block = int(block_height) - self.reorg_depth
+        handled = 0
+        with self._lock:
+            if self.cursor is None:
+                self.cursor = self._load_cursor()
+                if self.cursor is None:
+                    # never run before, so start following the chain from the final block
+                    LOG.info('Contract log indexer starts at block<{}>'.format(final_block))
+                    self.cursor = final_block
+                    self._save_cursor(final_block)
+                    return handled
+
+            while self.cursor < final_block and self.is_running:
+                from_block = self.cursor + 1
+                to_block = min(from_block + self.window - 1, final_block)
+                handled += self.handle_range(from_block, to_block)
+
+                # the range is handled, move the cursor even if some handlers failed. If the cursor isn't saved,
+                # the range is fetched again by next update
+                self._save_cursor(to_block)
+                self.cursor = to_block
+
+        return handled
+
+    def handle_range(self, from_block, to_block):
+        started_at = time.time()
+        logs = self._fetch_logs(from_block, to_block, [self.decoder.topics])
+        self.queries += 1
+        self.last_query_time = time.time() - started_at
+
+        handled = 0
+        for log in sorted(logs, key=lambda item: (item.get('blockNumber'), item.get('logIndex'))):
+            # the logs of the orphaned blocks are marked as removed by the node
+            if log.get('removed'):
+                continue
+
+            try:
+                decoded = self.decoder.decode(log)
+                if decoded is None:
+                    continue
+
+                self._on_event(log.get('blockNumber'), *decoded, log)
+                handled += 1
+            except Exception as error:
+                self.errors += 1
+                LOG.exception('Failed to handle the contract log {}. Exception: {}'.format(log, error))
+
+        self.events += handled
+        LOG.debug('Handled {} contract events in blocks {}-{}'.format(handled, from_block, to_block))
+        return handled
+
+    @property
+    def statistics(self):
+        return {
+            'cursor': self.cursor,
+            'queries': self.queries,
+            'events': self.events,
+            'errors': self.errors,
+            'last_query_time': self.last_query_time
+        }
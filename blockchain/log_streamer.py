@@ -0,0 +1,176 @@
+"""Author: Trinity Core Team 
+
+MIT License
+
+Copyright (c) 2018 Trinity
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+import json
+import time
+from collections import OrderedDict
+from .log_indexer import ContractLogIndexer
+from common.log import LOG
+
+
+class LogStreamer(object):
+    """
+        Descriptions    : Publish the contract events to a redis channel. The logs are indexed by ContractLogIndexer,
+                          and the messages of each block range are published with the cursor by one redis
+                          transaction, so the cursor never moves ahead of the published messages after restart.
+                          The published logs are remembered by (transaction hash, log index) in a bounded set, and a
+                          range fetched again is never published twice.
+    """
+    def __init__(self, redis_client, decoder, fetch_logs, format_message, channel='monitor', cursor_key=None,
+                 window=1000, confirmations=6, capacity=10000, publish_retries=3):
+        """
+
+        :param redis_client: redis client
+        :param decoder: ContractEventDecoder instance
+        :param fetch_logs: callback to get the raw logs of (from block, to block, topics)
+        :param format_message: callback to build the message dict of (event name, decoded arguments, raw log),
+                               the event is not published if None is returned
+        :param channel: redis channel to publish the messages
+        :param cursor_key: redis key to persist the cursor
+        :param window: blocks queried by one eth_getLogs
+        :param confirmations: blocks behind the head that the logs are published
+        :param capacity: the count of the published logs remembered
+        :param publish_retries: times to publish the messages before the range is fetched again
+        """
+        self._redis = redis_client
+        self._format_message = format_message
+        self.channel = channel
+        self.cursor_key = cursor_key or '{}:cursor'.format(channel)
+        self.capacity = capacity
+        self.publish_retries = max(int(publish_retries), 1)
+
+        self.indexer = ContractLogIndexer(decoder, fetch_logs, self.load_cursor, self.save_cursor, self.on_event,
+                                          window, confirmations)
+
+        self._pending = []                  # messages of the range which are not published yet
+        self._published = OrderedDict()     # (transaction hash, log index): None
+        self._started_at = time.time()
+        self._block_head = None
+        self.block_height = None
+
+        self.published = 0
+        self.duplicated = 0
+        self.publish_failures = 0
+
+    def start(self, block_head):
+        self._block_head = block_head
+        self.indexer.start(block_head)
+
+    def stop(self):
+        self.indexer.stop()
+
+    def update(self, block_height):
+        """
+        Description: publish the events of the blocks confirmed by the new head.
+        :param block_height: current block height of the chain
+        :return: count of the indexed events, including the duplicated ones
+        """
+        self.block_height = int(block_height)
+        return self.indexer.update(block_height)
+
+    def load_cursor(self):
+        cursor = self._redis.get(self.cursor_key)
+        return int(cursor) if cursor is not None else None
+
+    def on_event(self, block_height, event_name, args, log):
+        key = (log.get('transactionHash'), log.get('logIndex'))
+        if key in self._published:
+            self.duplicated += 1
+            return
+
+        message = self._format_message(event_name, args, log)
+        if message is None:
+            return
+
+        self._pending.append((key, json.dumps(message)))
+
+    def save_cursor(self, block):
+        """
+        Description: publish the pending messages and move the cursor in one transaction.
+        :param block: the last block of the handled range
+        :return:
+        """
+        for retry in range(self.publish_retries):
+            try:
+                pipeline = self._redis.pipeline(transaction=True)
+                for _, message in self._pending:
+                    pipeline.publish(self.channel, message)
+                pipeline.set(self.cursor_key, block)
+                pipeline.execute()
+                break
+            except Exception as error:
+                if self.is_cursor_saved(block):
+                    # the transaction was executed by redis, but its reply is lost
+                    LOG.warning('Reply of publishing {} messages is lost, but the cursor is saved. Exception: {}'
+                                .format(len(self._pending), error))
+                    break
+
+                self.publish_failures += 1
+                LOG.warning('Failed to publish {} messages to redis. Exception: {}'.format(len(self._pending), error))
+                if retry + 1 >= self.publish_retries:
+                    # the range is fetched and the messages are built again by next update
+                    self._pending.clear()
+                    raise
+                time.sleep(2 ** retry)
+
+        for key, _ in self._pending:
+            self._published[key] = None
+            if len(self._published) > self.capacity:
+                self._published.popitem(last=False)
+
+        self.published += len(self._pending)
+        self._pending.clear()
+
+    def is_cursor_saved(self, block):
+        """
+        Description: the cursor is only moved with the published messages, and it's before the range being published.
+        :param block: the last block of the range
+        :return: True if the cursor has been moved to the block
+        """
+        try:
+            cursor = self.load_cursor()
+        except Exception as error:
+            LOG.warning('Failed to load the cursor from redis. Exception: {}'.format(error))
+            return False
+
+        return cursor is not None and cursor >= int(block)
+
+    @property
+    def statistics(self):
+        block_height = self.block_height
+        if self._block_head and self._block_head.block_height:
+            block_height = self._block_head.block_height
+
+        cursor = self.indexer.cursor
+        elapsed = time.time() - self._started_at
+        statistics = {
+            'cursor': cursor,
+            'lag': block_height - cursor if block_height is not None and cursor is not None else None,
+            'published': self.published,
+            'published_per_second': self.published / elapsed if elapsed else 0,
+            'duplicated': self.duplicated,
+            'publish_failures': self.publish_failures,
+        }
+        statistics.update({'index_{}'.format(key): value for key, value in self.indexer.statistics.items()
+                           if 'cursor' != key})
+        return statistics
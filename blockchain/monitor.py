@@ -21,10 +21,14 @@ AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
 LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE."""
-import time
 from wallet.event import event_machine
-from blockchain.interface import get_block_count
+from blockchain.interface import get_block_head, get_contract_event_decoder, get_contract_logs
+from blockchain.log_indexer import ContractLogIndexer
 from wallet.event.chain_event import ws_instance
+from model.log_cursor_model import APILogCursor
+from lightwallet.Settings import settings
+from trinity import Configure
+from common.log import LOG
 
 
 class EventMonitor(object):
@@ -33,10 +37,14 @@ class EventMonitor(object):
     Wallet_Change = False
     BlockHeight = None
     BlockPause = False
+    IdleTimeout = 15    # the max seconds to wait for a new block
+    LogIndexer = None
 
     @classmethod
     def stop_monitor(cls):
         cls.GoOn = False
+        cls.stop_log_indexer()
+        get_block_head().stop()
 
     @classmethod
     def start_monitor(cls, wallet):
@@ -51,6 +59,38 @@ class EventMonitor(object):
                 print('No wallet is opened')
                 pass
 
+            cls.start_log_indexer(wallet.address)
+
+    @classmethod
+    def start_log_indexer(cls, wallet_address):
+        """
+        Description: index the Trinity contract events of the wallet locally. The cursor is saved for each wallet, so
+                     the events happened while the wallet is closed are found by catching up when it's opened again.
+        :param wallet_address:
+        :return:
+        """
+        cls.stop_log_indexer()
+
+        name = '{}:{}'.format(settings.Eth_Contract_address, wallet_address).lower()
+        config = Configure['BlockChain']
+        cls.LogIndexer = ContractLogIndexer(get_contract_event_decoder(), get_contract_logs,
+                                            lambda: APILogCursor.query_cursor(name),
+                                            lambda block: APILogCursor.update_cursor(name, block),
+                                            ws_instance.handle_indexed_event,
+                                            config.get('LogIndexerWindow', 1000),
+                                            config.get('LogIndexerReorgDepth', 6))
+        cls.LogIndexer.start(get_block_head())
+        ws_instance.chain_events_indexed = True
+
+    @classmethod
+    def stop_log_indexer(cls):
+        log_indexer, cls.LogIndexer = cls.LogIndexer, None
+        if log_indexer:
+            log_indexer.stop()
+
+        # the chain events are handled from the event server again until the indexer of next wallet is started
+        ws_instance.chain_events_indexed = False
+
     @classmethod
     def update_wallet_block_height(cls, height):
         if cls.Wallet_Change:
@@ -80,60 +120,56 @@ class EventMonitor(object):
         return cls.BlockHeight if cls.BlockHeight else 1
 
 
+def sync_wallet_block_height(blockheight_onchain):
+    """
+    Description: move the wallet block height one step towards the chain.
+    :param blockheight_onchain:
+    :return: True if the wallet block height is still behind the chain
+    """
+    blockheight = EventMonitor.get_wallet_block_height()
+    block_delta = int(blockheight_onchain) - int(blockheight) if 1 != blockheight else 0
+    if 0 >= block_delta or EventMonitor.BlockPause:
+        return False
+
+    if block_delta < 2010:
+        blockheight += 1
+    else:
+        # use magic number
+        blockheight = int(blockheight_onchain) - 2000
+
+    EventMonitor.update_wallet_block_height(blockheight)
+    return blockheight < blockheight_onchain
+
+
 def monitorblock():
     """"""
-    old_blockheight_onchain = 0
+    block_head = get_block_head()
+    block_head.start()
+
+    blockheight_onchain = None
+    wallet_is_behind = False
     while EventMonitor.GoOn:
-        blockheight_onchain = get_block_count()
-        EventMonitor.update_block_height(blockheight_onchain)
-        blockheight = EventMonitor.get_wallet_block_height()
-        block_delta = int(blockheight_onchain) - int(blockheight) if 1 != blockheight else 0
-        need_update = block_delta > 0
-        execute_event_machine = old_blockheight_onchain != blockheight_onchain
-
-        # reset event machine
-        event_machine.reset_polling()
-
-        end_time = time.time() + 15 # sleep 15 second according to the chain update block time
-        trigger_per_block = False
-        while True:
-            try:
-                if 0 < block_delta < 2010:
-                    if EventMonitor.BlockPause:
-                        pass
-                    else:
-                        blockheight += 1
-                        if blockheight > blockheight_onchain:
-                            need_update = False
-
-                elif 2010 <= block_delta and need_update:
-                    # use magic number
-                    blockheight = int(blockheight_onchain) - 2000
-
-                    # only update per 15 seconds when the delta is verify large
-                    trigger_per_block = True
-                    need_update = False
-
-                # update wallet block height
-                if need_update or trigger_per_block:
-                    EventMonitor.update_wallet_block_height(blockheight)
-
-                # only execute the event machine when the block chain height is updated
-                if execute_event_machine:
-                    event_machine.handle(blockheight_onchain)
-            except Exception as error:
-                pass
-            finally:
-                # check whether the wallet is updated and the event is pooled
-                if need_update is False and (event_machine.is_polling_finished or execute_event_machine is False):
-                    left_loop_time = end_time - time.time()
-                    # suspend this thread until timeout
-                    time.sleep(left_loop_time)
-                else:
-                    # poll per 100 ms
-                    time.sleep(0.1)
-
-                # exit this loop for this blockheight
-                if end_time - time.time() <= 0.15:  # 150 ms
-                    old_blockheight_onchain = blockheight_onchain
-                    break
+        try:
+            # wake up immediately once a new block is found, or poll the pending jobs per 100 ms
+            if wallet_is_behind or not event_machine.is_polling_finished:
+                timeout = 0.1
+            else:
+                timeout = EventMonitor.IdleTimeout
+            blockheight = block_head.wait_for_new_head(blockheight_onchain, timeout)
+            if not (blockheight and EventMonitor.GoOn):
+                continue
+
+            if blockheight != blockheight_onchain:
+                blockheight_onchain = blockheight
+                EventMonitor.update_block_height(blockheight_onchain)
+
+                # reset event machine for the new block
+                event_machine.reset_polling()
+
+            # update wallet block height
+            wallet_is_behind = sync_wallet_block_height(blockheight_onchain)
+
+            # execute the event machine until all events are polled for this block height
+            event_machine.handle(blockheight_onchain)
+        except Exception as error:
+            LOG.exception('monitorblock exception: {}'.format(error))
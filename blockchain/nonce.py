@@ -0,0 +1,120 @@
+"""Author: Trinity Core Team 
+
+MIT License
+
+Copyright (c) 2018 Trinity
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+from threading import Lock
+from common.log import LOG
+from common.singleton import SingletonClass
+
+
+class NonceManager(metaclass=SingletonClass):
+    """
+        Descriptions    : Allocate the nonce of outgoing transactions locally for each address.
+                          The nonce is seeded from the chain once, then handed out atomically. The allocated nonces
+                          are pending until the node accepts or rejects the transaction.
+    """
+    _nonce_errors = ('nonce too low', 'known transaction', 'replacement transaction underpriced')
+
+    def __init__(self, fetch_transaction_count):
+        """
+
+        :param fetch_transaction_count: callback(address, block_identifier) to get transaction count from the chain
+        """
+        self._fetch_transaction_count = fetch_transaction_count
+        self._lock = Lock()
+
+        self._next_nonce = {}   # address: next nonce to be allocated
+        self._pending = {}      # address: set of nonces allocated but not accepted by the node
+
+    def allocate(self, address):
+        """
+        Description: hand out the next nonce of the address
+        :param address: checksum address of the sender
+        :return: nonce
+        """
+        with self._lock:
+            if address not in self._next_nonce:
+                self._sync(address)
+
+            pending = self._pending.setdefault(address, set())
+            nonce = self._next_nonce[address]
+            # skip the nonces still being sent by others after resync
+            while nonce in pending:
+                nonce += 1
+
+            self._next_nonce[address] = nonce + 1
+            pending.add(nonce)
+
+            return nonce
+
+    def commit(self, address, nonce):
+        """
+        Description: the transaction with this nonce is accepted by the node
+        """
+        with self._lock:
+            self._pending.get(address, set()).discard(nonce)
+
+    def release(self, address, nonce, error=None):
+        """
+        Description: the transaction with this nonce is not accepted by the node.
+        :param address: checksum address of the sender
+        :param nonce: the allocated nonce
+        :param error: the exception raised by the node
+        :return:
+        """
+        with self._lock:
+            self._pending.get(address, set()).discard(nonce)
+
+            if error is None or not self.is_nonce_error(error):
+                if self._next_nonce.get(address) == nonce + 1:
+                    # nobody allocated any nonce after this one, just roll back
+                    self._next_nonce[address] = nonce
+                    return
+
+            # the nonce is used by others, or gap is left behind
+            self._sync(address)
+
+    def resync(self, address):
+        with self._lock:
+            self._sync(address)
+
+    def pending_nonces(self, address):
+        with self._lock:
+            return sorted(self._pending.get(address, set()))
+
+    @classmethod
+    def is_nonce_error(cls, error):
+        message = str(error).lower()
+        return any(nonce_error in message for nonce_error in cls._nonce_errors)
+
+    def _sync(self, address):
+        """
+        Description: MUST be called with the lock held.
+        """
+        nonce = self._fetch_transaction_count(address, 'pending')
+        LOG.debug('Sync nonce of {} from the chain: {}, pending nonces: {}'.format(
+            address, nonce, self._pending.get(address)))
+
+        self._next_nonce[address] = nonce
+        # the nonces lower than the chain's are used already
+        if address in self._pending:
+            self._pending[address] = set(filter(lambda pending: pending >= nonce, self._pending[address]))
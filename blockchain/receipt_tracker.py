@@ -0,0 +1,270 @@
+"""Author: Trinity Core Team 
+
+MIT License
+
+Copyright (c) 2018 Trinity
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+from collections import OrderedDict
+from enum import IntEnum
+from threading import Lock
+from common.log import LOG
+
+
+class EnumReceiptState(IntEnum):
+    UNKNOWN = 0         # the transaction isn't watched
+    PENDING = 0x10      # not mined, or mined but not confirmed enough
+    CONFIRMED = 0x20    # mined and confirmed by enough blocks, the receipt is final
+    DROPPED = 0x30      # not found, and its nonce is used by another transaction, so it should be sent again
+
+
+class ReceiptTracker(object):
+    """
+        Descriptions    : Track the receipts of the transactions sent by this wallet. The receipts of all pending
+                          transactions are fetched by one batch request for each new block, and the final receipts are
+                          cached, so the load of the node is in proportion to the blocks instead of the transactions.
+                          The watchers are notified once the transaction is confirmed or dropped.
+                          The node behind a load balancer might not find the transaction which is still in the pools
+                          of other nodes, so the transaction is regarded as dropped only when its nonce is used by
+                          another mined transaction. Otherwise it's still pending, since a new transaction with a
+                          fresh nonce might be mined together with the old one.
+    """
+    def __init__(self, fetch_receipts, fetch_transactions, fetch_transaction_count=None, confirmations=1,
+                 drop_after=20, capacity=4096):
+        """
+
+        :param fetch_receipts: callback to get the receipts of the transaction list, None if not mined. It raises if
+                               any receipt isn't got, such as rate limited, which is never regarded as not mined
+        :param fetch_transactions: callback to get the transactions of the transaction list, None if not found. It
+                                   raises if any transaction isn't got
+        :param fetch_transaction_count: callback(address, block_identifier) to get the transaction count of the sender.
+                                        The transaction is never regarded as dropped without it.
+        :param confirmations: blocks to confirm the transaction, including the block which includes it
+        :param drop_after: blocks that the transaction isn't found by the node before its nonce is checked
+        :param capacity: the count of the final receipts cached
+        """
+        self._fetch_receipts = fetch_receipts
+        self._fetch_transactions = fetch_transactions
+        self._fetch_transaction_count = fetch_transaction_count
+        self.confirmations = confirmations
+        self.drop_after = drop_after
+        self.capacity = capacity
+
+        self._pending = OrderedDict()   # tx hash: {'receipt', 'missing_since', 'sender', 'nonce', 'callbacks'}
+        self._final = OrderedDict()     # tx hash: (state, receipt)
+        self._lock = Lock()
+        self._block_height = None
+
+        self.batches = 0
+        self.confirmed = 0
+        self.dropped = 0
+
+    def watch(self, tx_hash, callback=None, key=None):
+        """
+        Description: track the transaction until it is confirmed or dropped. Watching the same transaction again with
+                     the same key doesn't add the callback again. The finished transaction isn't watched again, and
+                     the callback isn't called for it, since the watcher could get its receipt by get().
+        :param tx_hash: transaction id begins with '0x'
+        :param callback: called with (tx hash, state, receipt) once the transaction is confirmed or dropped
+        :param key: identity of the callback, the callback itself by default
+        :return: state of the transaction
+        """
+        if not tx_hash:
+            return EnumReceiptState.UNKNOWN
+
+        with self._lock:
+            final = self._final.get(tx_hash)
+            if final is not None:
+                return final[0]
+
+            watcher = self._pending.setdefault(tx_hash, {'receipt': None, 'missing_since': None, 'sender': None,
+                                                         'nonce': None, 'callbacks': {}})
+            if callback:
+                watcher['callbacks'].setdefault(key or callback, callback)
+
+            return EnumReceiptState.PENDING
+
+    def unwatch(self, tx_hash):
+        with self._lock:
+            self._pending.pop(tx_hash, None)
+
+    def get(self, tx_hash):
+        """
+        :param tx_hash:
+        :return: state, receipt
+        """
+        with self._lock:
+            if tx_hash in self._final:
+                return self._final[tx_hash]
+
+            watcher = self._pending.get(tx_hash)
+            if watcher is None:
+                return EnumReceiptState.UNKNOWN, None
+
+            return EnumReceiptState.PENDING, watcher['receipt']
+
+    def update(self, block_height):
+        """
+        Description: check all pending transactions for the new block.
+        :param block_height: current block height of the chain
+        :return:
+        """
+        block_height = int(block_height)
+        with self._lock:
+            if self._block_height is not None and block_height <= self._block_height:
+                return
+            self._block_height = block_height
+            hash_list = list(self._pending.keys())
+
+        if not hash_list:
+            return
+
+        try:
+            receipts = self._fetch_receipts(hash_list)
+            self.batches += 1
+            missing = [tx_hash for tx_hash, receipt in zip(hash_list, receipts) if not receipt]
+            # only the transactions without receipt are looked up for dropping
+            found = self._fetch_transactions(missing) if missing else []
+            self.batches += 1 if missing else 0
+        except Exception as error:
+            LOG.warning('Failed to get the receipts of the pending transactions. Exception: {}'.format(error))
+            return
+
+        finished = []
+        suspects = []
+        found = dict(zip(missing, found))
+        with self._lock:
+            for tx_hash, receipt in zip(hash_list, receipts):
+                watcher = self._pending.get(tx_hash)
+                if watcher is None:
+                    continue
+
+                # the receipt might be removed by chain reorganization, so it's always refreshed
+                watcher['receipt'] = receipt
+                self._record_sender(watcher, found.get(tx_hash))
+                state = self._state_of(block_height, watcher, receipt, tx_hash in found and not found.get(tx_hash))
+                if EnumReceiptState.DROPPED == state:
+                    # the nonce is checked out of the lock
+                    suspects.append((tx_hash, watcher['sender'], watcher['nonce']))
+                elif EnumReceiptState.CONFIRMED == state:
+                    self._pending.pop(tx_hash)
+                    self._finish(tx_hash, state, receipt)
+                    finished.append((tx_hash, state, receipt, watcher['callbacks'].values()))
+
+        dropped = self._filter_nonce_used(suspects)
+        with self._lock:
+            for tx_hash in dropped:
+                watcher = self._pending.pop(tx_hash, None)
+                if watcher is None:
+                    continue
+
+                self._finish(tx_hash, EnumReceiptState.DROPPED, None)
+                finished.append((tx_hash, EnumReceiptState.DROPPED, None, watcher['callbacks'].values()))
+
+        for tx_hash, state, receipt, callbacks in finished:
+            for callback in callbacks:
+                try:
+                    callback(tx_hash, state, receipt)
+                except Exception as error:
+                    LOG.exception('Receipt watcher of {} error: {}'.format(tx_hash, error))
+
+    def _state_of(self, block_height, watcher, receipt, is_not_found):
+        if receipt:
+            watcher['missing_since'] = None
+            block_number = receipt.get('blockNumber')
+            if block_number is not None and block_height - int(block_number) + 1 >= self.confirmations:
+                return EnumReceiptState.CONFIRMED
+            return EnumReceiptState.PENDING
+
+        if not is_not_found:
+            # still in the pool of the node
+            watcher['missing_since'] = None
+            return EnumReceiptState.PENDING
+
+        if watcher['missing_since'] is None:
+            watcher['missing_since'] = block_height
+        elif block_height - watcher['missing_since'] >= self.drop_after:
+            return EnumReceiptState.DROPPED
+
+        return EnumReceiptState.PENDING
+
+    @staticmethod
+    def _record_sender(watcher, transaction):
+        if transaction and transaction.get('from') and transaction.get('nonce') is not None:
+            nonce = transaction.get('nonce')
+            watcher['sender'] = transaction.get('from')
+            watcher['nonce'] = int(nonce, 16) if isinstance(nonce, str) else int(nonce)
+
+    def _filter_nonce_used(self, suspects):
+        """
+        Description: the transaction not found is still able to be mined unless its nonce is used by another one.
+        :param suspects: list of (tx hash, sender, nonce) not found for drop_after blocks
+        :return: the transactions whose nonce is used by other mined transactions
+        """
+        dropped = []
+        transaction_counts = {}
+        for tx_hash, sender, nonce in suspects:
+            if not self._fetch_transaction_count or sender is None:
+                LOG.debug('Transaction {} is not found, but its nonce is unknown'.format(tx_hash))
+                continue
+
+            try:
+                if sender not in transaction_counts:
+                    transaction_counts[sender] = self._fetch_transaction_count(sender, 'latest')
+            except Exception as error:
+                LOG.warning('Failed to get the transaction count of {}. Exception: {}'.format(sender, error))
+                continue
+
+            if transaction_counts[sender] > nonce:
+                dropped.append(tx_hash)
+
+        if not dropped:
+            return dropped
+
+        # the transaction itself might be mined after its receipt was fetched
+        try:
+            receipts = self._fetch_receipts(dropped)
+            self.batches += 1
+        except Exception as error:
+            LOG.warning('Failed to get the receipts of the dropped transactions. Exception: {}'.format(error))
+            return []
+
+        return [tx_hash for tx_hash, receipt in zip(dropped, receipts) if not receipt]
+
+    def _finish(self, tx_hash, state, receipt):
+        if EnumReceiptState.CONFIRMED == state:
+            self.confirmed += 1
+        else:
+            self.dropped += 1
+            LOG.warning('Transaction {} is dropped'.format(tx_hash))
+
+        self._final[tx_hash] = (state, receipt)
+        while len(self._final) > self.capacity:
+            self._final.popitem(last=False)
+
+    @property
+    def statistics(self):
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'cached': len(self._final),
+                'confirmed': self.confirmed,
+                'dropped': self.dropped,
+                'batches': self.batches,
+            }
@@ -1,10 +1,16 @@
 import binascii
 import requests
+import time
+from threading import Lock
 from ethereum.utils import ecsign, normalize_key, int_to_big_endian, checksum_encode
 from web3 import Web3, HTTPProvider
+from eth_abi import decode_abi
 from ethereum.utils import sha3, is_string, encode_hex, checksum_encode
-from trinity import GWEI_COEFFICIENT
+from trinity import GWEI_COEFFICIENT, Configure
 from common.log import LOG
+from common.exceptions import BatchRequestException
+from common.http_session import get_configured_http_session
+from .nonce import NonceManager
 from random import randint
 
 
@@ -27,20 +33,60 @@ def get_price_from_coincapmarket(asset_type):
     return res.get("data").get("quotes").get("CNY").get("price")
 
 
+class PooledHTTPProvider(HTTPProvider):
+    """
+        Descriptions    : HTTPProvider sending the requests through the shared keep-alive session
+    """
+    def __init__(self, endpoint_uri, session, request_kwargs=None):
+        super(PooledHTTPProvider, self).__init__(endpoint_uri, request_kwargs)
+        self.session = session
+
+    def make_request(self, method, params):
+        request_data = self.encode_rpc_request(method, params)
+        response = self.session.post(self.endpoint_uri, data=request_data, **self.get_request_kwargs())
+        response.raise_for_status()
+
+        return self.decode_rpc_response(response.content)
+
+
+def get_chain_session():
+    return get_configured_http_session('chain', Configure.get('HttpSession'))
+
+
 class Client(object):
 
     _gwei_coeficient = GWEI_COEFFICIENT
 
     def __init__(self, eth_url):
-        self.web3 = Web3(HTTPProvider(eth_url))
+        self.eth_url = eth_url
+        self.session = get_chain_session()
+        self.web3 = Web3(PooledHTTPProvider(eth_url, self.session))
+        # shared by all clients since the same address might send transactions through different clients
+        self.nonce_manager = NonceManager(self.web3.eth.getTransactionCount)
+
+        self._chain_id = None
+        # stage: (count, total seconds) of the transactions sent by contruct_transaction
+        self.stage_timings = {}
+        self._stage_timings_lock = Lock()
+
+    @property
+    def chain_id(self):
+        # chain id never changes, so query it only once
+        if self._chain_id is None:
+            self._chain_id = int(self.web3.version.network)
+        return self._chain_id
+
+    def construct_common_tx(self, addressFrom, addressTo, value, gasLimit=None, *, nonce):
+        """
 
-    def construct_common_tx(self, addressFrom, addressTo, value, gasLimit=None):
+        :param nonce: nonce allocated by nonce_manager. The caller releases it if the transaction isn't sent
+        """
         tx = {
             'gas': gasLimit if gasLimit else 4500000,
             'to': addressTo,
             'value': int(value*10**18),
             'gasPrice': self.web3.eth.gasPrice,
-            'nonce': self.web3.eth.getTransactionCount(addressFrom),
+            'nonce': nonce,
         }
         return tx
 
@@ -56,11 +102,15 @@ class Client(object):
         return self.web3.eth.contract(address=checksum_encode(contract_address), abi=abi)
 
 
-    def construct_erc20_tx(self, contract, addressFrom, addressTo,value, gasLimit=42000, gasprice=None):
+    def construct_erc20_tx(self, contract, addressFrom, addressTo,value, gasLimit=42000, gasprice=None, *, nonce):
+        """
+
+        :param nonce: nonce allocated by nonce_manager. The caller releases it if the transaction isn't sent
+        """
         tx_d = {
 
             'gasPrice': self.web3.eth.gasPrice * 2 if not gasprice  else gasprice,
-            'nonce': self.web3.eth.getTransactionCount(checksum_encode(addressFrom)),
+            'nonce': nonce,
         }
         if gasLimit:
             tx_d.update({"gas": gasLimit})
@@ -71,14 +121,21 @@ class Client(object):
             checksum_encode(addressTo),
             int(value)
         ).buildTransaction(tx_d)
+
         return tx
 
-    def invoke_contract(self, invoker, contract, method, args):
+    def invoke_contract(self, invoker, contract, method, args, nonce):
+        """
+        Description: build the transaction of the contract method. It could be sent by send_transaction which
+                     allocates the nonce, such as send_transaction(invoker, lambda nonce: invoke_contract(...), key)
+        :param nonce: nonce allocated by nonce_manager
+        :return: transaction dict
+        """
         tx = contract.functions[method](*args
                                         ).buildTransaction({
             "gas": 2560000,
             'gasPrice': self.web3.eth.gasPrice,
-            'nonce': self.web3.eth.getTransactionCount(invoker),
+            'nonce': nonce,
         })
 
         return tx
@@ -92,6 +149,39 @@ class Client(object):
     def broadcast(self, raw_data):
         return self.web3.eth.sendRawTransaction(raw_data)
 
+    def send_transaction(self, invoker, build_transaction, key, timings=None):
+        """
+        Description: sign and send the transaction with the nonce allocated locally.
+                     If the nonce is used already, resync the nonce from the chain and try once more.
+        :param invoker: sender of the transaction
+        :param build_transaction: callback(nonce) to build the transaction dict
+        :param key: private key of the invoker
+        :param timings: dict to record the seconds spent by each stage
+        :return: transaction id
+        """
+        invoker = checksum_encode(invoker)
+        timings = timings if timings is not None else {}
+        for retry in range(2):
+            nonce = self.nonce_manager.allocate(invoker)
+            try:
+                start_time = time.time()
+                signed = self.web3.eth.account.signTransaction(build_transaction(nonce), key)
+                timings['sign'] = timings.get('sign', 0) + time.time() - start_time
+
+                start_time = time.time()
+                tx_id = self.web3.eth.sendRawTransaction(signed.rawTransaction)
+                timings['send'] = timings.get('send', 0) + time.time() - start_time
+            except Exception as error:
+                self.nonce_manager.release(invoker, nonce, error)
+                if retry or not NonceManager.is_nonce_error(error):
+                    raise
+
+                LOG.warning('Nonce<{}> of {} is used. Retry with the nonce from the chain'.format(nonce, invoker))
+                continue
+
+            self.nonce_manager.commit(invoker, nonce)
+            return tx_id
+
     def int_to_big_endian(self, value):
         return value.to_bytes(32, 'big')
 
@@ -177,29 +267,110 @@ class Client(object):
         return contract.functions[method](*args).call()
 
     def contruct_transaction(self, invoker, contract, method, args, key, gwei_coef=None, gasLimit=4500000):
-        """"""
+        """
+        Description: the call data is encoded only once for both estimateGas and the transaction, and the
+                     transaction is built locally with the cached chain id and the local nonce. So only estimateGas
+                     and sendRawTransaction go to the node.
+        """
+        timings = {}
+        start_time = time.time()
+        tx_dict = {
+            'from': checksum_encode(invoker),
+            'to': contract.address,
+            'data': contract.encodeABI(fn_name=method, args=args),
+            'value': 0,
+        }
+        timings['encode'] = time.time() - start_time
+
         try:
             # pre-check the transaction
-            estimate_gas = contract.functions[method](*args).estimateGas({'from': checksum_encode(invoker)})
+            start_time = time.time()
+            estimate_gas = self.web3.eth.estimateGas(tx_dict)
             gasLimit = estimate_gas + 5000 + randint(1, 10000)
         except Exception as error:
             LOG.debug('Failed to execute {}. Exception: {}'.format(method, error))
             LOG.info('the parameters are : {}'.format(args))
         finally:
+            timings['estimate'] = time.time() - start_time
             LOG.debug('Estimated to spend {} gas'.format(gasLimit))
-            tx_dict = contract.functions[method](*args).buildTransaction({
+
+            tx_dict.pop('from')
+            tx_dict.update({
                 'gas': gasLimit,
                 'gasPrice': pow(10, 9) * gwei_coef,
-                'nonce': self.web3.eth.getTransactionCount(checksum_encode(invoker)),
+                'chainId': self.chain_id,
             })
-            signed = self.web3.eth.account.signTransaction(tx_dict, key)
-            tx_id = self.web3.eth.sendRawTransaction(signed.rawTransaction)
+            try:
+                tx_id = self.send_transaction(invoker, lambda nonce: dict(tx_dict, nonce=nonce), key, timings)
+            finally:
+                self.record_stage_timings(method, timings)
 
             return binascii.hexlify(tx_id).decode()
 
+    def record_stage_timings(self, method, timings):
+        LOG.debug('{} stage timings: {}'.format(method, ', '.join(
+            '{}={:.3f}s'.format(stage, seconds) for stage, seconds in timings.items())))
+
+        # recorded by the sender and event threads at the same time
+        with self._stage_timings_lock:
+            for stage, seconds in timings.items():
+                count, total = self.stage_timings.get(stage, (0, 0))
+                self.stage_timings[stage] = (count + 1, total + seconds)
+
     def get_transaction_receipt(self, hashString):
         return self.web3.eth.getTransactionReceipt(hashString)
 
+    def get_transaction_count(self, address, block_identifier='latest'):
+        return self.web3.eth.getTransactionCount(checksum_encode(address), block_identifier)
+
+    def batch(self):
+        """
+        Description: collect the calls and send them by one JSON-RPC batch request.
+        :return: BatchRequest instance
+        """
+        return BatchRequest(self)
+
+    def get_transaction_receipts(self, hash_list):
+        """
+
+        :param hash_list: transaction ids
+        :return: receipts in the same order, None if the transaction is pending. BatchRequestException is raised if
+                 any receipt isn't got, since it couldn't be told apart from the pending one
+        """
+        batch = self.batch()
+        for tx_hash in hash_list:
+            batch.get_transaction_receipt(tx_hash)
+        return batch.execute(strict=True)
+
+    def get_transactions(self, hash_list):
+        """
+
+        :param hash_list: transaction ids
+        :return: transactions in the same order, None if the transaction isn't found by the node. BatchRequestException
+                 is raised if any transaction isn't got
+        """
+        batch = self.batch()
+        for tx_hash in hash_list:
+            batch.get_transaction(tx_hash)
+        return batch.execute(strict=True)
+
+    def get_logs(self, from_block, to_block, address, topics=None):
+        """
+
+        :param from_block: first block of the range
+        :param to_block: last block of the range, included
+        :param address: contract address
+        :param topics: topic filters
+        :return: raw logs whose data and topics are hex strings
+        """
+        batch = self.batch()
+        batch.get_logs(from_block, to_block, address, topics)
+        logs = batch.execute()[0]
+        if logs is None:
+            raise ValueError('Failed to get logs of {} in blocks {}-{}'.format(address, from_block, to_block))
+
+        return logs
+
     @classmethod
     def set_gas_price(cls, coef=1):
         cls._gwei_coeficient = coef
@@ -211,3 +382,145 @@ class Client(object):
     # @staticmethod
     # def get_estimate_gas(invoker, contract, method, args):
     #     return  contract.functions[method](*args).estimateGas({'from': invoker})
+
+
+class BatchRequest(object):
+    """
+        Descriptions    : Calls collected here are sent to the node in one JSON-RPC batch POST when executed.
+                          The results are decoded like the single-call methods of Client and returned in order.
+                          The result of the failed call is None, or BatchRequestException is raised in strict mode
+                          if None is a valid result, such as the receipt of the pending transaction.
+    """
+    _timeout = 30
+    _receipt_integer_fields = ['blockNumber', 'cumulativeGasUsed', 'gasUsed', 'status', 'transactionIndex']
+    _log_integer_fields = ['blockNumber', 'logIndex', 'transactionIndex']
+
+    def __init__(self, client):
+        self._client = client
+        self._calls = []    # (method, params, formatter)
+
+    def __len__(self):
+        return len(self._calls)
+
+    def add(self, method, params, formatter=None):
+        self._calls.append((method, params, formatter))
+        return len(self._calls) - 1
+
+    def get_balance_of_eth(self, address):
+        return self.add('eth_getBalance', [checksum_encode(address), 'latest'], lambda result: int(result, 16)/(10**18))
+
+    def call_contract(self, contract, method, args, formatter=None):
+        """
+
+        :param contract: contract instance
+        :param method: name of the contract function
+        :param args: arguments of the contract function
+        :param formatter: callback to format the decoded result
+        :return: index of the call
+        """
+        output_types = self.get_output_types(contract, method, args)
+
+        def decode(result):
+            decoded = decode_abi(output_types, bytes.fromhex(result[2:]))
+            decoded = decoded[0] if 1 == len(decoded) else list(decoded)
+            return formatter(decoded) if formatter else decoded
+
+        return self.add('eth_call', [{'to': contract.address, 'data': contract.encodeABI(fn_name=method, args=args)},
+                                     'latest'], decode)
+
+    def get_balance_of_erc20(self, contract_address, abi, address):
+        contract = self._client.get_contract_instance(contract_address, abi)
+        return self.call_contract(contract, 'balanceOf', [checksum_encode(address)], lambda result: result/(10**8))
+
+    def get_approved_asset(self, contract_address, abi, approver, spender):
+        contract = self._client.get_contract_instance(contract_address, abi)
+        return self.call_contract(contract, 'allowance', [approver, spender], lambda result: result/(10**8))
+
+    def get_transaction_receipt(self, hashString):
+        return self.add('eth_getTransactionReceipt', [hashString], self.format_receipt)
+
+    def get_transaction(self, hashString):
+        return self.add('eth_getTransactionByHash', [hashString])
+
+    def get_logs(self, from_block, to_block, address, topics=None):
+        """
+
+        :param from_block: first block of the range
+        :param to_block: last block of the range, included
+        :param address: contract address
+        :param topics: topic filters, such as [[topic0 of event A, topic0 of event B]]
+        :return: index of the call
+        """
+        log_filter = {'fromBlock': hex(from_block), 'toBlock': hex(to_block), 'address': checksum_encode(address)}
+        if topics:
+            log_filter.update({'topics': topics})
+
+        return self.add('eth_getLogs', [log_filter], self.format_logs)
+
+    def execute(self, strict=False):
+        """
+
+        :param strict: raise BatchRequestException if any call is failed or not answered by the node
+        :return: list of results in the same order as the calls
+        """
+        if not self._calls:
+            return []
+
+        calls, self._calls = self._calls, []
+        payload = [{'jsonrpc': '2.0', 'id': index, 'method': method, 'params': params}
+                   for index, (method, params, _) in enumerate(calls)]
+        response = self._client.session.post(self._client.eth_url, json=payload, timeout=self._timeout).json()
+        if not isinstance(response, list):
+            LOG.error('Batch request error: {}'.format(response))
+            response = []
+
+        results = [None] * len(calls)
+        succeeded = set()
+        for item in response:
+            index = item.get('id') if isinstance(item, dict) else None
+            if not (isinstance(index, int) and 0 <= index < len(calls)):
+                # such as the error object of the node without id, the result of the call is kept None
+                LOG.error('Batch response with invalid id: {}'.format(item))
+                continue
+
+            method, params, formatter = calls[index]
+            if 'error' in item:
+                LOG.error('Batch call {}{} error: {}'.format(method, params, item.get('error')))
+                continue
+
+            try:
+                result = item.get('result')
+                results[index] = formatter(result) if formatter and result is not None else result
+                succeeded.add(index)
+            except Exception as error:
+                LOG.error('Failed to decode result of batch call {}{}. Exception: {}'.format(method, params, error))
+
+        if strict and len(succeeded) < len(calls):
+            raise BatchRequestException('{} of {} batch calls are failed'.format(len(calls) - len(succeeded),
+                                                                               len(calls)))
+
+        return results
+
+    @staticmethod
+    def get_output_types(contract, method, args):
+        for item in contract.abi:
+            if 'function' == item.get('type') and method == item.get('name') \
+                    and len(args) == len(item.get('inputs', [])):
+                return [output.get('type') for output in item.get('outputs', [])]
+
+        raise ValueError('Function {} with {} arguments is not found in the abi'.format(method, len(args)))
+
+    @classmethod
+    def format_logs(cls, logs):
+        for log in logs:
+            for field in cls._log_integer_fields:
+                if isinstance(log.get(field), str):
+                    log[field] = int(log.get(field), 16)
+        return logs
+
+    @classmethod
+    def format_receipt(cls, receipt):
+        for field in cls._receipt_integer_fields:
+            if isinstance(receipt.get(field), str):
+                receipt[field] = int(receipt.get(field), 16)
+        return receipt
@@ -51,3 +51,13 @@ class UnsupportedTrinityNumber(Exception):
 class ContractEventException(TrinityException):
     """contract event exception error"""
     pass
+
+
+class UnitOfWorkException(TrinityException):
+    """the batched writes of the unit of work are failed"""
+    pass
+
+
+class BatchRequestException(TrinityException):
+    """some calls of the batch request are failed"""
+    pass
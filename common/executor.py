@@ -0,0 +1,199 @@
+"""Author: Trinity Core Team 
+
+MIT License
+
+Copyright (c) 2018 Trinity
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+import time
+from collections import deque
+from queue import Queue
+from threading import Lock, Thread
+from common.log import LOG
+
+
+class SerialLaneExecutor(object):
+    """
+        Descriptions    : Run the tasks by a pool of worker threads. Tasks submitted with the same key are run one by
+                          one in the submitted order, while tasks with different keys are run in parallel.
+                          The workers are started when the first task is submitted.
+    """
+    def __init__(self, name, workers=4):
+        """
+
+        :param name: prefix of the worker threads' name
+        :param workers: number of the worker threads
+        """
+        self.name = name
+        self.workers = workers
+
+        self._lanes = {}            # key: deque of (task, label, submitted time)
+        self._ready_keys = Queue()  # keys of the lanes which have tasks and are not being run by any worker
+        self._lock = Lock()
+        self._threads = []
+        self._running = False
+
+        self._pending = 0
+        self._statistics = {}
+
+    def start(self):
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._threads = [Thread(target=self._work, name='{}-{}'.format(self.name, index), daemon=True)
+                             for index in range(self.workers)]
+
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Description: stop the workers once the lanes ahead of the stop signal are handled. Tasks still queued after
+                     that are dropped.
+        :param timeout: seconds to wait for each worker
+        :return:
+        """
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            threads, self._threads = self._threads, []
+
+        for _ in threads:
+            self._ready_keys.put(None)
+        for thread in threads:
+            thread.join(timeout)
+
+        self._drop_queued_tasks()
+
+    def _drop_queued_tasks(self):
+        """
+        Description: drop the tasks left after the workers are stopped, so the depth only counts the tasks still
+                     being run by the workers which are not stopped in time.
+        :return:
+        """
+        with self._lock:
+            stop_signals = 0
+            queued_keys = set()
+            while not self._ready_keys.empty():
+                key = self._ready_keys.get_nowait()
+                if key is None:
+                    stop_signals += 1
+                else:
+                    queued_keys.add(key)
+            # the stop signals are kept for the workers which are still running
+            for _ in range(stop_signals):
+                self._ready_keys.put(None)
+
+            dropped = 0
+            for key in list(self._lanes.keys()):
+                dropped += len(self._lanes[key])
+                if key in queued_keys:
+                    self._lanes.pop(key)
+                else:
+                    # the lane is being run, it's removed by the worker once the running task is finished
+                    self._lanes[key].clear()
+            self._pending -= dropped
+
+        if dropped:
+            LOG.warning('{} dropped {} queued tasks when stopped'.format(self.name, dropped))
+
+    def submit(self, key, task, label=None):
+        """
+
+        :param key: tasks with the same key are run serially
+        :param task: callable without arguments
+        :param label: the statistics are recorded by label, such as the message type
+        :return:
+        """
+        if not self._running:
+            self.start()
+
+        with self._lock:
+            lane = self._lanes.get(key)
+            is_idle = lane is None
+            if is_idle:
+                lane = self._lanes[key] = deque()
+
+            lane.append((task, label, time.time()))
+            self._pending += 1
+
+        # only the idle lane is put into the ready queue, so only one worker runs the lane at the same time
+        if is_idle:
+            self._ready_keys.put(key)
+
+    @property
+    def depth(self):
+        """
+        Description: tasks submitted but not finished
+        """
+        return self._pending
+
+    @property
+    def statistics(self):
+        """
+        Description: statistics of each label
+        :return: {label: {'count', 'errors', 'wait_total', 'wait_max', 'run_total', 'run_max'}}
+        """
+        with self._lock:
+            return {label: dict(statistics) for label, statistics in self._statistics.items()}
+
+    def _work(self):
+        while True:
+            key = self._ready_keys.get()
+            if key is None:
+                break
+
+            with self._lock:
+                lane = self._lanes.get(key)
+                if not lane:
+                    # the tasks of the lane are dropped by stop
+                    self._lanes.pop(key, None)
+                    continue
+                task, label, submitted_time = lane.popleft()
+
+            start_time = time.time()
+            failed = False
+            try:
+                task()
+            except Exception as error:
+                LOG.exception('{} task<{}> of lane<{}> error: {}'.format(self.name, label, key, error))
+                failed = True
+            end_time = time.time()
+
+            with self._lock:
+                self._pending -= 1
+                self._record(label, start_time - submitted_time, end_time - start_time, failed)
+
+                if self._lanes.get(key):
+                    # give the other lanes a chance, then go on with this lane
+                    self._ready_keys.put(key)
+                else:
+                    self._lanes.pop(key, None)
+
+    def _record(self, label, wait_time, run_time, failed):
+        statistics = self._statistics.setdefault(label, {'count': 0, 'errors': 0, 'wait_total': 0, 'wait_max': 0,
+                                                         'run_total': 0, 'run_max': 0})
+        statistics['count'] += 1
+        statistics['errors'] += 1 if failed else 0
+        statistics['wait_total'] += wait_time
+        statistics['wait_max'] = max(statistics['wait_max'], wait_time)
+        statistics['run_total'] += run_time
+        statistics['run_max'] = max(statistics['run_max'], run_time)
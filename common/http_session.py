@@ -0,0 +1,105 @@
+"""Author: Trinity Core Team 
+
+MIT License
+
+Copyright (c) 2018 Trinity
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+import requests
+from threading import Lock
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+
+
+class HttpSession(requests.Session):
+    """
+        Descriptions    : Keep-alive session with bounded connection pool, retries of the failed connections and the
+                          default timeout. Only the connection errors are retried, so the request is never sent twice.
+    """
+    def __init__(self, pool_size=10, max_retries=2, timeout=30):
+        super(HttpSession, self).__init__()
+        self.timeout = timeout
+
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                              max_retries=Retry(total=max_retries, read=False, backoff_factor=0.2))
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super(HttpSession, self).request(method, url, **kwargs)
+
+    @property
+    def statistics(self):
+        """
+        Description: connections created and requests sent through the pools of this session
+        :return: dict
+        """
+        connections = 0
+        requests_count = 0
+        for adapter in set(self.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool:
+                    connections += pool.num_connections
+                    requests_count += pool.num_requests
+
+        return {
+            'connections': connections,
+            'requests': requests_count,
+            'reused': max(requests_count - connections, 0)
+        }
+
+
+_session_lock = Lock()
+_sessions = {}
+
+
+def get_http_session(name, pool_size=10, max_retries=2, timeout=30):
+    """
+    Description: the session is shared by the name in this process. The parameters only take effect when the session
+                 is created.
+    :param name: name of the session, such as 'gateway'
+    :param pool_size: max connections kept alive for each host
+    :param max_retries: retries of the failed connections
+    :param timeout: default timeout in seconds
+    :return: HttpSession instance
+    """
+    with _session_lock:
+        if name not in _sessions:
+            _sessions[name] = HttpSession(pool_size, max_retries, timeout)
+        return _sessions[name]
+
+
+def get_configured_http_session(name, config=None):
+    """
+
+    :param name: name of the session
+    :param config: dict like Configure["HttpSession"]
+    :return: HttpSession instance
+    """
+    config = config or {}
+    return get_http_session(name, config.get('PoolSize', 10), config.get('MaxRetries', 2), config.get('Timeout', 30))
+
+
+def get_http_session_statistics():
+    with _session_lock:
+        return {name: session.statistics for name, session in _sessions.items()}
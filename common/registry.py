@@ -0,0 +1,96 @@
+"""Author: Trinity Core Team 
+
+MIT License
+
+Copyright (c) 2018 Trinity
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+import time
+from threading import Lock
+from common.log import LOG
+
+
+class HandlerRegistry(object):
+    """
+        Descriptions    : Map the names, such as message types or RPC methods, to their handlers, and record the
+                          calls, errors and time spent by each handler.
+    """
+    def __init__(self, name):
+        self.name = name
+        self._handlers = {}
+        self._statistics = {}
+        self._lock = Lock()
+
+    def register(self, *names):
+        """
+        Description: decorator to register the handler with the names
+        :param names:
+        :return:
+        """
+        def wrapper(handler):
+            for name in names:
+                self.add(name, handler)
+            return handler
+        return wrapper
+
+    def add(self, name, handler):
+        if name in self._handlers:
+            LOG.warning('{} handler of {} is replaced by {}'.format(self.name, name, handler))
+        self._handlers[name] = handler
+
+    def get(self, name):
+        return self._handlers.get(name)
+
+    def __contains__(self, name):
+        return name in self._handlers
+
+    def call(self, name, *args, **kwargs):
+        """
+        Description: call the handler of the name
+        :return: result of the handler
+        """
+        handler = self._handlers.get(name)
+        if handler is None:
+            raise KeyError('No {} handler of {}'.format(self.name, name))
+
+        start_time = time.time()
+        failed = False
+        try:
+            return handler(*args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._record(name, time.time() - start_time, failed)
+
+    @property
+    def statistics(self):
+        """
+        :return: {name: {'calls', 'errors', 'total_time', 'max_time'}}
+        """
+        with self._lock:
+            return {name: dict(statistics) for name, statistics in self._statistics.items()}
+
+    def _record(self, name, spent_time, failed):
+        with self._lock:
+            statistics = self._statistics.setdefault(name, {'calls': 0, 'errors': 0, 'total_time': 0, 'max_time': 0})
+            statistics['calls'] += 1
+            statistics['errors'] += 1 if failed else 0
+            statistics['total_time'] += spent_time
+            statistics['max_time'] = max(statistics['max_time'], spent_time)
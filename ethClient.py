@@ -3,8 +3,9 @@ import rlp
 from ethereum import utils
 from ethereum.utils import ecsign, normalize_key, int_to_big_endian, checksum_encode, privtoaddr
 from solc import compile_files
-from web3 import Web3, HTTPProvider
+from web3 import Web3
 from ethereum.transactions import Transaction
+from blockchain.web3client import PooledHTTPProvider, get_chain_session
 
 
 
@@ -27,7 +28,7 @@ def hander_contract_args(args):
 class Client(object):
 
     def __init__(self, eth_url):
-        self.web3 = Web3(HTTPProvider(eth_url))
+        self.web3 = Web3(PooledHTTPProvider(eth_url, get_chain_session()))
 
     def get_privtKey_from_keystore(self,filename, password):
         with open(filename) as keyfile:
@@ -17,6 +17,7 @@ class SettingsHolder:
 
 
     NODEURL = None
+    NODE_WS_URL = None
     NET_NAME = None
     EthClient =None
 
@@ -25,6 +26,7 @@ class SettingsHolder:
     def setup_mainnet(self):
         self.NET_NAME = "MainNet"
         self.NODEURL = "https://mainnet.infura.io"
+        self.NODE_WS_URL = "wss://mainnet.infura.io/ws"
         self.TNC = SUPPORTED_ASSET_TYPE['TNC']
         self.TNC_abi = erc20_asset_abi
         self.Eth_Contract_address = "0x7A332beF593d6bd6B9d314959295239c46D5C127"
@@ -35,6 +37,7 @@ class SettingsHolder:
     def setup_testnet(self):
         self.NET_NAME = "TestNet"
         self.NODEURL = "https://ropsten.infura.io"
+        self.NODE_WS_URL = "wss://ropsten.infura.io/ws"
         self.TNC = SUPPORTED_ASSET_TYPE['TNC']
         self.TNC_abi = erc20_asset_abi
         self.Eth_Contract_address = "0x5eC045d849539688e6Ab70946c94834AEED84d74"
@@ -59,7 +59,6 @@ class Wallet(object):
         self._passwordHash=None
         self.locked = False
         self.name = path.split(".")[0]
-        self.history = APIHistory()
 
         if create:
             self.uuid = uuid.uuid1()
@@ -202,18 +201,31 @@ class Wallet(object):
         """
 
         addresss_to = checksum_encode(address_to)
-        tx = settings.EthClient.construct_common_tx(self._key.address, addresss_to, value, gasLimit)
-        rawdata = self.SignTX(tx)
-        return self._sendraw_and_recordhistory(rawdata=rawdata, asset_id="Eth", sendto=address_to, value=value)
+        return self._sendraw_and_recordhistory(
+            lambda nonce: settings.EthClient.construct_common_tx(self._key.address, addresss_to, value, gasLimit,
+                                                                 nonce=nonce),
+            asset_id="Eth", sendto=address_to, value=value)
 
 
-    def _sendraw_and_recordhistory(self, rawdata,asset_id, sendto, value):
+    def _sendraw_and_recordhistory(self, build_transaction, asset_id, sendto, value):
+        """
+
+        :param build_transaction: callback(nonce) to build the transaction dict
+        :return: transaction id
+        """
+        address = checksum_encode(self._key.address)
+        nonce = settings.EthClient.nonce_manager.allocate(address)
         try:
+            # the nonce is released if any step fails, otherwise the later transactions wait for the gap
+            rawdata = self.SignTX(build_transaction(nonce))
             tx_id = self.SendRawTransaction(rawdata.rawTransaction)
 
         except Exception as e:
+            settings.EthClient.nonce_manager.release(address, nonce, e)
             raise Exception(e)
 
+        settings.EthClient.nonce_manager.commit(address, nonce)
+
         tx_id = binascii.hexlify(tx_id).decode()
         if "send failed" in tx_id:
             raise Exception("send faild")
@@ -244,12 +256,12 @@ class Wallet(object):
         contract_instance = settings.EthClient.get_contract_instance(conract_address,
                                                        abi)
         address_to = checksum_encode(address_to)
-        tx = settings.EthClient.construct_erc20_tx(contract_instance, self._key.address, address_to,
-                                                   int(value*10**decimals), gasLimit, gasprice)
-        rawdata = self.SignTX(tx)
-
         asset = "{}({})".format(asset, conract_address)
-        return self._sendraw_and_recordhistory(rawdata, asset, address_to, value)
+        return self._sendraw_and_recordhistory(
+            lambda nonce: settings.EthClient.construct_erc20_tx(contract_instance, self._key.address, address_to,
+                                                                int(value*10**decimals), gasLimit, gasprice,
+                                                                nonce=nonce),
+            asset, address_to, value)
 
     def get_contract(self, asset):
         """
@@ -372,7 +384,7 @@ class Wallet(object):
         """
 
 
-        self.history.set_history_collection(self.address)
+        history = APIHistory(self.address)
         his = {"tx_id":tx_id,
                "asset":asset_id,
                "sender":self.address,
@@ -380,7 +392,7 @@ class Wallet(object):
                "value":value,}
                #"block":nill,
                #"state":""}
-        return self.history.add_history(**his)
+        return history.add_history(**his)
 
     def update_history(self, tx_id, block, state):
         """
@@ -390,9 +402,9 @@ class Wallet(object):
         :param state:
         :return:
         """
-        self.history.set_history_collection(self.address)
+        history = APIHistory(self.address)
 
-        return self.history.update_history(tx_id,block=block,state=state)
+        return history.update_history(tx_id,block=block,state=state)
 
     def query_history(self,**kwargs):
         """
@@ -400,8 +412,8 @@ class Wallet(object):
         :param kwargs:
         :return:
         """
-        self.history.set_history_collection(self.address)
+        history = APIHistory(self.address)
         if not kwargs:
-            return self.history.batch_query_history({})
+            return history.batch_query_history({})
         else:
-            return self.history.batch_query_history(kwargs)
+            return history.batch_query_history(kwargs)
@@ -27,6 +27,27 @@ from .channel_model import TBLChannel, APIChannel
 from .node_model import TBLNode, APINode
 from .transaction_model import TBLTransaction, APITransaction
 
+from .payment_model import TBLPayment
+from .statistics_model import APIStatistics
+from .log_cursor_model import APILogCursor
+from .unit_of_work import UnitOfWork
+from .migration import migrate_legacy_trades
+
 __all__ = ['TBLWalletAddress', 'TBLChannel', 'TBLNode', 'TBLTransaction',
-           'APIWalletAddress', 'APIChannel', 'APINode', 'APITransaction', ]
+           'APIWalletAddress', 'APIChannel', 'APINode', 'APITransaction', 'APILogCursor', 'UnitOfWork',
+           'provision_indexes', 'migrate_legacy_trades']
+
+
+def provision_indexes():
+    """
+    Description: create the indexes of the existing tables at startup. The collections created later are provisioned
+                 by their first insertion.
+    :return:
+    """
+    for table in [APIWalletAddress.table, APIChannel.table, APINode.table, APIStatistics.table,
+                  APILogCursor.table]:
+        table.ensure_indexes()
+
+    TBLTransaction.table_handle().ensure_indexes()
+    TBLPayment.table_handle('payment').ensure_indexes()
 
@@ -0,0 +1,101 @@
+"""Author: Trinity Core Team 
+
+MIT License
+
+Copyright (c) 2018 Trinity
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+import copy
+from collections import OrderedDict
+from threading import Lock
+
+
+class DocumentCache(object):
+    """
+        Descriptions    : LRU cache of the table items keyed by the primary key. The items are deep copied when they
+                          are put into or got from the cache, so callers could never change the cached items.
+                          Any invalidation bumps the generation, and an item read from the database before that is
+                          not cached, to avoid caching the stale item.
+    """
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+
+        self._items = OrderedDict()
+        self._lock = Lock()
+        self._generation = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._items.move_to_end(key)
+            return copy.deepcopy(item)
+
+    def put(self, key, item, generation=None):
+        """
+
+        :param key: primary key of the item
+        :param item: dict of the table item
+        :param generation: the generation before the item is read from the database
+        :return: False if the item is not cached since it might be stale
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+
+            self._items[key] = copy.deepcopy(item)
+            self._items.move_to_end(key)
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+
+            return True
+
+    def invalidate(self, key=None):
+        """
+
+        :param key: None means all of the items
+        :return:
+        """
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._items.clear()
+            else:
+                self._items.pop(key, None)
+
+    @property
+    def statistics(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._items),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0
+        }
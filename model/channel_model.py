@@ -22,7 +22,11 @@ AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
 LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE."""
-from .manager import DBManager, rpc_response, connection_singleton
+import pymongo
+from pymongo import ReturnDocument
+from .manager import DBManager, ModelSet, rpc_response, connection_singleton
+from .cache import DocumentCache
+from .unit_of_work import UnitOfWork
 from .base_enum import EnumAssetType, EnumChannelState
 from common.log import LOG
 
@@ -60,6 +64,25 @@ class TBLChannel(DBManager):
                                            state=state, alive_block=alive_block,
                                            deposit=deposit, balance=deposit, hlock=hlock, magic=magic, **kwargs)
 
+    def compare_and_set(self, channel, expected, changes):
+        """
+        Description: update the fields of the channel atomically only when the fields still have the expected values.
+                     The balances are saved as strings of big numbers, so the new values are calculated by the caller
+                     and guarded by the old values instead of '$inc'.
+        :param channel: channel name
+        :param expected: {field path: old value}, such as {'balance.0x1234.TNC': '100'}
+        :param changes: {field path: new value}
+        :return: the channel item after updated, None if any field is changed by others
+        """
+        filters = {self.primary_key: channel}
+        filters.update(expected)
+
+        changes = dict(changes)
+        changes.update(self.update_at)
+
+        self.flush_pending()
+        return self.db_table.find_one_and_update(filters, {'$set': changes}, return_document=ReturnDocument.AFTER)
+
     def remove_unsupported_asset(self, asset):
         if not asset:
             return True
@@ -95,29 +118,75 @@ class TBLChannel(DBManager):
     def primary_key(self):
         return 'channel'
 
+    @property
+    def indexes(self):
+        # to query the channels of the wallet by state
+        return super(TBLChannel, self).indexes + [
+            ([('src_addr', pymongo.ASCENDING), ('state', pymongo.ASCENDING), ('magic', pymongo.ASCENDING)], {}),
+            ([('dest_addr', pymongo.ASCENDING), ('state', pymongo.ASCENDING), ('magic', pymongo.ASCENDING)], {}),
+        ]
+
     @property
     def required_item(self):
         return ['channel', 'src_addr', 'dest_addr', 'state', 'alive_block', 'deposit', 'balance', 'magic']
 
+    @property
+    def projections(self):
+        return {
+            'summary': ['channel', 'src_addr', 'dest_addr', 'state', 'balance', 'magic'],
+            'state': ['channel', 'src_addr', 'dest_addr', 'state', 'magic'],
+            'balance': ['channel', 'state', 'balance', 'hlock'],
+        }
+
 
 class APIChannel(object):
     table = TBLChannel()
+    # cache of the channels, invalidated by the writes
+    cache = DocumentCache()
 
     @classmethod
     def add_channel(cls, *args, **kwargs):
-        return cls.table.add_one(*args, **kwargs)
+        result = cls.table.add_one(*args, **kwargs)
+        cls.cache.invalidate(kwargs.get('channel', args[0] if args else None))
+        return result
 
     @classmethod
     def delete_channel(cls, channel):
-        return cls.table.delete_one(channel)
+        try:
+            return cls.table.delete_one(channel)
+        finally:
+            cls.cache.invalidate(channel)
 
     @classmethod
     def batch_delete_channel(cls, filters):
-        return cls.table.delete_many(filters)
+        try:
+            return cls.table.delete_many(filters)
+        finally:
+            cls.cache.invalidate()
 
     @classmethod
-    def query_channel(cls, channel, *args, **kwargs):
-        return cls.table.query_one(channel, *args, **kwargs)
+    def query_channel(cls, channel, *args, profile=None, **kwargs):
+        if args or kwargs:
+            # projection or other options are not cached
+            return cls.table.query_one(channel, *args, profile=profile, **kwargs)
+
+        # the cached item might be older than the batched writes of current thread, which are dropped from the cache
+        # once they are flushed
+        cls.table.flush_pending()
+        item = cls.cache.get(channel)
+        if item is not None:
+            return [ModelSet.view(item)]
+
+        if profile:
+            # the partial item is not cached
+            return cls.table.query_one(channel, profile=profile)
+
+        generation = cls.cache.generation
+        result = cls.table.query_one(channel)
+        if result:
+            cls.cache.put(channel, result[0].to_dict(), generation)
+
+        return result
 
     @classmethod
     def batch_query_channel(cls, filters, *args, **kwargs):
@@ -125,8 +194,36 @@ class APIChannel(object):
 
     @classmethod
     def update_channel(cls, channel, **kwargs):
-        return cls.table.update_one(channel, **kwargs)
+        try:
+            return cls.table.update_one(channel, **kwargs)
+        finally:
+            # the cached item is dropped instead of being changed. The channel might be updated by the message and
+            # event workers at the same time, and their changes might be applied to the cache in different order
+            cls.cache.invalidate(channel)
+
+            # the batched update isn't written yet, so the item read by others before the flush is dropped again
+            unit = UnitOfWork.current()
+            if unit is not None:
+                unit.after_flush(cls.table.db_table, lambda: cls.cache.invalidate(channel))
+
+    @classmethod
+    def compare_and_set_channel(cls, channel, expected, changes):
+        generation = cls.cache.generation
+        try:
+            item = cls.table.compare_and_set(channel, expected, changes)
+        except Exception:
+            cls.cache.invalidate(channel)
+            raise
+
+        # the post-image is cached unless the channel is updated by others in the meantime
+        if not item or not cls.cache.put(channel, item, generation):
+            cls.cache.invalidate(channel)
+
+        return ModelSet.view(item) if item else None
 
     @classmethod
     def batch_update_channel(cls, filters, **kwargs):
-        return cls.table.update_many(filters, **kwargs)
+        try:
+            return cls.table.update_many(filters, **kwargs)
+        finally:
+            cls.cache.invalidate()
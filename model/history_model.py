@@ -31,6 +31,9 @@ class TBLHistory(DBManager):
         Created         : 2018-02-13
         Modified        : 2018-03-21
     """
+    def __init__(self, collection):
+        self.__collection = collection
+
     def add_one(self, **kwargs):
         # to check whether the state is correct:
         return super(TBLHistory, self).add(**kwargs)
@@ -44,13 +47,9 @@ class TBLHistory(DBManager):
     def db_table(self):
         return self.client.trans_db.get_collection(self.collection)
 
-    def set_collection(self, collection):
-        """
-
-        :param collection:
-        :return:
-        """
-        self.collection = collection
+    @property
+    def collection(self):
+        return self.__collection
 
     @property
     def primary_key(self):
@@ -63,16 +62,12 @@ class APIHistory(object):
     """
 
     """
-    def __init__(self):
-        self.table = TBLHistory()
-
-    def set_history_collection(self, collection_index):
+    def __init__(self, collection_index):
         """
 
-        :param collection_index:
-        :return:
+        :param collection_index: the history collection, such as the wallet address
         """
-        self.table.set_collection(collection_index)
+        self.table = TBLHistory.table_handle(collection_index)
 
 
     def add_history(self, **args):
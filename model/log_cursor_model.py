@@ -0,0 +1,82 @@
+# --*-- coding : utf-8 --*--
+"""Author: Trinity Core Team 
+
+MIT License
+
+Copyright (c) 2018 Trinity
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+from .manager import DBManager, connection_singleton
+from .base_enum import EnumStatusCode
+
+
+class TBLLogCursor(DBManager):
+    """
+        Descriptions    : the last block whose contract logs have been handled by the log indexer.
+        contents        : {
+                            name        : 'indexer name, such as <contract address>:<wallet address>'
+                            block       : 'height of the last handled block'
+                            create_at   :
+                            update_at   :
+                        }
+    """
+    @property
+    @connection_singleton
+    def client(self):
+        return super(TBLLogCursor, self).client
+
+    @property
+    def db_table(self):
+        return self.client.db.LogCursor
+
+    @property
+    def primary_key(self):
+        return 'name'
+
+    def save(self, name, block):
+        """
+        Description: move the cursor forward. The cursor is created at the first saving.
+        :param name: indexer name
+        :param block: height of the last handled block
+        :return: EnumStatusCode
+        """
+        self.ensure_indexes()
+        self.flush_pending()
+        # $max keeps the cursor monotonic even if an older height is saved later
+        result = self.db_table.update_one({self.primary_key: name},
+                                          {'$max': {'block': block}, '$set': self.update_at}, upsert=True)
+        return EnumStatusCode.OK if result.upserted_id or result.matched_count else EnumStatusCode.NOK
+
+
+class APILogCursor(object):
+    table = TBLLogCursor()
+
+    @classmethod
+    def query_cursor(cls, name):
+        """
+
+        :param name: indexer name
+        :return: height of the last handled block, None if the indexer has never run
+        """
+        result = cls.table.query_one(name)
+        return result[0].block if result else None
+
+    @classmethod
+    def update_cursor(cls, name, block):
+        return cls.table.save(name, block)
@@ -22,9 +22,12 @@ AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
 LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE."""
+import re
 import pymongo
+from pymongo import InsertOne, UpdateOne, monitoring
 from pymongo.errors import DuplicateKeyError
 from datetime import datetime
+from threading import Lock
 import json
 from dateutil.tz import tzlocal
 DataTZ = datetime.now(tzlocal()).tzname()
@@ -34,6 +37,8 @@ DataTZ = datetime.now(tzlocal()).tzname()
 from model.base_enum import EnumStatusCode
 from trinity import DATABASE_CONFIG as cfg
 from common.log import LOG
+from common.singleton import SingletonClass
+from .unit_of_work import UnitOfWork
 
 
 def connection_singleton(callback):
@@ -73,22 +78,136 @@ def rpc_response(name):
 
 
 class ModelSet(object):
+    """
+        Descriptions    : Attribute view of the table item. The fields are read from the item document directly
+                          instead of being copied to the instance.
+    """
+    __slots__ = ('_document',)
+
     def __init__(self, **kwargs):
-        self.__dict__.update(kwargs)
+        object.__setattr__(self, '_document', kwargs)
+
+    @classmethod
+    def view(cls, document):
+        """
+        Description: wrap the document returned by the database without copying it
+        :param document: dict
+        :return: ModelSet
+        """
+        model = cls.__new__(cls)
+        object.__setattr__(model, '_document', document)
+        return model
+
+    def __getattr__(self, name):
+        if name == '_document':
+            raise AttributeError(name)
+
+        try:
+            return self._document[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self._document[name] = value
+
+    def __getstate__(self):
+        return self._document
+
+    def __setstate__(self, state):
+        object.__setattr__(self, '_document', state)
+
+    @property
+    def __dict__(self):
+        return self._document
+
+    def to_dict(self, fields=None):
+        """
+        :param fields: only the fields in the list are returned if specified
+        :return: the fields of the item except the database object id
+        """
+        if fields is not None:
+            return {key: value for key, value in self._document.items() if key in fields}
+
+        return {key: value for key, value in self._document.items() if key != '_id'}
 
     def __str__(self):
-        _dict = self.__dict__.copy()
-        _dict.pop("_id") if _dict.get("_id") else None
-        return json.dumps(_dict, skipkeys=True, indent=4)
+        return json.dumps(self.to_dict(), skipkeys=True, indent=4)
+
 
+class DBCommandMonitor(monitoring.CommandListener):
+    """
+        Descriptions    : Count the database commands being run by the shared client. Each command in flight holds one
+                          connection of the pool, so the max in-flight count shows how many connections are used.
+    """
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.commands = 0
+        self.failures = 0
+        self.total_duration = 0     # microseconds
+        self.max_duration = 0
+
+        self._lock = Lock()
+
+    def started(self, event):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def succeeded(self, event):
+        self._finish(event.duration_micros)
+
+    def failed(self, event):
+        self._finish(event.duration_micros, True)
+
+    def _finish(self, duration, failed=False):
+        with self._lock:
+            self.in_flight = max(self.in_flight - 1, 0)
+            self.commands += 1
+            self.failures += 1 if failed else 0
+            self.total_duration += duration
+            self.max_duration = max(self.max_duration, duration)
 
-class DBClient(object):
+    @property
+    def statistics(self):
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'max_in_flight': self.max_in_flight,
+                'commands': self.commands,
+                'failures': self.failures,
+                'average_duration_ms': self.total_duration / self.commands / 1000 if self.commands else 0,
+                'max_duration_ms': self.max_duration / 1000,
+            }
+
+
+class DBClient(metaclass=SingletonClass):
     """
-        Descriptions    :
+        Descriptions    : The MongoDB client shared by all tables of the process, so all threads share one connection
+                          pool. The pool, timeouts, write concern and read preference are set by DATABASE_CONFIG.
         Created         : 2018-02-13
     """
+    # DATABASE_CONFIG keys and the corresponding options of MongoClient
+    _client_options = {
+        'replica_set': 'replicaSet',
+        'max_pool_size': 'maxPoolSize',
+        'min_pool_size': 'minPoolSize',
+        'wait_queue_timeout_ms': 'waitQueueTimeoutMS',
+        'connect_timeout_ms': 'connectTimeoutMS',
+        'socket_timeout_ms': 'socketTimeoutMS',
+        'server_selection_timeout_ms': 'serverSelectionTimeoutMS',
+        'write_concern': 'w',
+        'read_preference': 'readPreference',
+    }
+
     def __init__(self):
-        self.db_client = pymongo.MongoClient(self.uri)
+        self.monitor = DBCommandMonitor()
+
+        options = {option: self.option_value(cfg[key])
+                   for key, option in self._client_options.items() if cfg.get(key) is not None}
+        LOG.info('Trinity Configuration DB URI: {}, options: {}'.format(self.masked_uri, options))
+
+        self.db_client = pymongo.MongoClient(self.uri, event_listeners=[self.monitor], **options)
         self.db = self.db_client.get_database(self.db_name)
         self.trans_db = self.db_client.get_database(self.db_trans_name)
         self.history_db = self.db_client.get_database(self.db_history_name)
@@ -99,14 +218,14 @@ class DBClient(object):
         except Exception as exp_info:
             LOG.error('Exception happened to close DB client. Exception: {}'.format(exp_info))
 
-        # reset the class member's value
-        self.db_client = None
-        self.db = None
-
     @property
     def uri(self):
         if hasattr(self, "_{}__uri".format(self.__class__.__name__)):
-            LOG.info('Trinity DB URI: {}'.format(self.__uri))
+            return self.__uri
+
+        # the full URI is used directly, such as the replica set: mongodb://host1:port1,host2:port2/?replicaSet=rs
+        if cfg.get('uri'):
+            self.__uri = cfg['uri']
             return self.__uri
 
         # Standard URI format: mongodb://[dbuser:dbpassword@]host:port/dbname
@@ -125,10 +244,25 @@ class DBClient(object):
         #uri_list.append(self.db_name)
 
         self.__uri = ''.join(uri_list)
-        LOG.info('Trinity Configuration DB URI: {}'.format(self.__uri))
 
         return self.__uri
 
+    @staticmethod
+    def option_value(value):
+        # the numeric options from the environment, such as write concern 1
+        return int(value) if isinstance(value, str) and value.isdigit() else value
+
+    @property
+    def masked_uri(self):
+        # the password is not logged
+        return re.sub(r'(//[^:/@]+:)[^@]+@', r'\1******@', self.uri)
+
+    @property
+    def statistics(self):
+        statistics = self.monitor.statistics
+        statistics.update({'max_pool_size': self.db_client.max_pool_size})
+        return statistics
+
     @property
     def db_name(self):
         return cfg.get("channel", "Channel")
@@ -150,6 +284,32 @@ class DBManager(object):
 
     ATTENTION: we didn't check any input from users, so each user MUST check whether their inputs are correct or not.
     """
+    # collections whose indexes are provisioned: {(database name, collection name)}
+    _provisioned_collections = set()
+    _provision_lock = Lock()
+
+    # immutable table handles shared by threads: {(table class, arguments): table handle}
+    _table_handles = {}
+    _table_handle_lock = Lock()
+
+    @classmethod
+    def table_handle(cls, *args):
+        """
+        Description: get the table handle bound to the arguments, such as the collection name. The handles are never
+                     changed after creation, so they are cached and shared by all threads.
+        :param args: arguments to construct the table
+        :return: table instance
+        """
+        key = (cls, args)
+        handle = DBManager._table_handles.get(key)
+        if handle is None:
+            with DBManager._table_handle_lock:
+                handle = DBManager._table_handles.get(key)
+                if handle is None:
+                    handle = DBManager._table_handles[key] = cls(*args)
+
+        return handle
+
     def add(self, **kwargs):
         """
         Description: Realize the database 'add' operation.
@@ -160,19 +320,25 @@ class DBManager(object):
             LOG.error('DB Collection is Invalid.')
             return EnumStatusCode.InvalidDatabaseConnection
 
-        # create primary key if user specify primary_key one valid value
+        # check the primary key if user specify primary_key one valid value
         if self.primary_key:
-            if kwargs.__contains__(self.primary_key):
-                self.db_table.create_index(self.primary_key, unique=True)
-            else:
+            if not kwargs.__contains__(self.primary_key):
                 LOG.error('Could not find the primary key {} in the table item {}.'.format(self.primary_key, kwargs))
                 return EnumStatusCode.PrimaryKeyNotFoundInAddingNewItem
         else:
             pass
 
+        # the collection might be created by this insertion, such as the trade collection of new channel
+        self.ensure_indexes()
+
         # to add a common part for each items of the table
         content = self.create_at
         content.update(kwargs)
+        content.update(self.scope)
+
+        # the insertion is written by the unit of work, so the duplicated key is only logged when it's flushed
+        if self.batch(InsertOne(content)):
+            return EnumStatusCode.OK
 
         try:
             self.db_table.insert_one(content)
@@ -197,7 +363,10 @@ class DBManager(object):
 
         # add the update time.
         kwargs.update(self.update_at)
-        result = self.db_table.update_one({self.primary_key: primary_key}, {'$set': kwargs})
+        if self.batch(UpdateOne(self.scoped({self.primary_key: primary_key}), {'$set': kwargs})):
+            return EnumStatusCode.OK
+
+        result = self.db_table.update_one(self.scoped({self.primary_key: primary_key}), {'$set': kwargs})
         return self.__result_of_update(result)
 
     def update_many(self, filters, **kwargs):
@@ -220,7 +389,8 @@ class DBManager(object):
 
         # add the update time.
         kwargs.update(self.update_at)
-        result = self.db_table.update_many(filters, {'$set': kwargs})
+        self.flush_pending()
+        result = self.db_table.update_many(self.scoped(filters), {'$set': kwargs})
         return self.__result_of_update(result)
 
     def delete_one(self, primary_key):
@@ -229,7 +399,8 @@ class DBManager(object):
         :param primary_key:
         :return:
         """
-        result = self.db_table.delete_one({self.primary_key: primary_key})
+        self.flush_pending()
+        result = self.db_table.delete_one(self.scoped({self.primary_key: primary_key}))
         return self.__result_of_delete(result)
 
     def delete_many(self, filters):
@@ -240,31 +411,106 @@ class DBManager(object):
             LOG.warning('All of items will be deleted.')
             filters = {}
 
-        result = self.db_table.delete_many(filters)
+        self.flush_pending()
+        result = self.db_table.delete_many(self.scoped(filters))
         return self.__result_of_delete(result)
 
-    def query_one(self, primary_key, *args, **kwargs):
-        result = self.db_table.find_one({self.primary_key: primary_key}, *args, **kwargs)
-        return [ModelSet(**result)] if result else []
-
-    def query_many(self, filters, *args, **kwargs):
-        cursor = self.db_table.find(filters, *args, **kwargs)
-        result = [ModelSet(**res) for res in cursor.limit(0)]
+    def query_one(self, primary_key, *args, profile=None, **kwargs):
+        self.flush_pending()
+        args = self.projected(args, profile)
+        result = self.db_table.find_one(self.scoped({self.primary_key: primary_key}), *args, **kwargs)
+        return [ModelSet.view(result)] if result else []
+
+    def query_many(self, filters, *args, profile=None, **kwargs):
+        self.flush_pending()
+        args = self.projected(args, profile)
+        cursor = self.db_table.find(self.scoped(filters), *args, **kwargs)
+        result = [ModelSet.view(res) for res in cursor.limit(0)]
         return result if result else []
 
-    def sort(self, key, descending=True, filters={}):
+    def sort(self, key, descending=True, filters={}, profile=None):
+        self.flush_pending()
+        cursor = self.db_table.find(self.scoped(filters), *self.projected((), profile))
         if descending:
-            result = self.db_table.find(filters).sort([(key, pymongo.DESCENDING)]).limit(0)
+            result = cursor.sort([(key, pymongo.DESCENDING)]).limit(0)
         else:
-            result = self.db_table.find(filters).sort([(key, pymongo.ASCENDING)]).limit(0)
+            result = cursor.sort([(key, pymongo.ASCENDING)]).limit(0)
 
-        result = [ModelSet(**res) for res in result.limit(1)]
+        result = [ModelSet.view(res) for res in result.limit(1)]
         return result
 
-    def query_many(self, filters, *args, **kwargs):
-        cursor = self.db_table.find(filters, *args, **kwargs)
-        result = [ModelSet(**res) for res in cursor.limit(0)]
-        return result if result else []
+    def batch(self, operation):
+        """
+        Description: add the write operation to the unit of work of current thread.
+        :param operation: pymongo write operation
+        :return: False if no unit of work is working, the operation should be written directly
+        """
+        unit = UnitOfWork.current()
+        if unit is None:
+            return False
+
+        unit.add(self.db_table, operation)
+        return True
+
+    def flush_pending(self):
+        """
+        Description: write the pending operations of this table before it is read or written directly
+        :return:
+        """
+        unit = UnitOfWork.current()
+        if unit is not None:
+            unit.flush(self.db_table)
+
+    def projected(self, args, profile):
+        """
+        Description: use the fields of the projection profile as the projection of the query
+        :param args: positional arguments of the query, projection is the first one
+        :param profile: name of the projection profile declared by the table
+        :return: arguments of the query
+        """
+        if profile is None:
+            return args
+
+        if args:
+            raise ValueError('Projection and profile<{}> could not be both specified'.format(profile))
+
+        try:
+            return (dict.fromkeys(self.projections[profile], True),)
+        except KeyError:
+            raise ValueError('Unknown projection profile<{}> of {}'.format(profile, self.__class__.__name__))
+
+    def scoped(self, filters):
+        """
+        Description: restrict the filters to the items of this table handle
+        :param filters:
+        :return:
+        """
+        scope = self.scope
+        if not scope:
+            return filters
+
+        filters = dict(filters)
+        filters.update(scope)
+        return filters
+
+    def ensure_indexes(self):
+        """
+        Description: create the indexes declared by the table only once for each collection
+        :return:
+        """
+        table = self.db_table
+        collection = (table.database.name, table.name)
+        if collection in DBManager._provisioned_collections:
+            return
+
+        with DBManager._provision_lock:
+            if collection in DBManager._provisioned_collections:
+                return
+
+            for keys, options in self.indexes:
+                table.create_index(keys, **options)
+            DBManager._provisioned_collections.add(collection)
+            LOG.debug('Indexes of collection {} are provisioned'.format(collection))
 
     def is_all(self, filters):
         return 'all' == filters.get(self.primary_key)
@@ -294,6 +540,34 @@ class DBManager(object):
     def primary_key(self):
         return None
 
+    @property
+    def scope(self):
+        """
+        Description: fields shared by all items of this table handle, such as the channel of the trades in the shared
+                     trade collection. They are added to the new items and to the filters of all operations.
+        :return: dict
+        """
+        return {}
+
+    @property
+    def projections(self):
+        """
+        Description: named field lists for the queries which only need part of the item, passed by 'profile'
+        :return: {profile name: list of fields}
+        """
+        return {}
+
+    @property
+    def indexes(self):
+        """
+        Description: indexes of the table. Sub-class could extend this with the compound indexes.
+        :return: list of (keys, options) passed to create_index
+        """
+        if self.primary_key:
+            return [([(self.primary_key, pymongo.ASCENDING)], {'unique': True})]
+
+        return []
+
     def __result_of_delete(self, result):
         if 0 >= result.deleted_count:
             LOG.info('No table items are deleted.')
@@ -327,5 +601,9 @@ class DBManager(object):
             LOG.warning('Primary key MUST not be changed.')
             kwargs.pop(self.primary_key)
 
-        result = self.db_table.update_one({self.primary_key: primary_key}, {'$inc': kwargs, '$set': self.update_at}, True)
+        update = {'$inc': kwargs, '$set': self.update_at}
+        if self.batch(UpdateOne(self.scoped({self.primary_key: primary_key}), update, upsert=True)):
+            return EnumStatusCode.OK
+
+        result = self.db_table.update_one(self.scoped({self.primary_key: primary_key}), update, True)
         return self.__result_of_update(result)
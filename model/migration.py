@@ -0,0 +1,114 @@
+# --*-- coding : utf-8 --*--
+"""Author: Trinity Core Team 
+
+MIT License
+
+Copyright (c) 2018 Trinity
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+import argparse
+from pymongo import ReplaceOne
+from common.log import LOG
+from .transaction_model import TBLTransaction
+
+
+LEGACY_TRADE_PREFIX = 'transaction'
+ARCHIVED_TRADE_PREFIX = 'migrated_'
+
+
+def legacy_trade_collections():
+    """
+
+    :return: names of the per-channel collections 'transaction<channel_name>' which are not migrated yet
+    """
+    return [collection for collection in TBLTransaction.table_handle().list_collections()
+            if collection.startswith(LEGACY_TRADE_PREFIX)]
+
+
+def migrate_trade_collections(drop=False, batch_size=500, archive=False):
+    """
+    Description: move the trades from the per-channel collections 'transaction<channel_name>' into the shared trade
+                 collection. It could be run repeatedly, since the trades are upserted by (channel_name, nonce).
+    :param drop: drop the per-channel collections after their trades are moved
+    :param batch_size: number of trades written by one bulk operation
+    :param archive: rename the per-channel collections to 'migrated_transaction<channel_name>' after their trades are
+                    moved, so they are kept but never migrated again
+    :return: dict of channel name and number of trades moved
+    """
+    trade_table = TBLTransaction.table_handle()
+    trade_table.ensure_indexes()
+
+    prefix = LEGACY_TRADE_PREFIX
+    migrated = {}
+    for collection in legacy_trade_collections():
+        channel_name = collection[len(prefix):]
+        requests = []
+        count = 0
+        for trade in trade_table.client.trans_db[collection].find():
+            trade.pop('_id', None)
+            trade.update({'channel_name': channel_name})
+            requests.append(ReplaceOne({'channel_name': channel_name, 'nonce': trade.get('nonce')}, trade, upsert=True))
+
+            if batch_size <= len(requests):
+                trade_table.db_table.bulk_write(requests, ordered=False)
+                count += len(requests)
+                requests = []
+
+        if requests:
+            trade_table.db_table.bulk_write(requests, ordered=False)
+            count += len(requests)
+
+        migrated.update({channel_name: count})
+        LOG.info('Moved {} trades of channel<{}>'.format(count, channel_name))
+
+        if drop:
+            trade_table.client.trans_db.drop_collection(collection)
+        elif archive:
+            trade_table.client.trans_db[collection].rename(ARCHIVED_TRADE_PREFIX + collection)
+
+    return migrated
+
+
+def migrate_legacy_trades():
+    """
+    Description: called at startup. The trades of the per-channel collections left by the old version are invisible
+                 to the shared trade collection, so they are moved before any channel is handled.
+    :return: dict of channel name and number of trades moved
+    """
+    if not legacy_trade_collections():
+        return {}
+
+    LOG.info('Found trades in the per-channel collections. Move them into the shared trade collection')
+    migrated = migrate_trade_collections(archive=True)
+    LOG.info('{} trades of {} channels are migrated'.format(sum(migrated.values()), len(migrated)))
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Move the trades of per-channel collections into one collection')
+    parser.add_argument("--drop", action="store_true", default=False,
+                        help="Drop the per-channel collections after migration")
+    args = parser.parse_args()
+
+    migrated = migrate_trade_collections(args.drop)
+    print('{} trades of {} channels are migrated'.format(sum(migrated.values()), len(migrated)))
+
+
+if __name__ == "__main__":
+    main()
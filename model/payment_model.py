@@ -31,6 +31,9 @@ class TBLPayment(DBManager):
         Created         : 2018-02-13
         Modified        : 2018-03-21
     """
+    def __init__(self, collection):
+        self.__collection = collection
+
     def add_one(self, hashcode:str, channel, rcode=None, payment=0, receiver=None):
         """
 
@@ -52,8 +55,9 @@ class TBLPayment(DBManager):
     def db_table(self):
         return self.client.trans_db[self.collection]
 
-    def set_collection(self, collection):
-        self.collection = collection
+    @property
+    def collection(self):
+        return self.__collection
 
     def list_collections(self):
         return self.client.trans_db.list_collection_names()
@@ -67,10 +71,10 @@ class TBLPayment(DBManager):
 
 
 class APIPayment(object):
-    table = TBLPayment()
 
     def __init__(self, payment_index:str):
-        self.table.set_collection('payment')
+        # payments of all channels are in the same collection
+        self.table = TBLPayment.table_handle('payment')
 
     def add_payment(self, *args, **kwargs):
         return self.table.add_one(**kwargs)
@@ -22,9 +22,11 @@ AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
 LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE."""
-from .manager import DBManager, rpc_response, connection_singleton
-from .base_enum import EnumAssetType, EnumChannelState
+from threading import Event, Lock, Thread
+from .manager import DBManager, ModelSet, rpc_response, connection_singleton
+from .base_enum import EnumAssetType, EnumChannelState, EnumStatusCode
 from common.log import LOG
+from trinity import DATABASE_CONFIG as cfg
 
 
 class TBLStatistics(DBManager):
@@ -42,6 +44,15 @@ class TBLStatistics(DBManager):
 
     def update(self, address, **kwargs):
 
+        return super(TBLStatistics, self).update_one_statistics(address, **self.counters_of(**kwargs))
+
+    @staticmethod
+    def counters_of(**kwargs):
+        """
+        Description: convert the event to the increments of the statistics counters
+        :param kwargs: event, such as state=<channel state>, rsmc='rsmc', payment=<payment>, payer=<bool>
+        :return: {counter: increment}
+        """
         keys = kwargs.keys()
         if 'state' in keys:
             state = kwargs.pop('state', None)
@@ -85,7 +96,7 @@ class TBLStatistics(DBManager):
             kwargs.pop('htlc_rcode', True)
             kwargs.update({'htlc_successed': 1})
 
-        return  super(TBLStatistics, self).update_one_statistics(address, **kwargs)
+        return kwargs
 
     def remove_unsupported_asset(self, asset):
         if not asset:
@@ -130,8 +141,142 @@ class TBLStatistics(DBManager):
                 'total_htlc_transaction', 'htlc_successed', 'total_free']
 
 
+class StatisticsAggregator(object):
+    """
+        Descriptions    : Merge the increments of the statistics counters in memory, and write them to the table by a
+                          background thread every interval seconds or once threshold increments are merged.
+    """
+    def __init__(self, table, interval=5, threshold=100):
+        """
+
+        :param table: statistics table
+        :param interval: seconds between two flushes
+        :param threshold: count of the merged increments to flush immediately
+        """
+        self.table = table
+        self.interval = interval
+        self.threshold = threshold
+
+        self.flushes = 0
+        self.failures = 0
+
+        self._counters = {}     # address: {counter: increment}
+        self._merged = 0
+        self._lock = Lock()
+        self._flush_lock = Lock()
+        self._wakeup = Event()
+        self._stopped = Event()
+        self._thread = None
+
+    def add(self, address, counters):
+        """
+        Description: merge the increments of the counters of the address.
+        :param address: wallet address
+        :param counters: {counter: increment}
+        :return:
+        """
+        if not counters:
+            return
+
+        with self._lock:
+            is_full = self._merge(address, counters)
+
+        # the background thread is never restarted after stopped, the increments are kept until flushed
+        if self._stopped.is_set():
+            return
+
+        self.start()
+        if is_full:
+            self._wakeup.set()
+
+    def _merge(self, address, counters):
+        merged = self._counters.setdefault(address, {})
+        for counter, increment in counters.items():
+            merged[counter] = merged.get(counter, 0) + increment
+        self._merged += 1
+        return self._merged >= self.threshold
+
+    def pending(self, address):
+        """
+        :param address: wallet address
+        :return: increments of the counters which are not written to the table yet
+        """
+        with self._lock:
+            return dict(self._counters.get(address, {}))
+
+    def read(self, address, query):
+        """
+        Description: read the table together with the increments not written yet. The increments being flushed are
+                     neither pending nor written, so the flushing is waited for.
+        :param address: wallet address
+        :param query: callback to read the statistics from the table
+        :return: result of the query, pending increments of the address
+        """
+        with self._flush_lock:
+            return query(), self.pending(address)
+
+    def flush(self):
+        """
+        Description: write the merged increments to the table. The increments failed to be written are merged back to
+                     be written next time.
+        :return:
+        """
+        with self._flush_lock:
+            with self._lock:
+                counters, self._counters = self._counters, {}
+                self._merged = 0
+
+            for address, increments in counters.items():
+                try:
+                    self.table.update_one_statistics(address, **increments)
+                except Exception as error:
+                    LOG.error('Failed to write statistics of {}. Exception: {}'.format(address, error))
+                    self.failures += 1
+                    with self._lock:
+                        self._merge(address, increments)
+
+            if counters:
+                self.flushes += 1
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = Thread(target=self._run, name='StatisticsAggregator', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+        # write the left increments before exit
+        self.flush()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+    @property
+    def statistics(self):
+        with self._lock:
+            pending = self._merged
+
+        return {'pending': pending, 'flushes': self.flushes, 'failures': self.failures}
+
+
 class APIStatistics(object):
     table = TBLStatistics()
+    aggregator = StatisticsAggregator(table, cfg.get('statistics_flush_interval', 5),
+                                      cfg.get('statistics_flush_threshold', 100))
 
     @classmethod
     def add_statistics(cls, address):
@@ -139,7 +284,22 @@ class APIStatistics(object):
 
     @classmethod
     def query_statistics(cls, address, *args, **kwargs):
-        return cls.table.query_one(address, *args, **kwargs)
+        """
+        Description: the statistics in the table plus the increments not written yet.
+        """
+        statistics, pending = cls.aggregator.read(address, lambda: cls.table.query_one(address, *args, **kwargs))
+
+        if not pending:
+            return statistics
+
+        if not statistics:
+            return [ModelSet(address=address, **pending)]
+
+        item = statistics[0]
+        for counter, increment in pending.items():
+            setattr(item, counter, getattr(item, counter, 0) + increment)
+
+        return statistics
 
     @classmethod
     def batch_query_statistics(cls, filters, *args, **kwargs):
@@ -147,7 +307,18 @@ class APIStatistics(object):
 
     @classmethod
     def update_statistics(cls, address, **kwargs):
-        return cls.table.update(address, **kwargs)
+        """
+        Description: the increments are merged in memory and written to the table in the background.
+        """
+        cls.aggregator.add(address, cls.table.counters_of(**kwargs))
+        return EnumStatusCode.OK
+
+    @classmethod
+    def flush_statistics(cls, timeout=None):
+        """
+        Description: stop the background flushing and write all of the increments, such as when the wallet quits.
+        """
+        cls.aggregator.stop(timeout)
 
     @classmethod
     def batch_update_statistics(cls, filters, **kwargs):
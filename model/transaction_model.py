@@ -22,15 +22,30 @@ AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
 LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE."""
+import pymongo
 from .manager import DBManager, rpc_response, connection_singleton
 
 
 class TBLTransaction(DBManager):
     """
-        Descriptions    :
+        Descriptions    : Trades of all channels are kept in one collection, and each trade is identified by
+                          (channel_name, nonce). The table handle is bound to one channel by channel_name.
         Created         : 2018-02-13
         Modified        : 2018-03-21
     """
+    collection = 'trade'
+
+    def __init__(self, channel_name=None):
+        """
+
+        :param channel_name: None means the trades of all channels
+        """
+        self.__channel_name = channel_name
+
+    @property
+    def channel_name(self):
+        return self.__channel_name
+
     def add_one(self, nonce:int, **kwargs):
         """
 
@@ -49,25 +64,36 @@ class TBLTransaction(DBManager):
     def db_table(self):
         return self.client.trans_db[self.collection]
 
-    def set_collection(self, collection):
-        self.collection = collection
-
     @property
     def primary_key(self):
         return 'nonce'
 
+    @property
+    def scope(self):
+        return {'channel_name': self.channel_name} if self.channel_name else {}
+
+    @property
+    def projections(self):
+        return {
+            'nonce_state': ['channel_name', 'nonce', 'state'],
+        }
+
+    @property
+    def indexes(self):
+        # nonce is only unique in the channel. The latest trade in the specified states is sought by the second one.
+        return [
+            ([('channel_name', pymongo.ASCENDING), ('nonce', pymongo.ASCENDING)], {'unique': True}),
+            ([('channel_name', pymongo.ASCENDING), ('state', pymongo.ASCENDING), ('nonce', pymongo.DESCENDING)], {}),
+        ]
+
     def list_collections(self):
         return self.client.trans_db.list_collection_names()
 
-    def delete_collection(self, collection_index):
-        return self.client.trans_db.drop_collection(collection_index)
-
 
 class APITransaction(object):
-    table = TBLTransaction()
 
     def __init__(self, transaction_index:str):
-        self.table.set_collection('transaction'+transaction_index)
+        self.table = TBLTransaction.table_handle(transaction_index)
 
     def add_transaction(self, *args, **kwargs):
         return self.table.add_one(*args, **kwargs)
@@ -81,8 +107,8 @@ class APITransaction(object):
     def query_transaction(self, transaction, *args, **kwargs):
         return self.table.query_one(transaction, *args, **kwargs)
 
-    def sort(self, key, descending=True, filters={}):
-        return self.table.sort(key, descending, filters)
+    def sort(self, key, descending=True, filters={}, profile=None):
+        return self.table.sort(key, descending, filters, profile)
 
     def batch_query_transaction(self, filters, *args, **kwargs):
         return self.table.query_many(filters, *args, **kwargs)
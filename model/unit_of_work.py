@@ -0,0 +1,250 @@
+"""Author: Trinity Core Team 
+
+MIT License
+
+Copyright (c) 2018 Trinity
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+import time
+from collections import OrderedDict
+from threading import Event, Lock, local
+from pymongo.errors import BulkWriteError
+from common.exceptions import UnitOfWorkException
+from common.log import LOG
+from common.singleton import SingletonClass
+
+
+def bulk_write(collection, operations):
+    """
+    Description: write the operations to the collection in order. The failed operation is logged and skipped like the
+                 single writes, and the following operations are still written.
+    :param collection: pymongo collection
+    :param operations: list of pymongo write operations, such as InsertOne, UpdateOne
+    :return: count of the failed operations
+    """
+    failures = 0
+    while operations:
+        try:
+            collection.bulk_write(operations, ordered=True)
+            break
+        except BulkWriteError as error:
+            write_error = error.details.get('writeErrors', [{}])[0]
+            index = write_error.get('index', len(operations) - 1)
+            LOG.error('Failed to write {} to collection {}. Error: {}'.format(operations[index], collection.full_name,
+                                                                              write_error.get('errmsg')))
+            failures += 1
+            operations = operations[index+1:]
+        except Exception as error:
+            LOG.error('Failed to write {} operations to collection {}. Exception: {}'.format(len(operations),
+                                                                                           collection.full_name, error))
+            failures += len(operations)
+            break
+
+    return failures
+
+
+class _CommitBatch(object):
+    def __init__(self):
+        self.collections = OrderedDict()    # (database name, collection name): [collection, operations]
+        self.done = Event()
+        self.failures = 0
+
+    def extend(self, collections):
+        for key, (collection, operations) in collections.items():
+            self.collections.setdefault(key, [collection, []])[1].extend(operations)
+
+    def flush(self):
+        try:
+            for collection, operations in self.collections.values():
+                self.failures += bulk_write(collection, operations)
+        finally:
+            self.done.set()
+
+
+class GroupCommitter(metaclass=SingletonClass):
+    """
+        Descriptions    : Commit the writes of the units of work finished in the same window by one bulk_write for
+                          each collection. The first unit in the window waits the window and commits for all others.
+    """
+    def __init__(self, window):
+        """
+
+        :param window: seconds to collect the writes of other units
+        """
+        self.window = window
+        self.commits = 0
+        self.units = 0
+
+        self._batch = None
+        self._lock = Lock()
+
+    def commit(self, collections):
+        """
+        Description: block the caller until its writes are committed.
+        :param collections: {(database name, collection name): [collection, operations]}
+        :return: count of the failed operations of the whole group, since they could not be told apart by units
+        """
+        with self._lock:
+            batch = self._batch
+            is_leader = batch is None
+            if is_leader:
+                batch = self._batch = _CommitBatch()
+            batch.extend(collections)
+            self.units += 1
+
+        if not is_leader:
+            batch.done.wait()
+            return batch.failures
+
+        time.sleep(self.window)
+        with self._lock:
+            self._batch = None
+            self.commits += 1
+
+        batch.flush()
+        return batch.failures
+
+    @property
+    def statistics(self):
+        return {'commits': self.commits, 'units': self.units}
+
+
+class UnitOfWork(object):
+    """
+        Descriptions    : Accumulate the writes of the tables in current thread, and flush them by bulk_write when the
+                          unit is finished. The pending writes of one collection are flushed before the collection is
+                          read or written by the non-batched operations, so the thread could always read its writes.
+                          The units nested in the working one are merged into it.
+                          The callbacks registered by after_flush are called once the writes of their collection are
+                          flushed, and the failed writes are raised as UnitOfWorkException.
+
+                          with UnitOfWork():
+                              Channel.add_trade(...)
+                              APIStatistics.update_statistics(...)
+    """
+    _local = local()
+
+    def __init__(self, group_commit_window=0):
+        """
+
+        :param group_commit_window: seconds to wait for the writes of other units to be committed together.
+                                    0 means the writes are flushed once the unit is finished.
+        """
+        self.group_commit_window = group_commit_window
+        self.collections = OrderedDict()
+        self.callbacks = OrderedDict()      # (database name, collection name): [callbacks after flush]
+        self._is_outermost = False
+
+    def __enter__(self):
+        if self.current() is None:
+            self._is_outermost = True
+            self._local.unit = self
+            return self
+
+        return self.current()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if not self._is_outermost:
+            return False
+
+        # the writes before the exception are committed like the single writes
+        self._local.unit = None
+        self._is_outermost = False
+        try:
+            self.commit()
+        except UnitOfWorkException as error:
+            if exc_type is None:
+                raise
+            LOG.error(error)
+        return False
+
+    @classmethod
+    def current(cls):
+        return getattr(cls._local, 'unit', None)
+
+    def add(self, collection, operation):
+        key = (collection.database.name, collection.name)
+        self.collections.setdefault(key, [collection, []])[1].append(operation)
+
+    def after_flush(self, collection, callback):
+        """
+        Description: call back once the pending writes of the collection are flushed, no matter they are failed or not
+        :param collection: pymongo collection
+        :param callback: callable without arguments, such as dropping the cached items written by this unit
+        :return:
+        """
+        self.callbacks.setdefault((collection.database.name, collection.name), []).append(callback)
+
+    def flush(self, collection=None):
+        """
+        Description: write the pending operations right now.
+        :param collection: only flush the operations of this collection if specified
+        :return:
+        """
+        if collection is None:
+            collections, self.collections = self.collections, OrderedDict()
+            failures = 0
+            try:
+                for table, operations in collections.values():
+                    failures += bulk_write(table, operations)
+            finally:
+                self.notify(collections.keys())
+            self.check(failures)
+            return
+
+        key = (collection.database.name, collection.name)
+        pending = self.collections.pop(key, None)
+        if pending:
+            try:
+                failures = bulk_write(*pending)
+            finally:
+                self.notify([key])
+            self.check(failures)
+
+    def commit(self):
+        if not self.collections:
+            self.notify(list(self.callbacks.keys()))
+            return
+
+        if 0 < self.group_commit_window:
+            collections, self.collections = self.collections, OrderedDict()
+            try:
+                failures = GroupCommitter(self.group_commit_window).commit(collections)
+            finally:
+                self.notify(collections.keys())
+            self.check(failures)
+        else:
+            self.flush()
+
+    def notify(self, keys):
+        for key in list(keys):
+            for callback in self.callbacks.pop(key, []):
+                try:
+                    callback()
+                except Exception as error:
+                    LOG.error('Callback after flushing {} error: {}'.format(key, error))
+
+    @staticmethod
+    def check(failures):
+        if failures:
+            raise UnitOfWorkException('{} batched writes are failed'.format(failures))
+
+    @property
+    def pending(self):
+        return sum(len(operations) for _, operations in self.collections.values())
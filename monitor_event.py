@@ -1,86 +1,79 @@
-import json
+import argparse
 import time
 import redis
-from web3 import Web3, HTTPProvider
+from blockchain.web3client import Client
+from blockchain.block_head import BlockHeadSource
+from blockchain.log_indexer import ContractEventDecoder
+from blockchain.log_streamer import LogStreamer
+from common.log import LOG
 
 
-
-# pool= redis.ConnectionPool(host="localhost",port=6379,decode_responses=True)
-pool= redis.ConnectionPool(host="47.104.81.20",port=9001,decode_responses=True)
-redis_client=redis.Redis(connection_pool=pool)
-
-event_set=set()
-has_pushed=[]
-
-TOPICS_OF_ERC_TRANSFER="0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
 ADDRESS_OF_ERC721_WOB="0x5296aAF564a7a15DE46840AA2b9742C205b0A70E"
 ADDRESS_OF_ERC20_TNC="0x65096f2b7a8dc1592479f1911cd2b98dae4d2218"
 
-
-
-def push_event(to_push_message):
-    while True:
-        try:
-            redis_client.publish("monitor", to_push_message)
-            return True
-        except Exception as e:
-            print("connect redis fail lead to push fail:{}".format(to_push_message))
-            time.sleep(3)
-
-
-
-def handle_logs(logs):
-
-    tmp_dict={}
-    for item in logs:
-        print(item)
-        if item.get("address") ==ADDRESS_OF_ERC721_WOB:
-            if item.get("topics")[0].hex()==TOPICS_OF_ERC_TRANSFER:
-
-                tmp_dict["txId"]=item.get("transactionHash").hex()
-                tmp_dict["eventType"]="transfer"
-                tmp_dict["addressFrom"]="0x"+item.get("data")[26:66]
-                tmp_dict["addressTo"]="0x"+item.get("data")[90:130]
-                tmp_dict["messageType"]="monitorEthTransfer"
-                tmp_dict["tokenId"]=int("0x"+item.get("data")[130:194],16)
-                tmp_dict["timestamp"]=int(time.time())
-
-                to_push_event=json.dumps(tmp_dict)
-                if to_push_event not in has_pushed:
-
-                    result=push_event(to_push_event)
-                    if result:
-                        has_pushed.append(to_push_event)
-
-
-
-
-def get_logs(web3):
-    event_logs = web3.eth.getLogs({
-        "fromBlock": "latest",
-        "address": [ADDRESS_OF_ERC721_WOB],
-        "topics": [TOPICS_OF_ERC_TRANSFER]
-    })
-
-    return event_logs
-
-def log_loop(web3, poll_interval=0):
-    while True:
-        event_logs = get_logs(web3)
-        handle_logs(event_logs)
-        time.sleep(poll_interval)
-
-        # break
-
-
+# the arguments of the transfer event of WOB are not indexed
+ABI_OF_ERC721_WOB_TRANSFER = [
+    {
+        "anonymous": False,
+        "inputs": [
+            {"indexed": False, "name": "_from", "type": "address"},
+            {"indexed": False, "name": "_to", "type": "address"},
+            {"indexed": False, "name": "_tokenId", "type": "uint256"}
+        ],
+        "name": "Transfer",
+        "type": "event"
+    }
+]
+
+
+def format_transfer(event_name, args, log):
+    return {
+        "txId": log.get("transactionHash"),
+        "eventType": "transfer",
+        "addressFrom": args.get("_from"),
+        "addressTo": args.get("_to"),
+        "messageType": "monitorEthTransfer",
+        "tokenId": args.get("_tokenId"),
+        "timestamp": int(time.time())
+    }
 
 
 def main():
-    # w3 = Web3(HTTPProvider('http://192.168.214.178:8545'))
-    # w3 = Web3(HTTPProvider('https://mainnet.infura.io/pZc5ZTRYM8wYfRPtoQal'))
-    w3 = Web3(HTTPProvider('https://ropsten.infura.io/pZc5ZTRYM8wYfRPtoQal'))
-    log_loop(w3)
+    parser = argparse.ArgumentParser(description='Publish the transfer events of WOB to redis')
+    parser.add_argument("--eth-url", default='https://ropsten.infura.io/pZc5ZTRYM8wYfRPtoQal',
+                        help="HTTP url of the full-node, such as http://localhost:8545 of the local chain")
+    parser.add_argument("--ws-url", default=None, help="Websocket url of the full-node to subscribe newHeads")
+    parser.add_argument("--redis-host", default="47.104.81.20")
+    parser.add_argument("--redis-port", type=int, default=9001)
+    parser.add_argument("--channel", default="monitor", help="Redis channel to publish the events")
+    parser.add_argument("--window", type=int, default=1000, help="Blocks queried by one eth_getLogs")
+    parser.add_argument("--confirmations", type=int, default=6,
+                        help="Blocks behind the head that the events are published")
+    parser.add_argument("--stats-interval", type=int, default=60, help="Seconds to log the statistics")
+    args = parser.parse_args()
+
+    pool = redis.ConnectionPool(host=args.redis_host, port=args.redis_port, decode_responses=True)
+    client = Client(args.eth_url)
+    cursor_key = '{}:cursor:{}'.format(args.channel, ADDRESS_OF_ERC721_WOB.lower())
+
+    streamer = LogStreamer(redis.Redis(connection_pool=pool), ContractEventDecoder(ABI_OF_ERC721_WOB_TRANSFER),
+                           lambda from_block, to_block, topics: client.get_logs(from_block, to_block,
+                                                                                ADDRESS_OF_ERC721_WOB, topics),
+                           format_transfer, args.channel, cursor_key, args.window, args.confirmations)
+    block_head = BlockHeadSource(client.get_block_count, args.ws_url)
+    block_head.start()
+    streamer.start(block_head)
+
+    try:
+        while True:
+            time.sleep(args.stats_interval)
+            LOG.info('Log streamer statistics: {}'.format(streamer.statistics))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        streamer.stop()
+        block_head.stop()
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,71 @@
+# --*-- coding : utf-8 --*--
+"""Author: Trinity Core Team 
+
+MIT License
+
+Copyright (c) 2018 Trinity
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+import unittest
+from unittest import mock
+from common.exceptions import GoTo
+from model.manager import ModelSet
+from wallet.transaction.message import TransactionBase
+
+
+class BalanceUpdateTestFactory(unittest.TestCase):
+    """
+        Test Suite for the compare-and-set update of the channel balance
+    """
+    def setUp(self):
+        patcher = mock.patch('wallet.transaction.message.Channel')
+        self.channel_class = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def channel(payer_balance, payee_balance):
+        return ModelSet(balance={'0xa': {'TNC': payer_balance}, '0xb': {'TNC': payee_balance}}, hlock={})
+
+    def test_retry_with_new_balance(self):
+        # the balance is changed by another trade between the read and the compare-and-set
+        self.channel_class.side_effect = [self.channel('100', '0'), self.channel('90', '10')]
+        self.channel_class.compare_and_set_channel.side_effect = [None, self.channel('85', '15')]
+
+        channel = TransactionBase.update_balance_for_channel('channel-1', 'tnc', '0xa', '0xb', 5)
+        self.assertEqual('85', channel.balance['0xa']['TNC'])
+
+        # the channel is read again, and the new values are guarded by the new balance
+        self.assertEqual(2, self.channel_class.call_count)
+        first, second = [call[0] for call in self.channel_class.compare_and_set_channel.call_args_list]
+        self.assertEqual(('channel-1', {'balance.0xa.TNC': '100', 'balance.0xb.TNC': '0'},
+                          {'balance.0xa.TNC': '95', 'balance.0xb.TNC': '5'}), first)
+        self.assertEqual(('channel-1', {'balance.0xa.TNC': '90', 'balance.0xb.TNC': '10'},
+                          {'balance.0xa.TNC': '85', 'balance.0xb.TNC': '15'}), second)
+
+    def test_give_up_after_retries(self):
+        self.channel_class.side_effect = lambda channel_name: self.channel('100', '0')
+        self.channel_class.compare_and_set_channel.return_value = None
+
+        self.assertRaises(GoTo, TransactionBase.update_balance_for_channel, 'channel-1', 'TNC', '0xa', '0xb', 5)
+        self.assertEqual(TransactionBase._balance_update_retries,
+                         self.channel_class.compare_and_set_channel.call_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,198 @@
+# --*-- coding : utf-8 --*--
+"""Author: Trinity Core Team 
+
+MIT License
+
+Copyright (c) 2018 Trinity
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+import json
+import time
+import unittest
+from threading import Thread
+from unittest import mock
+from blockchain.block_head import BlockHeightCache, BlockHeadSource
+
+
+class BlockHeightCacheTestFactory(unittest.TestCase):
+    """
+        Test Suite for the shared block height
+    """
+    def setUp(self):
+        self.block_count = 100
+        self.fetch_count = 0
+
+        if hasattr(BlockHeightCache, '_singleton_instance'):
+            del BlockHeightCache._singleton_instance
+        self.cache = BlockHeightCache(self.fetch_block_count, max_staleness=0.1)
+
+    def tearDown(self):
+        del BlockHeightCache._singleton_instance
+
+    def fetch_block_count(self):
+        self.fetch_count += 1
+        return self.block_count
+
+    def test_hit_and_miss(self):
+        self.assertEqual(100, self.cache.get())
+        self.block_count = 101
+        self.assertEqual(100, self.cache.get())
+        self.assertEqual(1, self.fetch_count)
+        self.assertEqual({'hits': 1, 'misses': 1, 'hit_ratio': 0.5}, self.cache.statistics)
+
+    def test_stale_height(self):
+        self.cache.get()
+        self.block_count = 101
+        time.sleep(0.15)
+        self.assertFalse(self.cache.is_valid())
+        self.assertEqual(101, self.cache.get())
+        self.assertEqual(2, self.fetch_count)
+
+    def test_fresh_height(self):
+        self.cache.get()
+        self.block_count = 101
+        self.assertEqual(101, self.cache.get(fresh=True))
+        self.assertEqual(2, self.fetch_count)
+
+    def test_update_with_older_height(self):
+        self.cache.update(100)
+        self.cache.update(99)
+        self.assertEqual(100, self.cache.get())
+        self.assertEqual(0, self.fetch_count)
+
+
+class FakeConnection(object):
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.sent = []
+        self.closed = False
+
+    def send(self, message):
+        self.sent.append(json.loads(message))
+
+    def recv(self):
+        if not self.messages:
+            raise ConnectionError('connection is lost')
+        return json.dumps(self.messages.pop(0))
+
+    def close(self):
+        self.closed = True
+
+
+class BlockHeadSourceTestFactory(unittest.TestCase):
+    """
+        Test Suite for the block head source
+    """
+    def setUp(self):
+        self.block_counts = []
+        self.new_heads = []
+
+        if hasattr(BlockHeadSource, '_singleton_instance'):
+            del BlockHeadSource._singleton_instance
+        self.source = BlockHeadSource(self.fetch_block_count, ws_url='ws://localhost:8546', min_poll_interval=1,
+                                      max_poll_interval=8, resubscribe_interval=60,
+                                      on_new_head=self.new_heads.append)
+
+    def tearDown(self):
+        self.source.stop()
+        del BlockHeadSource._singleton_instance
+
+    def fetch_block_count(self):
+        return self.block_counts.pop(0) if 1 < len(self.block_counts) else self.block_counts[0]
+
+    def test_update_notify_waiter(self):
+        self.source.update(100)
+        result = []
+        waiter = Thread(target=lambda: result.append(self.source.wait_for_new_head(100, timeout=5)))
+        waiter.start()
+
+        time.sleep(0.05)
+        self.assertFalse(self.source.update(99))
+        self.assertTrue(self.source.update(101))
+        waiter.join(1)
+
+        self.assertEqual([101], result)
+        self.assertEqual([100, 101], self.new_heads)
+
+    def test_wait_for_new_head_timeout(self):
+        self.assertIsNone(self.source.wait_for_new_head(timeout=0.05))
+
+        self.source.update(100)
+        self.assertEqual(100, self.source.wait_for_new_head(timeout=0.05))
+
+        start_time = time.time()
+        self.assertEqual(100, self.source.wait_for_new_head(100, timeout=0.1))
+        self.assertGreaterEqual(time.time() - start_time, 0.1)
+
+    def test_poll_backoff(self):
+        self.block_counts = [100, 100, 100, 100, 100, 101, 101]
+        intervals = []
+
+        def wait(interval):
+            intervals.append(interval)
+            if 7 <= len(intervals):
+                self.source.stop()
+
+        self.source._stopped.wait = wait
+        self.source.poll()
+
+        # backed off while the head is stable, and reset once the head is changed
+        self.assertEqual([1, 2, 4, 8, 8, 1, 2], intervals)
+        self.assertEqual([100, 101], self.new_heads)
+
+    def test_subscribe_failure_fallback(self):
+        durations = []
+
+        def poll(duration=None):
+            durations.append(duration)
+            self.source.stop()
+
+        self.source.poll = poll
+        with mock.patch('blockchain.block_head.create_connection', side_effect=ConnectionError('refused')) as connect:
+            self.source.run()
+
+        self.assertEqual(1, connect.call_count)
+        self.assertEqual([60], durations)
+        self.assertFalse(self.source.is_subscribed)
+        self.assertIsNone(self.source._conn)
+
+    def test_subscribe_new_heads(self):
+        self.block_counts = [100]
+        conn = FakeConnection([
+            {'jsonrpc': '2.0', 'id': 1, 'result': '0x1'},
+            {'jsonrpc': '2.0', 'method': 'eth_subscription', 'params': {'subscription': '0x1',
+                                                                       'result': {'number': hex(101)}}},
+            {'jsonrpc': '2.0', 'method': 'eth_subscription', 'params': {'subscription': '0x1',
+                                                                       'result': {'number': hex(102)}}},
+        ])
+
+        with mock.patch('blockchain.block_head.create_connection', return_value=conn):
+            self.source.subscribe()
+
+        self.assertEqual('eth_subscribe', conn.sent[0].get('method'))
+        self.assertEqual([100, 101, 102], self.new_heads)
+
+        # the lost subscription is closed for polling
+        self.assertTrue(conn.closed)
+        self.assertFalse(self.source.is_subscribed)
+        self.assertIsNone(self.source._conn)
+
+
+if __name__ == '__main__':
+    unittest.main()
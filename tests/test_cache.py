@@ -0,0 +1,75 @@
+# --*-- coding : utf-8 --*--
+"""Author: Trinity Core Team 
+
+MIT License
+
+Copyright (c) 2018 Trinity
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+import unittest
+from model.cache import DocumentCache
+
+
+class DocumentCacheTestFactory(unittest.TestCase):
+    """
+        Test Suite for the table cache
+    """
+    def setUp(self):
+        self.cache = DocumentCache(capacity=2)
+        self.channel = {'channel': 'channel-1', 'state': 'OPENED', 'balance': {'addr': {'TNC': '10'}}}
+
+    def test_copy_on_get(self):
+        self.cache.put('channel-1', self.channel)
+        self.cache.get('channel-1')['balance']['addr']['TNC'] = '0'
+        self.assertEqual('10', self.cache.get('channel-1')['balance']['addr']['TNC'])
+
+    def test_lru_eviction(self):
+        self.cache.put('channel-1', self.channel)
+        self.cache.put('channel-2', self.channel)
+        self.cache.get('channel-1')
+        self.cache.put('channel-3', self.channel)
+
+        self.assertIsNone(self.cache.get('channel-2'))
+        self.assertIsNotNone(self.cache.get('channel-1'))
+
+    def test_invalidate(self):
+        self.cache.put('channel-1', self.channel)
+        self.cache.put('channel-2', self.channel)
+        self.cache.invalidate('channel-1')
+        self.assertIsNone(self.cache.get('channel-1'))
+        self.assertIsNotNone(self.cache.get('channel-2'))
+
+        self.cache.invalidate()
+        self.assertIsNone(self.cache.get('channel-2'))
+
+    def test_stale_put_ignored(self):
+        generation = self.cache.generation
+        self.cache.invalidate('channel-1')
+        self.cache.put('channel-1', self.channel, generation)
+        self.assertIsNone(self.cache.get('channel-1'))
+
+    def test_hit_ratio(self):
+        self.cache.get('channel-1')
+        self.cache.put('channel-1', self.channel)
+        self.cache.get('channel-1')
+        self.assertEqual(0.5, self.cache.statistics.get('hit_ratio'))
+
+
+if __name__ == '__main__':
+    unittest.main()
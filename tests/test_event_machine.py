@@ -0,0 +1,198 @@
+# --*-- coding : utf-8 --*--
+"""Author: Trinity Core Team 
+
+MIT License
+
+Copyright (c) 2018 Trinity
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+import time
+import unittest
+from threading import Event, Lock
+from unittest import mock
+from wallet.event.event import EventBase, EventMachine, EnumEventType
+
+
+class EventStandIn(EventBase):
+    """
+        Event recording its handling by the tag. It's finished by the prepare stage unless finish is False, and its
+        handling could be blocked until the gate is opened.
+    """
+    def __init__(self, name, event_type, records, tag=None, gate=None, finish=True):
+        super(EventStandIn, self).__init__(name, event_type)
+        self.records = records
+        self.tag = tag or name
+        self.gate = gate
+        self.finish = finish
+
+    def prepare(self, block_height, *args, **kwargs):
+        self.records.append(('start', self.tag, block_height))
+        if self.gate:
+            self.gate.wait(5)
+        self.records.append(('end', self.tag, block_height))
+
+        while self.finish and not self.is_event_completed():
+            self.next_stage()
+
+
+class EventMachineTestFactory(unittest.TestCase):
+    """
+        Test Suite for the event machine
+    """
+    def setUp(self):
+        patcher = mock.patch('wallet.event.event.ContractEventInterface')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.machine = EventMachine(workers=1, urgent_workers=1)
+        self.records = []
+
+    def tearDown(self):
+        self.machine.stop(timeout=1)
+
+    def new_event(self, name, event_type=EnumEventType.EVENT_TYPE_RSMC, **kwargs):
+        return EventStandIn(name, event_type, self.records, **kwargs)
+
+    def handle_until(self, block_height, condition, timeout=5):
+        end_time = time.time() + timeout
+        while not condition() and time.time() < end_time:
+            self.machine.handle(block_height)
+            time.sleep(0.01)
+
+    def handle_for_a_while(self, block_height, times=10):
+        for _ in range(times):
+            self.machine.handle(block_height)
+            time.sleep(0.01)
+
+    def started(self, block_height=None):
+        return [tag for action, tag, height in self.records
+                if 'start' == action and (block_height is None or block_height == height)]
+
+    def test_order_by_wake_height(self):
+        for name, wake_height in [('channel-1', 103), ('channel-2', 101), ('channel-3', 102)]:
+            self.machine.insert_event_back_into_queue(name, self.new_event(name), wake_height)
+
+        self.handle_until(101, lambda: self.started(101))
+        self.handle_for_a_while(101)
+        self.assertEqual(['channel-2'], self.started())
+
+        self.handle_until(103, lambda: 3 <= len(self.started()))
+        self.assertEqual(['channel-2', 'channel-3', 'channel-1'], self.started())
+        self.assertTrue(self.machine.is_queue_empty())
+
+    def test_sleep_until_deadline(self):
+        event = self.new_event('channel-1', EnumEventType.EVENT_TYPE_END_SETTLE)
+        event.sleep_until(110)
+        self.machine.handle(100)
+        self.machine.schedule_event('channel-1', event)
+        self.assertEqual(1, self.machine.statistics.get('sleeping'))
+
+        for block_height in range(100, 110):
+            self.handle_for_a_while(block_height, 2)
+        self.assertEqual([], self.started())
+        self.assertFalse(self.machine.is_queue_empty())
+
+        self.handle_until(110, lambda: self.started())
+        self.assertEqual(['channel-1'], self.started(110))
+        self.assertEqual(0, self.machine.statistics.get('sleeping'))
+
+    def test_sleeping_event_not_replaced(self):
+        settle = self.new_event('channel-1', EnumEventType.EVENT_TYPE_END_SETTLE, tag='settle')
+        settle.sleep_until(110)
+        self.machine.handle(100)
+        self.machine.schedule_event('channel-1', settle)
+
+        # the other events of the same channel registered in the settle window
+        self.machine.register_event('channel-1', self.new_event('channel-1', EnumEventType.EVENT_TYPE_HTLC_UNLOCK,
+                                                                tag='unlock'))
+        self.machine.trigger_start_event('channel-1')
+        self.handle_until(105, lambda: self.started())
+
+        gate = Event()
+        self.machine.register_event('channel-1', self.new_event('channel-1', tag='rsmc', gate=gate))
+        self.machine.trigger_start_event('channel-1')
+        self.handle_until(109, lambda: 'rsmc' in self.started())
+
+        # the settle event keeps sleeping until the event of the same channel is finished
+        self.handle_for_a_while(110)
+        self.assertEqual(['unlock', 'rsmc'], self.started())
+
+        gate.set()
+        self.handle_until(110, lambda: 'settle' in self.started())
+        self.assertEqual(['unlock', 'rsmc', 'settle'], self.started())
+
+    def test_missed_wakeup(self):
+        gate = Event()
+        self.machine.register_event('channel-1', self.new_event('channel-1', gate=gate, finish=False))
+        self.machine.trigger_start_event('channel-1')
+        self.handle_until(100, lambda: self.started())
+
+        # woken up while it's being handled, so it's handled again once it's inserted back
+        self.machine.wake_event('channel-1')
+        gate.set()
+        self.handle_until(100, lambda: 2 <= len(self.started()))
+        self.assertEqual(['channel-1', 'channel-1'], self.started(100))
+
+        # the wakeup of the event which isn't being handled is not kept for the event registered later
+        self.machine.wake_event('channel-2')
+        self.machine.register_event('channel-2', self.new_event('channel-2'))
+        self.handle_for_a_while(100)
+        self.assertEqual(['channel-1', 'channel-1'], self.started())
+
+    def test_urgent_events_not_blocked_by_normal(self):
+        gate = Event()
+        self.machine.register_event('channel-1', self.new_event('channel-1', gate=gate))
+        self.machine.trigger_start_event('channel-1')
+        self.handle_until(100, lambda: self.started())
+
+        self.machine.register_event('channel-2', self.new_event('channel-2'))
+        self.machine.trigger_start_event('channel-2')
+        self.machine.register_event('channel-3',
+                                    self.new_event('channel-3', EnumEventType.EVENT_TYPE_PUNISH_HTLC_UNLOCK))
+        self.machine.trigger_start_event('channel-3')
+
+        # the normal worker is busy, and the urgent event is handled by its own worker
+        self.handle_until(100, lambda: 'channel-3' in self.started())
+        self.assertEqual(['channel-1', 'channel-3'], self.started())
+
+        gate.set()
+        self.handle_until(100, lambda: 'channel-2' in self.started())
+        self.assertEqual(['channel-1', 'channel-3', 'channel-2'], self.started())
+
+    def test_same_channel_never_handled_by_both_priorities(self):
+        gate = Event()
+        self.machine.register_event('channel-1', self.new_event('channel-1', tag='rsmc', gate=gate))
+        self.machine.trigger_start_event('channel-1')
+        self.handle_until(100, lambda: self.records)
+
+        # the urgent event of the same channel waits for the normal one being handled
+        self.machine.register_event('channel-1', self.new_event('channel-1', EnumEventType.EVENT_TYPE_SETTLE,
+                                                                tag='settle'))
+        self.machine.trigger_start_event('channel-1')
+        self.handle_for_a_while(100)
+        self.assertEqual([('start', 'rsmc', 100)], self.records)
+
+        gate.set()
+        self.handle_until(100, lambda: 4 <= len(self.records))
+        self.assertEqual([('start', 'rsmc', 100), ('end', 'rsmc', 100), ('start', 'settle', 100),
+                          ('end', 'settle', 100)], self.records)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+# --*-- coding : utf-8 --*--
+"""Author: Trinity Core Team 
+
+MIT License
+
+Copyright (c) 2018 Trinity
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+import time
+import unittest
+from threading import Lock
+from common.executor import SerialLaneExecutor
+
+
+class SerialLaneExecutorTestFactory(unittest.TestCase):
+    """
+        Test Suite for the serial lanes executor
+    """
+    def setUp(self):
+        self.executor = SerialLaneExecutor('TestExecutor', workers=4)
+        self.lock = Lock()
+        self.handled = {}
+
+    def tearDown(self):
+        self.executor.stop(timeout=1)
+
+    def handle(self, key, index):
+        time.sleep(0.01)
+        with self.lock:
+            self.handled.setdefault(key, []).append(index)
+
+    def wait_for_tasks(self, timeout=5):
+        end_time = time.time() + timeout
+        while self.executor.depth and time.time() < end_time:
+            time.sleep(0.01)
+
+    def test_order_in_lane(self):
+        for index in range(10):
+            for key in ['channel-1', 'channel-2', 'channel-3']:
+                self.executor.submit(key, lambda key=key, index=index: self.handle(key, index), 'Rsmc')
+        self.wait_for_tasks()
+
+        for key in ['channel-1', 'channel-2', 'channel-3']:
+            self.assertEqual(list(range(10)), self.handled.get(key))
+        self.assertEqual(30, self.executor.statistics.get('Rsmc').get('count'))
+
+    def test_lanes_in_parallel(self):
+        start_time = time.time()
+        for key in range(4):
+            self.executor.submit(key, lambda: time.sleep(0.2))
+        self.wait_for_tasks()
+
+        self.assertLess(time.time() - start_time, 0.6)
+
+    def test_error_counted(self):
+        def failed_task():
+            raise ValueError('test error')
+
+        self.executor.submit('channel-1', failed_task, 'Htlc')
+        self.executor.submit('channel-1', lambda: self.handle('channel-1', 0), 'Htlc')
+        self.wait_for_tasks()
+
+        self.assertEqual([0], self.handled.get('channel-1'))
+        self.assertEqual(1, self.executor.statistics.get('Htlc').get('errors'))
+
+    def test_stop_drops_queued_tasks(self):
+        executor = SerialLaneExecutor('StopExecutor', workers=1)
+        for index in range(5):
+            executor.submit('channel-1', lambda: time.sleep(0.1))
+        time.sleep(0.05)
+
+        executor.stop(timeout=1)
+        self.assertEqual(0, executor.depth)
+
+        # the executor works again after restart
+        executor.submit('channel-1', lambda: self.handle('channel-1', 0))
+        end_time = time.time() + 5
+        while executor.depth and time.time() < end_time:
+            time.sleep(0.01)
+        executor.stop(timeout=1)
+
+        self.assertEqual([0], self.handled.get('channel-1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
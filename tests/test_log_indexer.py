@@ -0,0 +1,97 @@
+# --*-- coding : utf-8 --*--
+"""Author: Trinity Core Team 
+
+MIT License
+
+Copyright (c) 2018 Trinity
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+import unittest
+from blockchain.log_indexer import ContractEventDecoder, ContractLogIndexer
+
+
+CLOSE_CHANNEL_ABI = {'anonymous': False, 'type': 'event', 'name': 'CloseChannel',
+                     'inputs': [{'indexed': False, 'name': 'channleId', 'type': 'bytes32'},
+                                {'indexed': False, 'name': 'invoker', 'type': 'address'},
+                                {'indexed': False, 'name': 'nonce', 'type': 'uint256'},
+                                {'indexed': False, 'name': 'blockNumber', 'type': 'uint256'}]}
+
+
+class ContractLogIndexerTestFactory(unittest.TestCase):
+    """
+        Test Suite for the contract log indexer
+    """
+    def setUp(self):
+        self.decoder = ContractEventDecoder([CLOSE_CHANNEL_ABI])
+        self.cursor = None
+        self.ranges = []
+        self.logs = {}
+        self.events = []
+        self.indexer = ContractLogIndexer(self.decoder, self.fetch_logs, lambda: self.cursor, self.save_cursor,
+                                          self.on_event, window=10, reorg_depth=3)
+
+    def fetch_logs(self, from_block, to_block, topics):
+        self.ranges.append((from_block, to_block))
+        return [log for block, log in self.logs.items() if from_block <= block <= to_block]
+
+    def save_cursor(self, block):
+        self.cursor = block
+
+    def on_event(self, block_height, event_name, args, log):
+        self.events.append((block_height, event_name, args))
+
+    def close_channel_log(self, block_height, nonce):
+        words = ['ab' * 32, '0' * 24 + '23cca051bfedb5e17d3aad2038ba0a5155d1b1b7',
+                 '{:064x}'.format(nonce), '{:064x}'.format(block_height + 100)]
+        return {'blockNumber': block_height, 'logIndex': 0, 'transactionHash': '0x1',
+                'topics': self.decoder.topics, 'data': '0x' + ''.join(words)}
+
+    def test_decode(self):
+        self.assertEqual(('CloseChannel', {'channleId': '0x' + 'ab' * 32,
+                                           'invoker': '0x23cca051bfedb5e17d3aad2038ba0a5155d1b1b7',
+                                           'nonce': 5, 'blockNumber': 200}),
+                         self.decoder.decode(self.close_channel_log(100, 5)))
+        self.assertIsNone(self.decoder.decode({'topics': ['0x' + '00' * 32], 'data': '0x'}))
+
+    def test_catch_up_by_windows(self):
+        self.cursor = 100
+        self.logs = {105: self.close_channel_log(105, 1), 120: self.close_channel_log(120, 2),
+                     126: self.close_channel_log(126, 3)}
+
+        # the blocks in the reorg depth are not indexed
+        self.assertEqual(2, self.indexer.update(127))
+        self.assertEqual([(101, 110), (111, 120), (121, 124)], self.ranges)
+        self.assertEqual([105, 120], [event[0] for event in self.events])
+        self.assertEqual(124, self.cursor)
+
+        self.indexer.update(129)
+        self.assertEqual((125, 126), self.ranges[-1])
+        self.assertEqual(126, self.events[-1][0])
+
+    def test_start_without_cursor(self):
+        self.assertEqual(0, self.indexer.update(100))
+        self.assertEqual(97, self.cursor)
+        self.assertEqual([], self.ranges)
+
+    def test_removed_log(self):
+        self.cursor = 100
+        log = self.close_channel_log(101, 1)
+        log['removed'] = True
+        self.logs = {101: log}
+        self.assertEqual(0, self.indexer.update(110))
@@ -0,0 +1,163 @@
+# --*-- coding : utf-8 --*--
+"""Author: Trinity Core Team 
+
+MIT License
+
+Copyright (c) 2018 Trinity
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+import json
+import unittest
+from blockchain.log_indexer import ContractEventDecoder
+from blockchain.log_streamer import LogStreamer
+
+
+TRANSFER_ABI = [{'anonymous': False, 'type': 'event', 'name': 'Transfer',
+                 'inputs': [{'indexed': False, 'name': '_from', 'type': 'address'},
+                            {'indexed': False, 'name': '_to', 'type': 'address'},
+                            {'indexed': False, 'name': '_tokenId', 'type': 'uint256'}]}]
+
+
+class RedisStandIn(object):
+    """
+        Redis client keeping the values and the published messages in memory
+    """
+    def __init__(self):
+        self.values = {}
+        self.messages = []
+        self.failures = 0
+        self.lost_replies = 0
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def pipeline(self, transaction=True):
+        return PipelineStandIn(self)
+
+
+class PipelineStandIn(object):
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def publish(self, channel, message):
+        self.commands.append(lambda: self.client.messages.append((channel, message)))
+
+    def set(self, key, value):
+        self.commands.append(lambda: self.client.values.update({key: str(value)}))
+
+    def execute(self):
+        if self.client.failures:
+            self.client.failures -= 1
+            raise ConnectionError('redis is down')
+
+        for command in self.commands:
+            command()
+
+        if self.client.lost_replies:
+            self.client.lost_replies -= 1
+            raise ConnectionError('connection is lost after EXEC')
+
+
+class LogStreamerTestFactory(unittest.TestCase):
+    """
+        Test Suite for the log streamer
+    """
+    def setUp(self):
+        self.redis = RedisStandIn()
+        self.decoder = ContractEventDecoder(TRANSFER_ABI)
+        self.logs = []
+        self.ranges = []
+
+    def new_streamer(self):
+        return LogStreamer(self.redis, self.decoder, self.fetch_logs,
+                           lambda event_name, args, log: {'txId': log.get('transactionHash'),
+                                                          'tokenId': args.get('_tokenId')},
+                           window=10, confirmations=2, publish_retries=1)
+
+    def fetch_logs(self, from_block, to_block, topics):
+        self.ranges.append((from_block, to_block))
+        return [log for log in self.logs if from_block <= log.get('blockNumber') <= to_block]
+
+    def transfer_log(self, block_height, token_id, log_index=0):
+        words = ['0' * 64, '0' * 64, '{:064x}'.format(token_id)]
+        return {'blockNumber': block_height, 'logIndex': log_index, 'transactionHash': '0x{}'.format(token_id),
+                'topics': self.decoder.topics, 'data': '0x' + ''.join(words)}
+
+    def published_tokens(self):
+        return [json.loads(message).get('tokenId') for _, message in self.redis.messages]
+
+    def test_publish_with_cursor(self):
+        self.redis.values['monitor:cursor'] = '100'
+        self.logs = [self.transfer_log(101, 1), self.transfer_log(115, 2, 1), self.transfer_log(115, 3, 0)]
+
+        streamer = self.new_streamer()
+        streamer.update(118)
+        self.assertEqual([(101, 110), (111, 116)], self.ranges)
+        self.assertEqual([1, 3, 2], self.published_tokens())
+        self.assertEqual('116', self.redis.values['monitor:cursor'])
+        self.assertEqual(2, streamer.statistics.get('lag'))
+
+        # restarted streamer continues from the persisted cursor
+        self.new_streamer().update(120)
+        self.assertEqual((117, 118), self.ranges[-1])
+        self.assertEqual(3, len(self.redis.messages))
+
+    def test_retry_failed_publish(self):
+        self.redis.values['monitor:cursor'] = '100'
+        self.logs = [self.transfer_log(101, 1)]
+        self.redis.failures = 1
+
+        streamer = self.new_streamer()
+        self.assertRaises(ConnectionError, streamer.update, 105)
+        self.assertEqual([], self.redis.messages)
+        self.assertEqual('100', self.redis.values['monitor:cursor'])
+
+        streamer.update(105)
+        self.assertEqual([1], self.published_tokens())
+        self.assertEqual('103', self.redis.values['monitor:cursor'])
+
+    def test_lost_reply_of_publish(self):
+        self.redis.values['monitor:cursor'] = '100'
+        self.logs = [self.transfer_log(101, 1)]
+        self.redis.lost_replies = 1
+
+        streamer = self.new_streamer()
+        streamer.update(105)
+        self.assertEqual([1], self.published_tokens())
+        self.assertEqual('103', self.redis.values['monitor:cursor'])
+
+        # the published log isn't published again in the next range
+        self.logs = [dict(self.transfer_log(101, 1), blockNumber=104)]
+        streamer.update(106)
+        self.assertEqual([1], self.published_tokens())
+        self.assertEqual(1, streamer.statistics.get('published'))
+
+    def test_deduplicate(self):
+        self.redis.values['monitor:cursor'] = '100'
+        self.logs = [self.transfer_log(101, 1)]
+
+        streamer = self.new_streamer()
+        streamer.update(105)
+
+        # the same log is found again in the next range, such as after a reorg
+        self.logs = [dict(self.transfer_log(101, 1), blockNumber=104)]
+        streamer.update(106)
+        self.assertEqual([1], self.published_tokens())
+        self.assertEqual(1, streamer.statistics.get('duplicated'))
@@ -0,0 +1,84 @@
+# --*-- coding : utf-8 --*--
+"""Author: Trinity Core Team 
+
+MIT License
+
+Copyright (c) 2018 Trinity
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+import unittest
+from blockchain.nonce import NonceManager
+
+
+class NonceManagerTestFactory(unittest.TestCase):
+    """
+        Test Suite for the local nonce allocator
+    """
+    def setUp(self):
+        self.address = '0x3aE88fe370c39384FC16dA2C9e768Cf5d2495b48'
+        self.chain_nonce = 5
+        self.fetch_count = 0
+
+        if hasattr(NonceManager, '_singleton_instance'):
+            del NonceManager._singleton_instance
+        self.nonce_manager = NonceManager(self.fetch_transaction_count)
+
+    def tearDown(self):
+        del NonceManager._singleton_instance
+
+    def fetch_transaction_count(self, address, block_identifier):
+        self.fetch_count += 1
+        return self.chain_nonce
+
+    def test_allocate_seeded_once(self):
+        self.assertEqual([5, 6, 7], [self.nonce_manager.allocate(self.address) for _ in range(3)])
+        self.assertEqual(1, self.fetch_count)
+        self.assertEqual([5, 6, 7], self.nonce_manager.pending_nonces(self.address))
+
+    def test_commit(self):
+        nonce = self.nonce_manager.allocate(self.address)
+        self.nonce_manager.commit(self.address, nonce)
+        self.assertEqual([], self.nonce_manager.pending_nonces(self.address))
+        self.assertEqual(6, self.nonce_manager.allocate(self.address))
+
+    def test_release_last_nonce(self):
+        nonce = self.nonce_manager.allocate(self.address)
+        self.nonce_manager.release(self.address, nonce, ValueError('insufficient funds'))
+        self.assertEqual(nonce, self.nonce_manager.allocate(self.address))
+        self.assertEqual(1, self.fetch_count)
+
+    def test_release_with_nonce_too_low(self):
+        nonce = self.nonce_manager.allocate(self.address)
+        self.chain_nonce = 9
+        self.nonce_manager.release(self.address, nonce, ValueError({'message': 'nonce too low'}))
+        self.assertEqual(9, self.nonce_manager.allocate(self.address))
+        self.assertEqual(2, self.fetch_count)
+
+    def test_resync_skips_pending_nonces(self):
+        first = self.nonce_manager.allocate(self.address)
+        second = self.nonce_manager.allocate(self.address)
+        self.nonce_manager.release(self.address, first, ValueError('insufficient funds'))
+
+        # gap is filled first, then the nonce being sent by others is skipped
+        self.assertEqual(first, self.nonce_manager.allocate(self.address))
+        self.assertEqual(second + 1, self.nonce_manager.allocate(self.address))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+# --*-- coding : utf-8 --*--
+"""Author: Trinity Core Team 
+
+MIT License
+
+Copyright (c) 2018 Trinity
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+import unittest
+from blockchain.receipt_tracker import ReceiptTracker, EnumReceiptState
+
+
+class ReceiptTrackerTestFactory(unittest.TestCase):
+    """
+        Test Suite for the receipt tracker
+    """
+    def setUp(self):
+        self.receipts = {}
+        self.transactions = {}
+        self.requests = []
+        self.notified = []
+        self.transaction_counts = {}
+        self.tracker = ReceiptTracker(self.fetch_receipts, self.fetch_transactions, self.fetch_transaction_count,
+                                      confirmations=2, drop_after=3)
+
+    def fetch_receipts(self, hash_list):
+        self.requests.append(('receipts', list(hash_list)))
+        return [self.receipts.get(tx_hash) for tx_hash in hash_list]
+
+    def fetch_transactions(self, hash_list):
+        self.requests.append(('transactions', list(hash_list)))
+        return [self.transactions.get(tx_hash) for tx_hash in hash_list]
+
+    def fetch_transaction_count(self, address, block_identifier):
+        return self.transaction_counts.get(address, 0)
+
+    def notify(self, tx_hash, state, receipt):
+        self.notified.append((tx_hash, state))
+
+    def test_confirm_by_one_batch(self):
+        for tx_hash in ['0x1', '0x2', '0x3']:
+            self.transactions[tx_hash] = {'hash': tx_hash}
+            self.tracker.watch(tx_hash, self.notify)
+
+        self.receipts['0x1'] = {'blockNumber': 100, 'status': 1}
+        self.tracker.update(100)
+        self.assertEqual([('receipts', ['0x1', '0x2', '0x3']), ('transactions', ['0x2', '0x3'])], self.requests)
+        self.assertEqual(EnumReceiptState.PENDING, self.tracker.get('0x1')[0])
+
+        self.tracker.update(101)
+        self.assertEqual([('0x1', EnumReceiptState.CONFIRMED)], self.notified)
+        self.assertEqual((EnumReceiptState.CONFIRMED, {'blockNumber': 100, 'status': 1}), self.tracker.get('0x1'))
+
+        # the final receipt is cached and never fetched again
+        self.requests.clear()
+        self.tracker.update(102)
+        self.assertEqual([('receipts', ['0x2', '0x3']), ('transactions', ['0x2', '0x3'])], self.requests)
+
+    def test_dropped_transaction(self):
+        self.transactions['0x1'] = {'hash': '0x1', 'from': '0xa', 'nonce': '0x5'}
+        self.tracker.watch('0x1', self.notify)
+        self.tracker.update(99)
+
+        # not found by the node, but the nonce isn't used yet
+        self.transactions.clear()
+        for block_height in range(100, 105):
+            self.tracker.update(block_height)
+            self.assertEqual(EnumReceiptState.PENDING, self.tracker.get('0x1')[0])
+
+        self.transaction_counts['0xa'] = 6
+        self.tracker.update(105)
+        self.assertEqual([('0x1', EnumReceiptState.DROPPED)], self.notified)
+
+    def test_not_dropped_by_failed_receipts(self):
+        self.transactions['0x1'] = {'hash': '0x1', 'from': '0xa', 'nonce': '0x5'}
+        self.tracker.watch('0x1', self.notify)
+        self.tracker.update(99)
+
+        self.transactions.clear()
+        self.transaction_counts['0xa'] = 6
+        for block_height in range(100, 103):
+            self.tracker.update(block_height)
+
+        # the receipt is checked again before dropping, and the failed request, such as rate limited, means nothing
+        results = iter([[None], ConnectionError('rate limited')])
+
+        def fetch_receipts(hash_list):
+            result = next(results)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        self.tracker._fetch_receipts = fetch_receipts
+        self.tracker.update(103)
+        self.assertEqual(EnumReceiptState.PENDING, self.tracker.get('0x1')[0])
+        self.assertEqual([], self.notified)
+
+    def test_not_dropped_without_nonce(self):
+        self.tracker.watch('0x1', self.notify)
+        for block_height in range(100, 110):
+            self.tracker.update(block_height)
+        self.assertEqual(EnumReceiptState.PENDING, self.tracker.get('0x1')[0])
+        self.assertEqual([], self.notified)
+
+    def test_watch_final_transaction(self):
+        self.tracker.watch('0x1', self.notify)
+        self.receipts['0x1'] = {'blockNumber': 100, 'status': 1}
+        self.tracker.update(101)
+        self.assertEqual([('0x1', EnumReceiptState.CONFIRMED)], self.notified)
+
+        # the finished transaction isn't watched again, and the watcher isn't notified again
+        self.requests.clear()
+        self.assertEqual(EnumReceiptState.CONFIRMED, self.tracker.watch('0x1', self.notify))
+        self.tracker.update(102)
+        self.assertEqual(1, len(self.notified))
+        self.assertEqual([], self.requests)
+
+    def test_watch_with_same_key(self):
+        self.tracker.watch('0x1', lambda *args: self.notify(*args), key='channel')
+        self.tracker.watch('0x1', lambda *args: self.notify(*args), key='channel')
+
+        self.receipts['0x1'] = {'blockNumber': 100, 'status': 1}
+        self.tracker.update(101)
+        self.assertEqual(1, len(self.notified))
+
+
+if __name__ == '__main__':
+    unittest.main()
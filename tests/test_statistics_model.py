@@ -0,0 +1,83 @@
+# --*-- coding : utf-8 --*--
+"""Author: Trinity Core Team 
+
+MIT License
+
+Copyright (c) 2018 Trinity
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+import time
+import unittest
+from unittest import mock
+from model.statistics_model import StatisticsAggregator
+
+
+class StatisticsAggregatorTestFactory(unittest.TestCase):
+    """
+        Test Suite for the statistics merged in memory
+    """
+    def setUp(self):
+        self.table = mock.MagicMock()
+        self.aggregator = StatisticsAggregator(self.table, interval=10, threshold=3)
+
+    def tearDown(self):
+        self.aggregator.stop(timeout=1)
+
+    def test_merge_and_flush(self):
+        self.aggregator.add('0x1', {'payment': 10, 'total_rsmc_transaction': 1})
+        self.aggregator.add('0x1', {'payment': 5, 'total_rsmc_transaction': 1})
+        self.assertEqual({'payment': 15, 'total_rsmc_transaction': 2}, self.aggregator.pending('0x1'))
+        self.table.update_one_statistics.assert_not_called()
+
+        self.aggregator.flush()
+        self.table.update_one_statistics.assert_called_once_with('0x1', payment=15, total_rsmc_transaction=2)
+        self.assertEqual({}, self.aggregator.pending('0x1'))
+        self.assertEqual({'pending': 0, 'flushes': 1, 'failures': 0}, self.aggregator.statistics)
+
+    def test_flush_by_threshold(self):
+        for _ in range(3):
+            self.aggregator.add('0x1', {'income': 1})
+
+        end_time = time.time() + 5
+        while not self.table.update_one_statistics.called and time.time() < end_time:
+            time.sleep(0.01)
+        self.table.update_one_statistics.assert_called_once_with('0x1', income=3)
+
+    def test_read_with_pending(self):
+        self.table.query_one.return_value = ['written']
+        self.aggregator.add('0x1', {'income': 1})
+        self.assertEqual((['written'], {'income': 1}), self.aggregator.read('0x1', lambda: self.table.query_one('0x1')))
+
+    def test_failed_flush_after_stopped(self):
+        self.table.update_one_statistics.side_effect = ConnectionError('database is down')
+        self.aggregator.add('0x1', {'income': 1})
+        self.aggregator.stop(timeout=1)
+
+        # the increments are kept, and the background thread isn't restarted
+        self.assertEqual({'income': 1}, self.aggregator.pending('0x1'))
+        self.assertLessEqual(1, self.aggregator.statistics.get('failures'))
+        self.assertIsNone(self.aggregator._thread)
+
+        self.aggregator.add('0x1', {'income': 1})
+        self.assertIsNone(self.aggregator._thread)
+        self.assertEqual({'income': 2}, self.aggregator.pending('0x1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
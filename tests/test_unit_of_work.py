@@ -0,0 +1,226 @@
+# --*-- coding : utf-8 --*--
+"""Author: Trinity Core Team 
+
+MIT License
+
+Copyright (c) 2018 Trinity
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+import unittest
+from threading import Thread
+from unittest import mock
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from common.exceptions import UnitOfWorkException
+from model.channel_model import APIChannel, TBLChannel
+from model.base_enum import EnumStatusCode
+from model.manager import DBManager
+from model.unit_of_work import GroupCommitter, UnitOfWork
+
+
+def collection_stand_in(name='Trade', database='Transaction'):
+    collection = mock.MagicMock()
+    collection.name = name
+    collection.full_name = '{}.{}'.format(database, name)
+    collection.database.name = database
+    return collection
+
+
+class TBLStandIn(DBManager):
+    """
+        Table of the trades of one channel in the shared collection
+    """
+    def __init__(self, collection, channel=None):
+        self.collection = collection
+        self.channel = channel
+
+    @property
+    def db_table(self):
+        return self.collection
+
+    @property
+    def primary_key(self):
+        return 'nonce'
+
+    @property
+    def scope(self):
+        return {'channel': self.channel} if self.channel else {}
+
+
+class UnitOfWorkTestFactory(unittest.TestCase):
+    """
+        Test Suite for the batched writes of the unit of work
+    """
+    def setUp(self):
+        self.collection = collection_stand_in()
+        self.table = TBLStandIn(self.collection, 'channel-1')
+        DBManager._provisioned_collections.add(('Transaction', 'Trade'))
+
+    def tearDown(self):
+        DBManager._provisioned_collections.discard(('Transaction', 'Trade'))
+        if hasattr(GroupCommitter, '_singleton_instance'):
+            del GroupCommitter._singleton_instance
+
+    def written_operations(self, collection=None):
+        return [operation for call in (collection or self.collection).bulk_write.call_args_list
+                for operation in call[0][0]]
+
+    def test_batched_writes(self):
+        with UnitOfWork() as unit:
+            self.assertEqual(EnumStatusCode.OK, self.table.add(nonce=1, state='confirming'))
+            self.assertEqual(EnumStatusCode.OK, self.table.update_one(1, state='confirmed'))
+            self.assertEqual(2, unit.pending)
+            self.collection.insert_one.assert_not_called()
+            self.collection.update_one.assert_not_called()
+            self.collection.bulk_write.assert_not_called()
+
+        # written by one bulk_write in order, and the operations are restricted to the scope of the table
+        self.assertEqual(1, self.collection.bulk_write.call_count)
+        insert, update = self.written_operations()
+        self.assertIsInstance(insert, InsertOne)
+        self.assertEqual({'nonce': 1, 'state': 'confirming', 'channel': 'channel-1'},
+                         {key: value for key, value in insert._doc.items() if key in ['nonce', 'state', 'channel']})
+        self.assertIsInstance(update, UpdateOne)
+        self.assertEqual({'nonce': 1, 'channel': 'channel-1'}, update._filter)
+        self.assertEqual('confirmed', update._doc['$set']['state'])
+        self.assertIsNone(UnitOfWork.current())
+
+    def test_written_directly_without_unit(self):
+        self.table.update_one(1, state='confirmed')
+        self.collection.update_one.assert_called_once()
+        self.collection.bulk_write.assert_not_called()
+
+    def test_flush_before_read(self):
+        self.collection.find_one.return_value = {'nonce': 1, 'state': 'confirmed'}
+        with UnitOfWork() as unit:
+            self.table.update_one(1, state='confirmed')
+
+            # the thread reads its own writes
+            manager = mock.Mock()
+            manager.attach_mock(self.collection.bulk_write, 'bulk_write')
+            manager.attach_mock(self.collection.find_one, 'find_one')
+            self.assertEqual('confirmed', self.table.query_one(1)[0].state)
+            self.assertEqual(['bulk_write', 'find_one'], [call[0] for call in manager.mock_calls])
+            self.assertEqual(0, unit.pending)
+
+        self.assertEqual(1, self.collection.bulk_write.call_count)
+
+    def test_nested_units(self):
+        other = TBLStandIn(collection_stand_in('Statistics', 'Channel'))
+        with UnitOfWork() as outer:
+            self.table.update_one(1, state='confirmed')
+            with UnitOfWork() as inner:
+                self.assertIs(outer, inner)
+                other.update_one(2, state='confirmed')
+
+            # the nested unit is merged into the outer one, nothing is written when it's finished
+            self.collection.bulk_write.assert_not_called()
+            self.assertEqual(2, outer.pending)
+
+        self.assertEqual(1, len(self.written_operations()))
+        self.assertEqual(1, len(self.written_operations(other.db_table)))
+
+    def test_failed_writes_raised(self):
+        self.collection.bulk_write.side_effect = [
+            BulkWriteError({'writeErrors': [{'index': 0, 'errmsg': 'duplicate key'}]}), None]
+        flushed = []
+        with self.assertRaises(UnitOfWorkException):
+            with UnitOfWork() as unit:
+                self.table.add(nonce=1, state='confirming')
+                self.table.update_one(2, state='confirmed')
+                unit.after_flush(self.collection, lambda: flushed.append(True))
+
+        # the operations after the failed one are still written, and the callback is called anyway
+        self.assertEqual(2, self.collection.bulk_write.call_count)
+        self.assertEqual(1, len(self.collection.bulk_write.call_args_list[1][0][0]))
+        self.assertEqual([True], flushed)
+
+    def test_group_commit(self):
+        units = []
+
+        def work(nonce):
+            with UnitOfWork(group_commit_window=0.2) as unit:
+                self.table.update_one(nonce, state='confirmed')
+                units.append(unit)
+
+        threads = [Thread(target=work, args=(nonce,)) for nonce in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        # the units finished in the same window are committed by one bulk_write
+        self.assertEqual(3, len(units))
+        self.assertEqual(1, self.collection.bulk_write.call_count)
+        self.assertEqual([0, 1, 2], sorted(operation._filter['nonce'] for operation in self.written_operations()))
+        self.assertEqual({'commits': 1, 'units': 3}, GroupCommitter(0.2).statistics)
+
+
+class APIChannelTestFactory(unittest.TestCase):
+    """
+        Test Suite for the cached channels written by the unit of work
+    """
+    def setUp(self):
+        self.collection = collection_stand_in('Channel', 'Channel')
+        patcher = mock.patch.object(TBLChannel, 'db_table', new_callable=mock.PropertyMock,
+                                    return_value=self.collection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        APIChannel.cache.invalidate()
+
+    def tearDown(self):
+        APIChannel.cache.invalidate()
+
+    def test_read_own_writes(self):
+        self.collection.find_one.return_value = {'channel': 'channel-1', 'state': 'CLOSED'}
+        with UnitOfWork():
+            APIChannel.update_channel('channel-1', state='CLOSED')
+
+            # the channel is cached by another thread before the update is flushed
+            APIChannel.cache.put('channel-1', {'channel': 'channel-1', 'state': 'OPENED'})
+            self.assertEqual('CLOSED', APIChannel.query_channel('channel-1')[0].state)
+
+        self.collection.bulk_write.assert_called_once()
+
+    def test_compare_and_set(self):
+        self.collection.find_one_and_update.return_value = {'channel': 'channel-1', 'balance': {'0x1': {'TNC': '9'}}}
+        channel = APIChannel.compare_and_set_channel('channel-1', {'balance.0x1.TNC': '10'},
+                                                     {'balance.0x1.TNC': '9'})
+        self.assertEqual('9', channel.balance['0x1']['TNC'])
+
+        filters, update = self.collection.find_one_and_update.call_args[0]
+        self.assertEqual({'channel': 'channel-1', 'balance.0x1.TNC': '10'}, filters)
+        self.assertEqual('9', update['$set']['balance.0x1.TNC'])
+
+        # the post-image is cached
+        self.assertEqual('9', APIChannel.query_channel('channel-1')[0].balance['0x1']['TNC'])
+        self.collection.find_one.assert_not_called()
+
+    def test_compare_and_set_conflict(self):
+        APIChannel.cache.put('channel-1', {'channel': 'channel-1', 'balance': {'0x1': {'TNC': '10'}}})
+        self.collection.find_one_and_update.return_value = None
+        self.assertIsNone(APIChannel.compare_and_set_channel('channel-1', {'balance.0x1.TNC': '10'},
+                                                             {'balance.0x1.TNC': '9'}))
+
+        # the cached channel is stale since it's changed by others
+        self.assertIsNone(APIChannel.cache.get('channel-1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -23,6 +23,8 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE."""
 import unittest
+from blockchain.web3client import BatchRequest
+from common.exceptions import BatchRequestException
 
 
 class Web3ClientTestFactory(unittest.TestCase):
@@ -75,3 +77,48 @@ class Web3ClientTestFactory(unittest.TestCase):
     def test_estimate_gas_for_withdrawSettle(self):
         pass
 
+
+class ResponseStandIn(object):
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+class ClientStandIn(object):
+    """
+        Client whose session answers the batch requests with the given response items
+    """
+    eth_url = 'http://localhost:8545'
+
+    def __init__(self, response):
+        self.session = self
+        self.response = response
+
+    def post(self, url, json=None, timeout=None):
+        return ResponseStandIn(self.response)
+
+
+class BatchRequestTestFactory(unittest.TestCase):
+    """
+        Test Suite for the JSON-RPC batch request
+    """
+    def new_batch(self, response):
+        batch = BatchRequest(ClientStandIn(response))
+        for tx_hash in ['0x1', '0x2', '0x3']:
+            batch.get_transaction_receipt(tx_hash)
+        return batch
+
+    def test_results_in_order(self):
+        batch = self.new_batch([{'id': 1, 'result': None}, {'id': 0, 'result': {'blockNumber': '0x64'}},
+                                {'id': 2, 'result': None}])
+        self.assertEqual([{'blockNumber': 100}, None, None], batch.execute(strict=True))
+
+    def test_failed_call(self):
+        response = [{'id': 0, 'result': {'blockNumber': '0x64'}}, {'id': 1, 'error': {'code': -32005}},
+                    {'error': {'code': -32600}}]
+        self.assertEqual([{'blockNumber': 100}, None, None], self.new_batch(response).execute())
+
+        # the failed call isn't told apart from the pending transaction, so it's raised in strict mode
+        self.assertRaises(BatchRequestException, self.new_batch(response).execute, True)
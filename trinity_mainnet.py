@@ -42,7 +42,25 @@ DATABASE_CONFIG = {
     'trans': os.getenv('DB_TRANS','Transaction') if __running_mode__ else 'beta-trans',
     'history': os.getenv('DB_HISTORY','History') if __running_mode__ else 'beta-history',
     'host': os.getenv('DB_HOST', '127.0.0.1'),
-    'port': int(os.getenv('DB_PORT', 27017))
+    'port': int(os.getenv('DB_PORT', 27017)),
+    # full URI overrides the host and port above, such as 'mongodb://host1:27017,host2:27017/?replicaSet=rs0'
+    'uri': os.getenv('DB_URI'),
+    'replica_set': os.getenv('DB_REPLICA_SET'),
+    # connection pool shared by all threads of the process
+    'max_pool_size': int(os.getenv('DB_MAX_POOL_SIZE', 100)),
+    'min_pool_size': int(os.getenv('DB_MIN_POOL_SIZE', 0)),
+    'wait_queue_timeout_ms': os.getenv('DB_WAIT_QUEUE_TIMEOUT_MS'),
+    'connect_timeout_ms': int(os.getenv('DB_CONNECT_TIMEOUT_MS', 20000)),
+    'socket_timeout_ms': os.getenv('DB_SOCKET_TIMEOUT_MS'),
+    'server_selection_timeout_ms': int(os.getenv('DB_SERVER_SELECTION_TIMEOUT_MS', 30000)),
+    # such as 1, 'majority'; and 'primary', 'primaryPreferred', 'secondaryPreferred'
+    'write_concern': os.getenv('DB_WRITE_CONCERN'),
+    'read_preference': os.getenv('DB_READ_PREFERENCE'),
+    # seconds to commit the writes of the concurrent messages together, 0 means each message commits its writes
+    'group_commit_window': float(os.getenv('DB_GROUP_COMMIT_WINDOW', 0)),
+    # the statistics counters are written every interval seconds or once threshold increments are merged
+    'statistics_flush_interval': float(os.getenv('DB_STATISTICS_FLUSH_INTERVAL', 5)),
+    'statistics_flush_threshold': int(os.getenv('DB_STATISTICS_FLUSH_THRESHOLD', 100))
 }
 
 
@@ -89,8 +107,21 @@ Configure = {
         "TNC": SUPPORTED_ASSET_TYPE['TNC']
     },
     "BlockChain":{
-        "EthNetUrl" : "https://mainnet.infura.io"
+        "EthNetUrl" : "https://mainnet.infura.io",
+        "BlockHeightMaxStaleness": 3,    # seconds that the cached block height could be used
+        "ReceiptConfirmations": 1,       # blocks to confirm the transactions sent by the events
+        "ReceiptDropAfterBlocks": 20,    # blocks that the transaction is not found before it is resent
+        "LogIndexerWindow": 1000,        # blocks queried by one eth_getLogs of the contract log indexer
+        "LogIndexerReorgDepth": 6,       # blocks behind the head that the contract logs are indexed
     },
+    "HttpSession":{"PoolSize": 16, "MaxRetries": 2, "Timeout": 30
+                   },
+    # worker threads to handle the chain events. Settle and punishment events are handled by the urgent workers
+    "EventEngine":{"Workers": 8, "UrgentWorkers": 2, "MaxInFlight": 32
+                   },
+    # worker threads to send the messages to gateway and to handle the messages from gateway
+    "MessageEngine":{"SenderWorkers": 4, "DispatcherWorkers": 8
+                     },
     "DataBase":{"url": "http://localhost:20554"
                 },
     "Version":"v0.2.1",
@@ -0,0 +1,85 @@
+"""Author: Trinity Core Team 
+
+MIT License
+
+Copyright (c) 2018 Trinity
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+import json
+from functools import partial
+from trinity import Configure
+from common.log import LOG
+from common.executor import SerialLaneExecutor
+
+
+class MessageDispatcher(object):
+    """
+        Descriptions    : Dispatch the inbound transaction messages to the worker pool. Messages of the same channel
+                          are handled one by one in the received order, while messages of different channels are
+                          handled in parallel.
+    """
+    def __init__(self, workers=1):
+        self.executor = SerialLaneExecutor('MessageDispatcher', workers)
+        self._handler = None
+
+    def register_handler(self, handler):
+        """
+
+        :param handler: callback(message) to handle the message
+        :return:
+        """
+        self._handler = handler
+
+    def dispatch(self, message):
+        """
+
+        :param message: message dict or json string
+        :return:
+        """
+        if not self._handler:
+            LOG.error('No handler to handle message: {}'.format(message))
+            return
+
+        try:
+            message_dict = json.loads(message) if isinstance(message, str) else message
+            message_type = message_dict.get('MessageType')
+            channel_name = message_dict.get('ChannelName') or message_type
+        except Exception as error:
+            LOG.error('Invalid message: {}. Exception: {}'.format(message, error))
+            return
+
+        self.executor.submit(channel_name, partial(self._handler, message), message_type)
+
+    def stop(self, timeout=None):
+        self.executor.stop(timeout)
+
+    @property
+    def queue_depth(self):
+        return self.executor.depth
+
+    @property
+    def statistics(self):
+        """
+        Description: waiting time (wait_*) and handling latency (run_*) of each message type
+        """
+        return self.executor.statistics
+
+
+# more than one worker requires the tables which are bound to the collection per call, not shared by the class
+message_dispatcher = MessageDispatcher(Configure.get('MessageEngine', {}).get('DispatcherWorkers', 1))
@@ -22,13 +22,21 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE."""
 
+import time
+from functools import partial
 import requests
 from trinity import Configure
 from common.log import LOG
+from common.executor import SerialLaneExecutor
+from common.http_session import get_configured_http_session
 import json
 from wallet.utils import get_wallet_info, get_magic
 
 
+def gateway_session():
+    return get_configured_http_session('gateway', Configure.get("HttpSession"))
+
+
 class GatewayInfo(object):
     Spv_port = None
 
@@ -70,7 +78,7 @@ def sync_channel(message_type, channel_name, founder, receiver, balance, asset_t
         "params": [message],
         "id": 1
     }
-    result = requests.post(Configure["GatewayURL"], json=request)
+    result = gateway_session().post(Configure["GatewayURL"], json=request)
     return result.json()
 
 
@@ -87,7 +95,7 @@ def sync_channel_list(channel_list):
         "params": [message],
         "id": 1
     }
-    result = requests.post(Configure["GatewayURL"], json=request)
+    result = gateway_session().post(Configure["GatewayURL"], json=request)
     return result.json()
 
 
@@ -112,7 +120,7 @@ def join_gateway(wallet):
         "params": [message],
         "id": 1
     }
-    result = requests.post(Configure["GatewayURL"], json=request)
+    result = gateway_session().post(Configure["GatewayURL"], json=request)
     return result.json()
 
 
@@ -130,7 +138,7 @@ def get_router_info(message):
         "params": [message],
         "id": 1
     }
-    result = requests.post(Configure["GatewayURL"], json=request)
+    result = gateway_session().post(Configure["GatewayURL"], json=request)
     return result.json()
 
 
@@ -142,9 +150,63 @@ def send_message(message, method="TransactionMessage" ):
             "params": [message],
             "id": 1
     }
-    result = requests.post(Configure["GatewayURL"], json=request)
+    result = gateway_session().post(Configure["GatewayURL"], json=request)
     return result.json()
 
+class MessageSender(object):
+    """
+        Descriptions    : Send the messages to gateway asynchronously. Messages of the same channel are sent in order,
+                          and the message timed out to connect the gateway is retried with backoff before the next one
+                          of that channel. The message is never retried once it might have reached the gateway, such as
+                          read timeout or the connection aborted, otherwise the gateway might receive it twice. The
+                          other connection errors are retried by the session already.
+    """
+    _max_retries = 3
+    _retry_backoff = 0.5    # seconds, doubled for each retry
+
+    def __init__(self, workers=4):
+        self.executor = SerialLaneExecutor('GatewaySender', workers)
+
+    def send(self, message, method="TransactionMessage"):
+        channel_name = message.get('ChannelName') or message.get('MessageType')
+        self.executor.submit(channel_name, partial(self._send, message, method), message.get('MessageType'))
+
+    def _send(self, message, method):
+        for retry in range(self._max_retries + 1):
+            try:
+                return send_message(message, method)
+            except requests.ConnectTimeout as error:
+                if retry == self._max_retries:
+                    LOG.error('Failed to send message<{}> of channel<{}> to gateway. Exception: {}'.format(
+                        message.get('MessageType'), message.get('ChannelName'), error))
+                    raise
+
+                LOG.warning('Send message<{}> to gateway error: {}. Retry later'.format(message.get('MessageType'),
+                                                                                      error))
+                time.sleep(self._retry_backoff * pow(2, retry))
+
+    def stop(self, timeout=None):
+        self.executor.stop(timeout)
+
+    @property
+    def queue_depth(self):
+        return self.executor.depth
+
+    @property
+    def statistics(self):
+        """
+        Description: send latency (run_*) and queuing time (wait_*) of each message type
+        """
+        return self.executor.statistics
+
+
+message_sender = MessageSender(Configure.get('MessageEngine', {}).get('SenderWorkers', 4))
+
+
+def send_message_async(message, method="TransactionMessage"):
+    message_sender.send(message, method)
+
+
 def close_wallet():
     message = {
         "MessageType": "CloseWallet",
@@ -157,5 +219,5 @@ def close_wallet():
         "params": [message],
         "id": 1
     }
-    result = requests.post(Configure["GatewayURL"], json=request)
+    result = gateway_session().post(Configure["GatewayURL"], json=request)
     return result.json()
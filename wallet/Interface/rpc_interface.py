@@ -29,12 +29,15 @@ from wallet.Interface.rpc_utils import json_response, cors_header
 from wallet.channel import get_channel_via_name, query_channel_list
 from common.log import LOG
 from trinity import Configure
-from blockchain.interface import get_balance
+from blockchain.interface import get_balances
 from wallet.channel import Channel
 from wallet.channel.payment import Payment
 from model.statistics_model import APIStatistics
+from wallet.Interface.dispatcher import message_dispatcher
+from common.registry import HandlerRegistry
 
-MessageList = []
+# handlers of the JSON-RPC methods
+rpc_registry = HandlerRegistry('RPC')
 
 
 class CurrentLiveWallet(object):
@@ -48,10 +51,7 @@ class CurrentLiveWallet(object):
     def wallet_info(cls):
         if not cls.Wallet:
             return None
-        balance = {}
-        for i in Configure["AssetType"].keys():
-            b = cls.Wallet.tnc_balance if i.upper() =="TNC" else get_balance(cls.Wallet.address, i.upper())
-            balance[i] = b
+        balance = get_balances(cls.Wallet.address, list(Configure["AssetType"].keys()))
         return {
                    "Publickey":cls.Wallet.address,
                    "CommitMinDeposit":Configure["CommitMinDeposit"],
@@ -151,90 +151,84 @@ class RpcInteraceApi(object):
             }
 
     def json_rpc_method_handler(self, method, params):
+        if method not in rpc_registry:
+            return None
 
-        # if method == "SendRawtransaction":
-        #     return transaction.TrinityTransaction.sendrawtransaction(params[0])
-
-        if method == "TransactionMessage":
-            LOG.info("<-- {}".format(params))
-            return MessageList.append(params)
-
-        # elif method == "FunderTransaction":
-        #     return transaction.funder_trans(params)
-
-        # elif method == "FunderCreate":
-        #     return transaction.funder_create(params)
-
-        # elif method == "RSMCTransaction":
-        #     return transaction.rsmc_trans(params)
-        #
-        # elif method == "HTLCTransaction":
-        #     return transaction.hltc_trans(params)
-
-        elif method == "SyncWallet":
-            from wallet import prompt as PR
-            wallet_info = PR.CurrentLiveWallet.wallet_info()
-            return {"MessageType":"SyncWallet",
-               "MessageBody": wallet_info
-               }
-
-        elif method == "GetChannelState":
-            return {'MessageType': 'GetChannelState',
-                    'MessageBody': get_channel_via_name(params)}
-
-        elif method == "GetChannelList":
-            LOG.debug("GetChannelList")
-            from wallet.utils import get_wallet_info
-            if CurrentLiveWallet.Wallet:
-                try:
-                    channel_list = query_channel_list(CurrentLiveWallet.Wallet.url)
-                except Exception as e:
-                    channel_list= None
-                    LOG.error(e)
-                wallet_info = get_wallet_info(CurrentLiveWallet.Wallet)
-
-                return {"MessageType":"GetChannelList",
-                        "MessageBody":{"Channel":channel_list,
-                                       "Wallet":wallet_info}}
-            else:
-                return {"MessageType": "GetChannelList",
-                        "MessageBody": {"Error":"Wallet No Open"}
-                }
-
-        elif method == "GetPayment":
-            asset_type = params[0]
-            payment = params[1]
-
-            try:
-                hash_r, rcode = Payment.create_hr()
-                pycode = Payment.generate_payment_code(CurrentLiveWallet.Wallet.url, asset_type, payment, hash_r)
-                Channel.add_payment(None, hash_r, rcode, payment)
-            except Exception as e:
-                LOG.error(e)
-                pycode = None
-
-            return{"MessageType":"GetPaymentAck",
-            	   "MessageBody": {"pycode":pycode}}
-
+        return rpc_registry.call(method, params)
 
-        elif method == "GetWalletStatistics":
-            try:
-                statistics_data = APIStatistics.query_statistics(params[0])[0]
 
-            except Exception as e:
-                LOG.error(e)
+@rpc_registry.register("TransactionMessage")
+def transaction_message(params):
+    LOG.info("<-- {}".format(params))
+    return message_dispatcher.dispatch(params[0])
 
-                return {"MessageType": "GetWalletStatisticsAck",
-                        "MessageBody": {"Error": "data is null"}
-                }
-            else:
 
-                return {"MessageType": "GetWalletStatisticsAck",
-                        "MessageBody": json.loads(statistics_data.__str__())
-                }
+@rpc_registry.register("SyncWallet")
+def sync_wallet(params):
+    from wallet import prompt as PR
+    wallet_info = PR.CurrentLiveWallet.wallet_info()
+    return {"MessageType":"SyncWallet",
+       "MessageBody": wallet_info
+       }
 
-        # elif method == 'RefoundTrans':
-        #     return transaction.refound_trans(params)
 
+@rpc_registry.register("GetChannelState")
+def get_channel_state(params):
+    return {'MessageType': 'GetChannelState',
+            'MessageBody': get_channel_via_name(params)}
 
 
+@rpc_registry.register("GetChannelList")
+def get_channel_list(params):
+    LOG.debug("GetChannelList")
+    from wallet.utils import get_wallet_info
+    if CurrentLiveWallet.Wallet:
+        try:
+            channel_list = query_channel_list(CurrentLiveWallet.Wallet.url)
+        except Exception as e:
+            channel_list= None
+            LOG.error(e)
+        wallet_info = get_wallet_info(CurrentLiveWallet.Wallet)
+
+        return {"MessageType":"GetChannelList",
+                "MessageBody":{"Channel":channel_list,
+                               "Wallet":wallet_info}}
+    else:
+        return {"MessageType": "GetChannelList",
+                "MessageBody": {"Error":"Wallet No Open"}
+        }
+
+
+@rpc_registry.register("GetPayment")
+def get_payment(params):
+    asset_type = params[0]
+    payment = params[1]
+
+    try:
+        hash_r, rcode = Payment.create_hr()
+        pycode = Payment.generate_payment_code(CurrentLiveWallet.Wallet.url, asset_type, payment, hash_r)
+        Channel.add_payment(None, hash_r, rcode, payment)
+    except Exception as e:
+        LOG.error(e)
+        pycode = None
+
+    return{"MessageType":"GetPaymentAck",
+           "MessageBody": {"pycode":pycode}}
+
+
+@rpc_registry.register("GetWalletStatistics")
+def get_wallet_statistics(params):
+    try:
+        statistics_data = APIStatistics.query_statistics(params[0])[0]
+
+    except Exception as e:
+        LOG.error(e)
+
+        return {"MessageType": "GetWalletStatisticsAck",
+                "MessageBody": {"Error": "data is null"}
+        }
+    else:
+
+        return {"MessageType": "GetWalletStatisticsAck",
+                "MessageBody": statistics_data.to_dict()
+        }
@@ -106,7 +106,7 @@ class Channel(object):
         :return:
         """
         # judge whether the channel exist or not
-        if Channel.get_channel(founder, partner, EnumChannelState.OPENED):
+        if Channel.get_channel(founder, partner, EnumChannelState.OPENED, profile='state'):
             console_log.warning('OPENED channel already exists.')
             return False
         else:
@@ -120,21 +120,33 @@ class Channel(object):
         return True
 
     @classmethod
-    def get_channel(cls, address1, address2, state=None):
-        channels = []
-        filter_list = [{'src_addr': address1, 'dest_addr': address2},
-                       {'src_addr': address2, 'dest_addr': address1}]
-
-        for filter_item in filter_list:
-            if state:
-                filter_item.update({'state': state.name})
+    def get_channel(cls, address1, address2, state=None, profile=None):
+        filters = {'state': state.name} if state else {}
+        try:
+            return cls.query_channels_of(address1, peer=address2, profile=profile, **filters)
+        except Exception as error:
+            LOG.debug('Batch query channels from DB error: {}'.format(error))
+            return []
 
-            try:
-                channels.extend(APIChannel.batch_query_channel(filters=filter_item))
-            except Exception as error:
-                LOG.debug('Batch query channels from DB error: {}'.format(error))
+    @staticmethod
+    def query_channels_of(address, peer=None, profile=None, **filters):
+        """
+        Description: query the channels founded by or with the address by one $or query. Each branch is served by
+                     the index of src_addr or dest_addr.
+        :param address: url of the wallet
+        :param peer: only the channels with this peer if specified
+        :param profile: projection profile of the channels
+        :param filters: other conditions, such as state, magic
+        :return: channels founded by the address first, then the channels founded by others
+        """
+        founder_side = dict(filters, src_addr=address)
+        partner_side = dict(filters, dest_addr=address)
+        if peer:
+            founder_side.update({'dest_addr': peer})
+            partner_side.update({'src_addr': peer})
 
-        return channels
+        channels = APIChannel.batch_query_channel({'$or': [founder_side, partner_side]}, profile=profile)
+        return sorted(channels, key=lambda channel: channel.src_addr != address)
 
     @staticmethod
     def get_channel_list(address, **kwargs):
@@ -144,35 +156,23 @@ class Channel(object):
         :param kwargs:
         :return:
         """
-        filter_src = {'src_addr':address,
-                      'magic':get_magic()}
-        filter_dest = {'dest_addr':address,
-                       'magic':get_magic()}
+        filters = {'magic':get_magic()}
 
         output_text = ''
         for key, value in kwargs.items():
             if value:
-                filter_dest.update({key:value})
-                filter_src.update({key:value})
+                filters.update({key:value})
 
                 output_text += ' {} {}'.format(key, value)
 
         console_log.info('Get Channels with Address {}{}'.format(address, output_text))
 
-        if filter_src.get('peer'):
-            filter_src.update({'dest_addr': filter_src.get('peer')})
-            filter_src.pop('peer')
-
-        channels = APIChannel.batch_query_channel(filters=filter_src)
+        peer = filters.pop('peer', None)
+        channels = Channel.query_channels_of(address, peer=peer, **filters)
         for ch in channels:
             balance = Channel.convert_balance(ch.balance)
-            console_log.console('=='*10,'\nChannelName:', ch.channel, '\nState:', ch.state, '\nPeer:', ch.dest_addr,
-                  '\nBalance:', json.dumps(balance, indent=1))
-
-        channels = APIChannel.batch_query_channel(filters=filter_dest)
-        for ch in channels:
-            balance = Channel.convert_balance(ch.balance)
-            console_log.console('=='*10,'\nChannelName:', ch.channel, '\nState:', ch.state, '\nPeer:', ch.src_addr,
+            peer = ch.dest_addr if ch.src_addr == address else ch.src_addr
+            console_log.console('=='*10,'\nChannelName:', ch.channel, '\nState:', ch.state, '\nPeer:', peer,
                   '\nBalance:', json.dumps(balance, indent=1))
 
     @classmethod
@@ -257,6 +257,10 @@ class Channel(object):
     def delete_channel(channel_name):
         return APIChannel.delete_channel(channel_name)
 
+    @staticmethod
+    def compare_and_set_channel(channel_name, expected, changes):
+        return APIChannel.compare_and_set_channel(channel_name, expected, changes)
+
     @staticmethod
     def add_trade(channel_name, *args, **kwargs):
         """"""
@@ -297,9 +301,9 @@ class Channel(object):
         return APIPayment(channel_name).query_payment(hashcode, *args, **kwargs)
 
     @staticmethod
-    def latest_trade(channel_name):
+    def latest_trade(channel_name, profile=None):
         try:
-            trade = APITransaction(channel_name).sort(key='nonce')[0]
+            trade = APITransaction(channel_name).sort(key='nonce', profile=profile)[0]
         except Exception as error:
             LOG.exception('No transaction records were found for channel<{}>. Exception: {}'.format(channel_name, error))
             return None
@@ -313,7 +317,7 @@ class Channel(object):
         :param channel_name:
         :return:
         """
-        latest_trade = cls.latest_trade(channel_name)
+        latest_trade = cls.latest_trade(channel_name, profile='nonce_state')
         return int(latest_trade.nonce) if latest_trade else None
 
     @classmethod
@@ -339,17 +343,18 @@ class Channel(object):
         return int(latest_trade.nonce) if latest_trade else None
 
     @classmethod
-    def latest_valid_trade(cls, channel_name):
+    def latest_valid_trade(cls, channel_name, profile=None):
         """
 
         :param channel_name:
+        :param profile: projection profile of the trade, None means all fields
         :return:
         """
         try:
             filters = {'$or': [{'state': EnumTradeState.confirmed_onchain.name},
                                {'state': EnumTradeState.confirmed.name},
                                {'state': EnumTradeState.confirming.name}]}
-            valid_trade = APITransaction(channel_name).sort(key='nonce', filters=filters)[0]
+            valid_trade = APITransaction(channel_name).sort(key='nonce', filters=filters, profile=profile)[0]
         except Exception as error:
             LOG.exception('No valid transaction records were found for channel<{}>.'.format(channel_name))
             return None, None
@@ -363,7 +368,7 @@ class Channel(object):
         :param channel_name:
         :return:
         """
-        latest_trade = cls.latest_trade(channel_name)
+        latest_trade = cls.latest_trade(channel_name, profile='nonce_state')
         if not latest_trade:
             raise ChannelException(
                 EnumChannelError.CHANNEL_ALLOC_NONCE_FAILED_SINCE_NO_TRADE_FOUND,
@@ -423,7 +428,7 @@ class Channel(object):
             partner_deposit = deposit
 
         # judge whether the channel exist or not
-        if Channel.get_channel(founder, partner, EnumChannelState.OPENED):
+        if Channel.get_channel(founder, partner, EnumChannelState.OPENED, profile='state'):
             console_log.warning('OPENED channel already exists.')
             return False
         else:
@@ -834,10 +839,9 @@ def filter_channel_via_address(address1, address2, state=None):
 def get_channel_via_name(params):
     print('enter get_channel_via_name', params)
     if params:
-        channel_set = APIChannel.batch_query_channel(filters=params[0])
-        result = []
-        for channel in channel_set:
-            result.append({k: v for k, v in channel.__dict__.items() if k in APIChannel.table.required_item})
+        required_item = APIChannel.table.required_item
+        channel_set = APIChannel.batch_query_channel(params[0], dict.fromkeys(required_item, True))
+        result = [channel.to_dict(required_item) for channel in channel_set]
         print('result is ', result)
         return result
     return None
@@ -861,41 +865,21 @@ def sync_channel_info_to_gateway(channel_name, type, asset_type='TNC'):
 
 
 def udpate_channel_when_setup(address):
-    channels = APIChannel.batch_query_channel(filters={"src_addr": address,
-                                                       "magic":get_magic()})
+    channels = Channel.query_channels_of(address, profile='state', magic=get_magic(),
+                                         state=EnumChannelState.OPENED.name)
     for ch in channels:
-        if ch.state == EnumChannelState.OPENED.name:
-            sync_channel_info_to_gateway(ch.channel, "UpdateChannel")
-
-    channeld = APIChannel.batch_query_channel(filters={"dest_addr": address,
-                                                       "magic":get_magic()})
-    for ch in channeld:
-        if ch.state == EnumChannelState.OPENED.name:
-            sync_channel_info_to_gateway(ch.channel, "UpdateChannel")
+        sync_channel_info_to_gateway(ch.channel, "UpdateChannel")
 
 
 def query_channel_list(address):
-    channels = APIChannel.batch_query_channel(filters={"src_addr": address,
-                                                       "state": EnumChannelState.OPENED.name,
-                                                       "magic":get_magic()})
+    channels = Channel.query_channels_of(address, profile='summary', state=EnumChannelState.OPENED.name,
+                                         magic=get_magic())
     channel_list = []
-    if channels:
-        for ch in channels:
-            channel_info = {"ChannelName": ch.channel,
-                            "Founder": ch.src_addr,
-                            "Receiver": ch.dest_addr,
-                            "Balance": ch.balance,
-                            "Magic": ch.__dict__.get('magic')}
-            channel_list.append(channel_info)
-    channeld = APIChannel.batch_query_channel(filters={"dest_addr": address,
-                                                       "state": EnumChannelState.OPENED.name,
-                                                       "magic":get_magic()})
-    if channeld:
-        for ch in channeld:
-            channel_info = {"ChannelName": ch.channel,
-                            "Founder": ch.src_addr,
-                            "Receiver": ch.dest_addr,
-                            "Balance": ch.balance,
-                            "Magic": ch.__dict__.get('magic')}
-            channel_list.append(channel_info)
+    for ch in channels:
+        channel_info = {"ChannelName": ch.channel,
+                        "Founder": ch.src_addr,
+                        "Receiver": ch.dest_addr,
+                        "Balance": ch.balance,
+                        "Magic": getattr(ch, 'magic', None)}
+        channel_list.append(channel_info)
     return channel_list
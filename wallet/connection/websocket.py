@@ -35,6 +35,7 @@ from blockchain.interface import get_block_count
 from common.log import LOG
 from trinity import EVENT_WS_SERVER
 from common.singleton import SingletonClass
+from wallet.channel import Channel
 from wallet.event import event_machine, EnumEventAction
 from wallet.event.offchain_event import ChannelEndSettleEvent, \
     ChannelUpdateSettleEvent, \
@@ -73,6 +74,24 @@ class EnumChainEventResp(Enum):
     monitorWithdrawSettleResponse = 'monitorWithdrawSettleResponse'
 
 
+# contract event: (message type handled by WebSocketConnection, {argument of the event: field of the message})
+CHAIN_EVENT_MESSAGES = {
+    'CloseChannel': (EnumChainEventReq.monitorCloseChannel.value,
+                     {'channleId': 'channelId', 'invoker': 'invoker', 'nonce': 'nonce', 'blockNumber': 'blockNumber'}),
+    'Settle': (EnumChainEventReq.monitorSettle.value,
+               {'channleId': 'channelId', 'partnerA': 'partnerA', 'amountA': 'amountA',
+                'partnerB': 'partnerB', 'amountB': 'amountB'}),
+    'Withdraw': (EnumChainEventReq.monitorWithdraw.value,
+                 {'channleId': 'channelId', 'invoker': 'invoker', 'hashLock': 'lockHash', 'secret': 'secret',
+                  'paymentBlock': 'blockNumber'}),
+    'WithdrawUpdate': (EnumChainEventReq.monitorWithdrawUpdate.value,
+                       {'channleId': 'channelId', 'invoker': 'invoker'}),
+    'WithdrawSettle': (EnumChainEventReq.monitorWithdrawSettle.value,
+                       {'channleId': 'channelId', 'invoker': 'invoker', 'hashLock': 'lockHash',
+                        'lockAmount': 'lockAmount'}),
+}
+
+
 class WebSocketConnection(metaclass=SingletonClass):
     """
 
@@ -84,6 +103,8 @@ class WebSocketConnection(metaclass=SingletonClass):
         self.timeout = EVENT_WS_SERVER.get('timeout') if not timeout else timeout
         self.wallet = None
         self.wallet_address = None
+        # the chain events are found by the local log indexer instead of the event server
+        self.chain_events_indexed = False
 
         # create connection
         self._conn = None
@@ -205,14 +226,14 @@ class WebSocketConnection(metaclass=SingletonClass):
 
         ucoro_event(_event_coroutine, None)
 
-    def handle_event(self, block_height, received = None):
+    def handle_event(self, block_height, received = None, indexed=False):
         if not received:
             return
 
         message_type = None
         message = received
         try:
-            message = json.loads(received)
+            message = received if isinstance(received, dict) else json.loads(received)
             message_type = message.get('messageType')
         except Exception:
             pass
@@ -220,12 +241,40 @@ class WebSocketConnection(metaclass=SingletonClass):
             # start to handle the event
             if EnumChainEventResp.__dict__.__contains__(message_type):
                 LOG.info('Handle message<{}> status <{}> at block<{}>.'.format(message_type, message.get('state'), block_height))
+            elif EnumChainEventReq.__dict__.__contains__(message_type) and self.chain_events_indexed and not indexed:
+                LOG.debug('Ignore message<{}> from event server since the chain events are indexed locally'.format(message_type))
             elif EnumChainEventReq.__dict__.__contains__(message_type):
                 LOG.info('Handle message<{}> at block<{}>'.format(message_type, block_height))
                 self.__getattribute__(message_type)(message)
             else:
                 LOG.info('MessageType: {}. Test or invalid message: {} at block<{}>'.format(message_type, message, block_height))
 
+    def handle_indexed_event(self, block_height, event_name, args, log):
+        """
+        Description: handle the contract event found by the local log indexer like the message of the event server.
+                     The events of the channels which don't belong to this wallet are ignored.
+        :param block_height: block which includes the event
+        :param event_name: name of the contract event
+        :param args: decoded arguments of the event
+        :param log: raw log of the event
+        :return:
+        """
+        message_type, fields = CHAIN_EVENT_MESSAGES.get(event_name, (None, {}))
+        if not (message_type and self.wallet_address):
+            return
+
+        message = {field: args.get(argument) for argument, field in fields.items()}
+        message.update({'messageType': message_type, 'txId': log.get('transactionHash')})
+
+        channel = Channel.query_channel(message.get('channelId'), profile='state')
+        if not channel:
+            return
+
+        if self.wallet_address.lower() not in [channel[0].src_addr.lower(), channel[0].dest_addr.lower()]:
+            return
+
+        self.handle_event(block_height, message, indexed=True)
+
     @ucoro(0.2)
     def timer_event(self, received=None):
         if not received:
@@ -334,7 +383,8 @@ class WebSocketConnection(metaclass=SingletonClass):
                 channel_event = ChannelEndSettleEvent(channel_name, self.wallet_address)
                 channel_event.register_args(EnumEventAction.EVENT_EXECUTE,
                                             invoker, channel_name, self.wallet._key.private_key_string)
-                self.register_event(channel_event, end_time)
+                channel_event.sleep_until(end_time)
+                event_machine.schedule_event(channel_name, channel_event)
 
         return
 
@@ -392,11 +442,12 @@ class WebSocketConnection(metaclass=SingletonClass):
                 event_machine.register_event(channel_name, channel_event)
                 event_machine.trigger_start_event(channel_name)
             else:
-                LOG.debug('monitorWithdraw: register ChannelEndSettleEvent at next block')
+                LOG.debug('monitorWithdraw: register ChannelSettleHtlcUnlockEvent at block<{}>'.format(end_time))
                 channel_event = ChannelSettleHtlcUnlockEvent(channel_name)
                 channel_event.register_args(EnumEventAction.EVENT_EXECUTE,
                                             invoker, channel_name, hashcode, self.wallet._key.private_key_string)
-                self.register_event(channel_event, end_time)
+                channel_event.sleep_until(end_time)
+                event_machine.schedule_event(channel_name, channel_event)
 
         return
 
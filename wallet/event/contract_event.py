@@ -29,7 +29,9 @@ from common.number import TrinityNumber
 from common.exceptions import ContractEventException
 from blockchain.ethInterface import Interface as EthInterface
 from blockchain.web3client import Client as EthWebClient
+from blockchain.receipt_tracker import ReceiptTracker
 from lightwallet.Settings import settings
+from trinity import Configure
 
 
 class EnumContractEventStatus(IntEnum):
@@ -46,6 +48,9 @@ class ContractEventInterface(metaclass=SingletonClass):
     _eth_client = None
     default_hash_and_secret = '0x'+'0'*64
 
+    # receipts of the transactions sent by the events
+    _receipt_tracker = None
+
     def __init__(self):
         ContractEventInterface._eth_interface = EthInterface(settings.NODEURL,
                                                              settings.ETH_Data_Contract_address,
@@ -55,6 +60,14 @@ class ContractEventInterface(metaclass=SingletonClass):
                                                              settings.TNC_abi)
         ContractEventInterface._eth_client = EthWebClient(settings.NODEURL)
 
+        block_chain = Configure.get('BlockChain', {})
+        ContractEventInterface._receipt_tracker = ReceiptTracker(
+            ContractEventInterface._eth_client.get_transaction_receipts,
+            ContractEventInterface._eth_client.get_transactions,
+            ContractEventInterface._eth_client.get_transaction_count,
+            confirmations=block_chain.get('ReceiptConfirmations', 1),
+            drop_after=block_chain.get('ReceiptDropAfterBlocks', 20))
+
     @property
     def gwei_coefficient(self):
         return EthWebClient.get_gas_price()
@@ -136,6 +149,24 @@ class ContractEventInterface(metaclass=SingletonClass):
             LOG.exception('get_approved_asset error: {}'.format(error))
             return None
 
+    @classmethod
+    def watch_transaction(cls, tx_id, callback=None, key=None):
+        cls._receipt_tracker.watch(tx_id, callback, key)
+
+    @classmethod
+    def update_transaction_receipts(cls, block_height):
+        """
+        Description: check the receipts of all watched transactions by one batch request for the new block
+        """
+        cls._receipt_tracker.update(block_height)
+
+    @classmethod
+    def get_watched_transaction_receipt(cls, tx_id):
+        """
+        :return: EnumReceiptState, receipt
+        """
+        return cls._receipt_tracker.get(tx_id)
+
     @classmethod
     def approve_deposit(cls, address, channel_id, nonce, founder, founder_amount, partner, partner_amount,
                         founder_sign, partner_sign, private_key, gwei_coef=1):
@@ -22,10 +22,17 @@ AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
 LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE."""
+import bisect
+import heapq
+import time
+from collections import OrderedDict
+from functools import partial
 from threading import Lock
 from enum import Enum, IntEnum
-from common.decorator import ucoro
+from common.executor import SerialLaneExecutor
 from common.log import LOG
+from trinity import Configure
+from blockchain.receipt_tracker import EnumReceiptState
 from .contract_event import ContractEventInterface
 
 
@@ -102,6 +109,10 @@ class EventBase(object):
 
         self.contract_executed_success = 1
 
+        # the block height to handle this event again. None means next block
+        self.wake_height = None
+        self.idle_interval = 1
+
     def retry_event(self):
         self.retry = True
         self.gwei_coef = self.gwei_for_retry
@@ -159,6 +170,41 @@ class EventBase(object):
         LOG.debug('set event<{}> ready'.format(self.event_name))
         self.is_event_ready = ready
 
+    def sleep_until(self, block_height):
+        """
+        Description: the event needn't be handled until the block height, unless it's woken up by notification.
+        :param block_height:
+        :return:
+        """
+        self.wake_height = int(block_height)
+
+    def next_wake_height(self, block_height, is_idle, max_idle_interval):
+        """
+        Description: calculate the block height to handle this event again. The event which makes no progress is
+                     backed off, but it's always handled at the deadline to judge whether it is timeout or not.
+        :param block_height: current block height
+        :param is_idle: True if the stage of the event isn't changed by this handling
+        :param max_idle_interval: the max blocks to back off the idle event
+        :return:
+        """
+        if is_idle:
+            self.idle_interval = min(self.idle_interval * 2, max_idle_interval)
+        else:
+            self.idle_interval = 1
+
+        wake_height = block_height + self.idle_interval
+        if self.wake_height and self.wake_height > block_height:
+            wake_height = self.wake_height
+        self.wake_height = None
+
+        if self.start_time and self.event_timeout >= block_height:
+            wake_height = min(wake_height, self.event_timeout + 1)
+
+        return wake_height
+
+    def is_overdue(self, block_height):
+        return 0 != self.start_time and block_height > self.event_timeout
+
     def is_event_completed(self):
         return self.event_stage.name == EnumEventAction.EVENT_COMPLETE.name
 
@@ -174,6 +220,14 @@ class EventBase(object):
     def event_type_name(self):
         return self.event_type.name
 
+    @property
+    def transaction_ids(self):
+        """
+        Description: the transactions sent by this event, which are recorded by the attributes named '*_tx_id'
+        :return:
+        """
+        return [tx_id for name, tx_id in self.__dict__.items() if name.endswith('_tx_id') and tx_id]
+
     def check_transaction_success(self, tx_hash):
         """
 
@@ -181,16 +235,19 @@ class EventBase(object):
         :return:
         """
         if tx_hash:
-            result = self.contract_event_api._eth_interface.get_transaction_receipt(tx_hash)
+            state, result = self.contract_event_api.get_watched_transaction_receipt(tx_hash)
 
             # check the status is successs or not
-            if result:
+            if EnumReceiptState.CONFIRMED == state:
                 if self.contract_executed_success == result.get('status'):
                     # means we will go to next step
                     return True
                 else:
                     # need a new transaction
                     return None
+            elif EnumReceiptState.DROPPED == state:
+                # its nonce is used by another transaction, so it would never be mined. need a new transaction
+                return None
             else:
                 # continue check this transaction id
                 return False
@@ -255,127 +312,313 @@ class EventBase(object):
         self.__getattribute__(self.stage_action.__str__())(block_height, *event_args.args, **event_args.kwargs)
 
 
-class EventMachine(object):
+class StageLatency(object):
     """
-
+        Descriptions    : Histogram of the seconds to handle each stage of each event type.
     """
+    buckets = [0.1, 0.5, 1, 2, 5, 10, 30]
+
     def __init__(self):
-        self._coro_number = 8
+        self._histograms = {}   # {event type: {stage: [count of each bucket, count over the last bucket]}}
+        self._lock = Lock()
+
+    def record(self, event_type, stage, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.setdefault(event_type, {}).setdefault(stage, [0] * (len(self.buckets)+1))
+            histogram[index] += 1
+
+    @property
+    def statistics(self):
+        """
+        :return: {event type: {stage: {'<=0.1': count, ..., '>30': count}}}
+        """
+        labels = ['<={}'.format(bucket) for bucket in self.buckets] + ['>{}'.format(self.buckets[-1])]
+        with self._lock:
+            return {event_type: {stage: dict(zip(labels, histogram)) for stage, histogram in stages.items()}
+                    for event_type, stages in self._histograms.items()}
 
-        self.__event_queue = dict()
-        self.__event_ordered_list = list()
+
+class EventMachine(object):
+    """
+        Descriptions    : Schedule the started events by the block height to handle them again. The events are kept
+                          in a heap keyed by the wake height, so only the events whose wake height is reached, or
+                          which are woken up by notification, are handled for each block.
+                          The due events are handled by worker threads. The events with the same name, that is the
+                          channel, are never handled concurrently. Settle and punishment events are deadline
+                          sensitive, so they are scheduled and handled by their own workers.
+                          The event sleeping until a deadline is kept out of the registered events until its deadline,
+                          so it's never replaced by the other events of the same channel registered in the meantime.
+    """
+    _max_idle_interval = 4      # max blocks to back off the event which makes no progress
+
+    # the event types which are handled by the urgent workers
+    _urgent_event_types = [EnumEventType.EVENT_TYPE_SETTLE, EnumEventType.EVENT_TYPE_UPDATE_SETTLE,
+                           EnumEventType.EVENT_TYPE_END_SETTLE, EnumEventType.EVENT_TYPE_END_SETTLE_UPDATE,
+                           EnumEventType.EVENT_TYPE_HTLC_UNLOCK, EnumEventType.EVENT_TYPE_PUNISH_HTLC_UNLOCK,
+                           EnumEventType.EVENT_TYPE_SETTLE_HTLC_UNLOCK,
+                           EnumEventType.EVENT_TYPE_SETTLE_HTLC_UNLOCK_UPDATE]
+    URGENT = 0
+    NORMAL = 1
+
+    def __init__(self, workers=8, urgent_workers=2, max_in_flight=32):
+        """
+
+        :param workers: worker threads to handle the normal events
+        :param urgent_workers: worker threads to handle the settle and punishment events
+        :param max_in_flight: max events being handled by the workers of each priority. The other due events are
+                              left in the schedule until some events are finished.
+        """
+        self.max_in_flight = max_in_flight
+        self.executors = {
+            self.URGENT: SerialLaneExecutor('UrgentEventWorker', urgent_workers),
+            self.NORMAL: SerialLaneExecutor('EventWorker', workers),
+        }
+        self.stage_latency = StageLatency()
+
+        self.__event_queue = dict()         # registered events: {name: event}
+        self.__wake_heaps = {priority: list() for priority in self.executors}      # [(wake height, sequence, name)]
+        self.__wake_heights = dict()        # the valid entry of each event in the heap: {name: (height, sequence)}
+        self.__ready_events = {priority: OrderedDict() for priority in self.executors} # woken up by notification
+        self.__missed_wakeups = set()       # events woken up while they are being handled
+        self.__in_flight = set()            # names of the events being handled by workers
+        self.__deferred = set()             # events due while another event of the same name is being handled
+        self.__sleeping_events = list()     # events waiting for their deadline: [(wake height, sequence, name, event)]
 
         self.event_lock = Lock()
-        self.total_task_per_poll = 0
+        self.__sequence = 0
+        self.__block_height = 0
+        self.__receipt_height = None
+
+    def handle(self, block_height):
+        """
+        Description: dispatch the events which are ready or due at the block height to the workers
+        :param block_height:
+        :return:
+        """
+        self.__block_height = block_height
+        if self.__receipt_height != block_height:
+            self.__receipt_height = block_height
+            self.update_transaction_receipts(block_height)
 
-    @ucoro(0.1, True)
-    def __coroutine_handler(self, block_height:int, **kwargs):
-        event_name, current_event = self.get_event()
+        self.wake_sleeping_events(block_height)
+
+        for priority, executor in sorted(self.executors.items()):
+            while executor.depth < self.max_in_flight:
+                event_name, current_event = self.get_event(priority)
+                if not current_event:
+                    break
+
+                executor.submit(event_name, partial(self.handle_event, block_height, event_name, current_event),
+                                label=current_event.event_type_name)
+
+    def handle_event(self, block_height, event_name, current_event):
+        try:
+            self.__handle_stages(block_height, event_name, current_event)
+        except Exception as error:
+            LOG.exception('Event<{}> handled at block-{} with error: {}'.format(event_name, block_height, error))
+            self.insert_event_back_into_queue(event_name, current_event)
+
+    def __handle_stages(self, block_height, event_name, current_event):
+        initial_stage = current_event.event_stage
         old_stage = EnumEventAction.EVENT_INIT
 
         # execute the event method according to the event stage
         while current_event.stage_is_changed(old_stage):
             old_stage = current_event.event_stage
-            current_event.handle(block_height)
-
-        if not self.is_event_completed(current_event.event_stage):
-            # insert the event back into the queue
-            self.insert_event_back_into_queue(event_name, current_event)
+            start_time = time.time()
+            try:
+                current_event.handle(block_height)
+            finally:
+                self.stage_latency.record(current_event.event_type_name, old_stage.name, time.time() - start_time)
 
         # to judge whether current event is timeout or not
-        if block_height > current_event.event_timeout:
+        if current_event.is_overdue(block_height):
             # set the event timeout
             current_event.set_timeout_stage()
 
-    def coro_grouper(self, block_height):
-        while True:
-            yield from self.__coroutine_handler(block_height)
+        if self.is_event_completed(current_event.event_stage):
+            # the wakeups missed by the completed event are dropped
+            with self.event_lock:
+                self.__release(event_name)
+                self.__missed_wakeups.discard(event_name)
+            return
 
-    def handle(self, block_height):
-        if self.is_queue_empty() or self.is_polling_finished:
-            return None
-        max_task = min(self._coro_number, len(self.__event_ordered_list))
-        self.total_task_per_poll += max_task
+        # the event is woken up once its transactions are confirmed or dropped
+        self.watch_transactions(event_name, current_event)
 
-        for task_idx in range(max_task):
-            coro = self.coro_grouper(block_height)
-            next(coro)
-            coro.send(block_height)
+        # insert the event back into the queue
+        is_idle = current_event.event_stage == initial_stage and not current_event.is_overdue(block_height)
+        wake_height = current_event.next_wake_height(block_height, is_idle, self._max_idle_interval)
+        self.insert_event_back_into_queue(event_name, current_event, wake_height)
 
-        pass
+    def stop(self, timeout=None):
+        for executor in self.executors.values():
+            executor.stop(timeout)
 
     @property
     def is_polling_finished(self):
-        return self.total_task_per_poll >= len(self.__event_ordered_list)
-
-    def reset_polling(self):
-        if self.is_polling_finished:
-            self.total_task_per_poll = 0
+        """
+        :return: True if no event is ready or due at the block height handled last time
+        """
+        with self.event_lock:
+            return not any(self.__ready_events[priority] or self.__peek_due_event(priority, self.__block_height)
+                           for priority in self.executors)
 
-    def get_event(self):
+    @staticmethod
+    def update_transaction_receipts(block_height):
+        """
+        Description: check the transactions sent by all events by one batch request, and the events whose
+                     transactions are confirmed or dropped are woken up.
+        :param block_height:
+        :return:
+        """
         try:
-            self.event_lock.acquire()
-            name = self.__event_ordered_list.pop(0)
-            event = self.__event_queue.pop(name)
+            ContractEventInterface.update_transaction_receipts(block_height)
         except Exception as error:
-            name = None
-            event = None
-            LOG.exception('event machine get_event exception: {}'.format(error))
-        finally:
-            self.event_lock.release()
+            LOG.exception('event machine update_transaction_receipts exception: {}'.format(error))
+
+    def watch_transactions(self, name, event):
+        """
+        Description: the events keep the ids of the confirmed transactions after moving to next stage, so only the
+                     pending transactions are watched. Otherwise the event is woken up again by each handling.
+        :param name: event name
+        :param event: event instance
+        :return:
+        """
+        for tx_id in event.transaction_ids:
+            state, _ = ContractEventInterface.get_watched_transaction_receipt(tx_id)
+            if state in [EnumReceiptState.PENDING, EnumReceiptState.UNKNOWN]:
+                ContractEventInterface.watch_transaction(tx_id, partial(self.__wake_on_receipt, name), key=name)
+
+    def __wake_on_receipt(self, name, tx_id, state, receipt):
+        LOG.debug('Transaction {} of event<{}> is {}'.format(tx_id, name, state.name))
+        self.wake_event(name)
+
+    def reset_polling(self):
+        # the due events are found by the wake height, nothing need be reset for the new block
+        pass
+
+    def priority_of(self, event):
+        return self.URGENT if event.event_type in self._urgent_event_types else self.NORMAL
+
+    def get_event(self, priority=NORMAL):
+        """
+        Description: pop the event woken up by notification first, then the event due at current block height.
+                     The event is deferred if another event of the same name is being handled by the workers of
+                     either priority, and it's ready again once that one is finished.
+        :param priority: URGENT or NORMAL
+        :return: event name, event
+        """
+        with self.event_lock:
+            ready_events = self.__ready_events[priority]
+            while True:
+                if ready_events:
+                    name, _ = ready_events.popitem(last=False)
+                else:
+                    name = self.__peek_due_event(priority, self.__block_height)
+                    if name is None:
+                        return None, None
+                    heapq.heappop(self.__wake_heaps[priority])
 
-        return name, event
+                self.__wake_heights.pop(name, None)
+                if name in self.__in_flight:
+                    self.__deferred.add(name)
+                    continue
+
+                event = self.__event_queue.pop(name, None)
+                if event is None:
+                    # stale entry of the event which is unregistered
+                    continue
+
+                self.__in_flight.add(name)
+                return name, event
 
     def get_registered_event(self, name):
         return self.__event_queue.get(name)
 
-    def insert_event_back_into_queue(self, name, event):
-        try:
-            self.event_lock.acquire()
+    def insert_event_back_into_queue(self, name, event, wake_height=None):
+        with self.event_lock:
+            self.__release(name)
             if not self.has_event(name):
                 self.__event_queue.update({name: event})
-                self.__event_ordered_list.append(name)
-        except Exception as error:
-            LOG.exception('event machine insert_event_back_into_queue<{}> exception: {}'.format(name, error))
-        finally:
-            self.event_lock.release()
+                self.__schedule(name, event, wake_height if wake_height else self.__block_height + 1)
 
-        return
+                if name in self.__missed_wakeups:
+                    self.__missed_wakeups.discard(name)
+                    self.__ready_events[self.priority_of(event)][name] = True
 
     def register_event(self, name, event):
-        try:
-            self.event_lock.acquire()
+        with self.event_lock:
             self.__event_queue.update({name: event})
-        except Exception as error:
-            LOG.exception('event machine register_event<{}> exception: {}'.format(name, error))
-        finally:
-            self.event_lock.release()
 
-    def unregister_event(self, name):
-        try:
-            self.event_lock.acquire()
-            if name in self.__event_ordered_list:
-                self.__event_ordered_list.remove(name)
+    def schedule_event(self, name, event):
+        """
+        Description: register the event which is handled at the block height it sleeps until, such as the settlement
+                     which couldn't be done before the deadline. It's handled at next block if it doesn't sleep.
+        :param name: event name
+        :param event: event instance
+        :return:
+        """
+        with self.event_lock:
+            if event.wake_height and event.wake_height > self.__block_height:
+                self.__sequence += 1
+                heapq.heappush(self.__sleeping_events, (event.wake_height, self.__sequence, name, event))
+                return
 
-            if name in self.__event_queue.keys():
-                self.__event_queue.pop(name)
-        except Exception as error:
-            LOG.exception('event machine unregister_event<{}> exception: {}'.format(name, error))
-        finally:
-            self.event_lock.release()
+            self.__event_queue.update({name: event})
+            self.__schedule(name, event, self.__block_height + 1)
+
+    def wake_sleeping_events(self, block_height):
+        """
+        Description: register the sleeping events whose deadline is reached. The event keeps sleeping while another
+                     event of the same channel is registered or being handled.
+        :param block_height:
+        :return:
+        """
+        with self.event_lock:
+            waiting = []
+            while self.__sleeping_events and self.__sleeping_events[0][0] <= block_height:
+                item = heapq.heappop(self.__sleeping_events)
+                _, _, name, event = item
+                if self.has_event(name) or name in self.__in_flight:
+                    waiting.append(item)
+                    continue
+
+                self.__event_queue.update({name: event})
+                self.__schedule(name, event, block_height)
+
+            for item in waiting:
+                heapq.heappush(self.__sleeping_events, item)
+
+    def unregister_event(self, name):
+        with self.event_lock:
+            self.__wake_heights.pop(name, None)
+            for ready_events in self.__ready_events.values():
+                ready_events.pop(name, None)
+            self.__missed_wakeups.discard(name)
+            self.__deferred.discard(name)
+            self.__event_queue.pop(name, None)
 
     def update_event(self, name, event):
         self.register_event(name, event)
 
     def trigger_start_event(self, name):
-        try:
-            self.event_lock.acquire()
-            if name not in self.__event_ordered_list:
-                self.__event_ordered_list.append(name)
-        except Exception as error:
-            LOG.exception('event machine trigger_start_event<{}> exception: {}'.format(name, error))
-        finally:
-            self.event_lock.release()
+        self.wake_event(name)
+
+    def wake_event(self, name):
+        """
+        Description: handle the event as soon as possible, such as its transaction is confirmed
+        :param name: event name
+        :return:
+        """
+        with self.event_lock:
+            event = self.__event_queue.get(name)
+            if event:
+                self.__ready_events[self.priority_of(event)][name] = True
+            elif name in self.__in_flight:
+                # handle it again once it's inserted back
+                self.__missed_wakeups.add(name)
 
     def has_event(self, name):
         return name in self.__event_queue
@@ -385,7 +628,72 @@ class EventMachine(object):
         return stage in [EnumEventAction.EVENT_COMPLETE, EnumEventAction.EVENT_ERROR]
 
     def is_queue_empty(self):
-        return 0 == len(self.__event_ordered_list)
-
+        with self.event_lock:
+            return not (self.__wake_heights or any(self.__ready_events.values()) or self.__sleeping_events)
 
-event_machine = EventMachine()
+    @property
+    def statistics(self):
+        """
+        :return: counts of the events. Pending: waiting for the wake height; ready: woken up by notification or due at
+                 current block height; overdue: timeout but not handled yet; sleeping: waiting for the deadline to be
+                 registered; in_flight: being handled by workers. And the latency of each stage of each event type.
+        """
+        with self.event_lock:
+            block_height = self.__block_height
+            ready = set(name for name in self.__event_queue if self.__is_ready(name))
+            ready.update(name for name in self.__wake_heights if self.__is_due(name, block_height))
+            overdue = [name for name in ready
+                       if name in self.__event_queue and self.__event_queue[name].is_overdue(block_height)]
+
+            statistics = {
+                'registered': len(self.__event_queue),
+                'pending': len(set(self.__wake_heights) - ready),
+                'ready': len(ready),
+                'overdue': len(overdue),
+                'sleeping': len(self.__sleeping_events),
+            }
+
+        statistics.update({
+            'in_flight': sum(executor.depth for executor in self.executors.values()),
+            'stage_latency': self.stage_latency.statistics,
+        })
+        return statistics
+
+    def __release(self, name):
+        # the event registered while the event of the same name was being handled is ready now
+        self.__in_flight.discard(name)
+        if name in self.__deferred:
+            self.__deferred.discard(name)
+            event = self.__event_queue.get(name)
+            if event:
+                self.__ready_events[self.priority_of(event)][name] = True
+
+    def __schedule(self, name, event, wake_height):
+        self.__sequence += 1
+        self.__wake_heights[name] = (wake_height, self.__sequence)
+        heapq.heappush(self.__wake_heaps[self.priority_of(event)], (wake_height, self.__sequence, name))
+
+    def __is_ready(self, name):
+        return any(name in ready_events for ready_events in self.__ready_events.values())
+
+    def __is_due(self, name, block_height):
+        scheduled = self.__wake_heights.get(name)
+        return scheduled is not None and scheduled[0] <= block_height
+
+    def __peek_due_event(self, priority, block_height):
+        # drop the stale entries of the events which are rescheduled, woken up or unregistered
+        wake_heap = self.__wake_heaps[priority]
+        while wake_heap:
+            wake_height, sequence, name = wake_heap[0]
+            if self.__wake_heights.get(name) != (wake_height, sequence):
+                heapq.heappop(wake_heap)
+                continue
+
+            return name if wake_height <= block_height else None
+
+        return None
+
+
+_engine_config = Configure.get('EventEngine', {})
+event_machine = EventMachine(_engine_config.get('Workers', 8), _engine_config.get('UrgentWorkers', 2),
+                             _engine_config.get('MaxInFlight', 32))
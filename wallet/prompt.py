@@ -26,8 +26,9 @@ from wallet.transaction.payment import Payment, PaymentLink
 from wallet.transaction.rsmc import RsmcMessage, RsmcResponsesMessage
 from wallet.transaction.htlc import HtlcMessage, HtlcResponsesMessage, RResponse, RResponseAck
 from wallet.transaction.settle import SettleMessage, SettleResponseMessage
+from wallet.transaction.message import message_registry
 from wallet.Interface.rpc_interface import RpcInteraceApi,CurrentLiveWallet
-from wallet.event.event import EnumEventAction
+from wallet.event.event import EnumEventAction, event_machine
 from wallet.event.chain_event import event_init_wallet
 from wallet.event.offchain_event import ChannelForceSettleEvent, ChannelHtlcUnlockEvent
 from wallet.connection.websocket import ws_instance
@@ -35,15 +36,17 @@ from wallet.utils import get_magic, DepositAuth
 from twisted.web.server import Site
 from lightwallet.prompt import PromptInterface
 
-from wallet.Interface.rpc_interface import MessageList
+from wallet.Interface.dispatcher import message_dispatcher
 import time
+from model import provision_indexes, migrate_legacy_trades, UnitOfWork
 from model.base_enum import EnumChannelState
+from model.statistics_model import APIStatistics
 from wallet.Interface import gate_way
 from blockchain.interface import get_block_count
 from blockchain.monitor import monitorblock,EventMonitor
 import requests
 import qrcode_terminal
-from trinity import Configure
+from trinity import Configure, DATABASE_CONFIG
 
 
 GateWayIP = Configure.get("GatewayIP")
@@ -213,6 +216,7 @@ class UserPromptInterface(PromptInterface):
     def do_close_wallet(self):
         if self.Wallet:
             self.Wallet.SaveStoredData("BlockHeight", self.Wallet.BlockHeight)
+            EventMonitor.stop_log_indexer()
             try:
                 gate_way.close_wallet()
             except Exception as e:
@@ -224,6 +228,10 @@ class UserPromptInterface(PromptInterface):
         self.go_on = False
         ws_instance.stop_websocket()
         EventMonitor.stop_monitor()
+        event_machine.stop(timeout=5)
+        message_dispatcher.stop(timeout=5)
+        gate_way.message_sender.stop(timeout=5)
+        APIStatistics.flush_statistics(timeout=5)
         self.do_close_wallet()
         CurrentLiveWallet.update_current_wallet(None)
         reactor.stop()
@@ -386,7 +394,7 @@ class UserPromptInterface(PromptInterface):
                 return None
 
         # query channels by address
-        channel_set = Channel.get_channel(self.Wallet.url, receiver, EnumChannelState.OPENED)
+        channel_set = Channel.get_channel(self.Wallet.url, receiver, EnumChannelState.OPENED, profile='summary')
         if channel_set and channel_set[0]:
             Channel.transfer(channel_set[0].channel, self.Wallet, receiver, asset_type, count,
                              cli=True, comments=hashcode, trigger=RsmcMessage.create)
@@ -434,7 +442,7 @@ class UserPromptInterface(PromptInterface):
             count = int(count) + fee
             fee = fee/pow(10, 8)
             receiver = full_path[1][0]
-            channel_set = Channel.get_channel(self.Wallet.url, receiver, EnumChannelState.OPENED)
+            channel_set = Channel.get_channel(self.Wallet.url, receiver, EnumChannelState.OPENED, profile='summary')
             if not(channel_set and channel_set[0]):
                 print('No OPENED channel was found for HTLC trade.')
                 return
@@ -687,15 +695,11 @@ class UserPromptInterface(PromptInterface):
         console_log.warn("Channel Function Can Not be Opened at Present, You can try again via channel enable")
         return False
 
-    def handlemaessage(self):
-        while self.go_on:
-            if MessageList:
-                message = MessageList.pop(0)
-                try:
-                    self._handlemessage(message[0])
-                except Exception as e:
-                    LOG.error("handle message error {} {}".format(json.dumps(message), str(e)))
-            time.sleep(0.1)
+    def handlemaessage(self, message):
+        # the writes to the database during handling the message are flushed together.
+        # The failure is logged by the dispatcher with the channel and message type
+        with UnitOfWork(DATABASE_CONFIG.get('group_commit_window', 0)):
+            return self._handlemessage(message)
 
     def _handlemessage(self,message):
         LOG.info("Handle Message: <---- {}".format(json.dumps(message)))
@@ -705,52 +709,10 @@ class UserPromptInterface(PromptInterface):
             message_type = message.get("MessageType")
         except AttributeError:
             return "Error Message"
-        if message_type  == "Founder":
-            m_instance = FounderMessage(message, self.Wallet)
-
-        elif message_type in [ "FounderSign" ,"FounderFail"]:
-            m_instance = FounderResponsesMessage(message, self.Wallet)
-
-        elif message_type == "Htlc":
-            m_instance = HtlcMessage(message, self.Wallet)
-
-        elif message_type in ["HtlcSign", "HtlcFail"]:
-            m_instance = HtlcResponsesMessage(message, self.Wallet)
-
-        elif message_type == "Rsmc":
-            m_instance = RsmcMessage(message, self.Wallet)
-
-        elif message_type in ["RsmcSign", "RsmcFail"]:
-            m_instance = RsmcResponsesMessage(message, self.Wallet)
-
-        elif message_type == "Settle":
-            m_instance = SettleMessage(message, self.Wallet)
-
-        elif message_type in ["SettleSign","SettleFail"]:
-            m_instance = SettleResponseMessage(message, self.Wallet)
-
-        elif message_type == "RResponseAck":
-            m_instance = RResponseAck(message,self.Wallet)
-
-        elif message_type  == "RResponse":
-            m_instance = RResponse(message, self.Wallet)
-
-        # elif message_type == "RegisterChannel":
-        #     m_instance = RegisterMessage(message, self.Wallet)
-        #
-        # elif message_type == "CreateTranscation":
-        #     m_instance = CreateTranscation(message, self.Wallet)
-        #
-        # elif message_type == "TestMessage":
-        #     m_instance = TestMessage(message, self.Wallet)
-
-        elif message_type == "PaymentLink":
-            m_instance = PaymentLink(message)
-
-        else:
+        if message_type not in message_registry:
             return "No Support Message Type "
 
-        return m_instance.handle_message()
+        return message_registry.call(message_type, message, self.Wallet)
 
 
 def main():
@@ -776,6 +738,20 @@ def main():
     port = Configure.get("NetPort")
     init_logger(wallet_port=port, file_name='wallet.log')
 
+    try:
+        provision_indexes()
+    except Exception as error:
+        LOG.error('Failed to provision the database indexes. Exception: {}'.format(error))
+
+    try:
+        migrate_legacy_trades()
+    except Exception as error:
+        # the channels would look like having no trades without the migration
+        LOG.exception('Failed to migrate the trades of the old version. Exception: {}'.format(error))
+        console_log.error('Failed to migrate the trades of the old version, run "python -m model.migration" '
+                          'before starting the wallet. Exception: {}'.format(error))
+        sys.exit(1)
+
     UserPrompt = UserPromptInterface()
     address = Configure.get("RpcListenAddress")
     address = address if address else "0.0.0.0"
@@ -795,7 +771,7 @@ def main():
 
     reactor.suggestThreadPoolSize(15)
     reactor.callInThread(UserPrompt.run)
-    reactor.callInThread(UserPrompt.handlemaessage)
+    message_dispatcher.register_handler(UserPrompt.handlemaessage)
     reactor.callInThread(monitorblock)
     reactor.callInThread(ws_instance.handle)
     reactor.run()
@@ -22,7 +22,7 @@ AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
 LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE."""
-from .message import Message
+from .message import Message, register_message
 from .response import EnumResponseStatus
 
 from common.log import LOG
@@ -128,6 +128,7 @@ class FounderBase(Message):
         return
 
 
+@register_message('Founder')
 class FounderMessage(FounderBase):
     """
     {
@@ -256,6 +257,7 @@ class FounderMessage(FounderBase):
         return
 
 
+@register_message('FounderSign', 'FounderFail')
 class FounderResponsesMessage(FounderBase):
     """
     {
@@ -22,7 +22,7 @@ AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
 LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE."""
-from .message import TransactionBase
+from .message import TransactionBase, register_message
 from .response import EnumResponseStatus
 from .rsmc import RsmcMessage
 from wallet.channel import Payment
@@ -41,6 +41,7 @@ import json
 from model.statistics_model import APIStatistics
 
 
+@register_message('RResponse')
 class RResponse(TransactionBase):
     """
     { "MessageType":"RResponse",
@@ -189,6 +190,7 @@ class RResponse(TransactionBase):
             LOG.error('Failed to notify RCode<{}> to peer<{}>'.format(self.rcode, peer))
 
 
+@register_message('RResponseAck')
 class RResponseAck(TransactionBase):
     """
      { "MessageType":"RResponseAck",
@@ -362,6 +364,7 @@ class HtlcBase(TransactionBase):
             return 0
 
 
+@register_message('Htlc')
 class HtlcMessage(HtlcBase):
     """
     { "MessageType":"Htlc",
@@ -601,6 +604,7 @@ class HtlcMessage(HtlcBase):
         return None
 
 
+@register_message('HtlcSign', 'HtlcFail')
 class HtlcResponsesMessage(HtlcBase):
     """
     { "MessageType":"HtlcGSign",
@@ -895,7 +899,8 @@ class HtlcResponsesMessage(HtlcBase):
                 )
 
             # to get channel between current wallet and next jump
-            channel_set = Channel.get_channel(self.wallet.url, next_router, state=EnumChannelState.OPENED)
+            channel_set = Channel.get_channel(self.wallet.url, next_router, state=EnumChannelState.OPENED,
+                                              profile='summary')
             if not (channel_set and channel_set[0]):
                 raise GoTo(EnumResponseStatus.RESPONSE_CHANNEL_NOT_FOUND,
                            'No OPENED channel is found between {} and {}.'.format(self.wallet.url, next_router))
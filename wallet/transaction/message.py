@@ -29,14 +29,32 @@ from wallet.utils import get_magic
 from common.common import uri_parser
 from common.log import LOG
 from common.exceptions import GoTo
+from common.registry import HandlerRegistry
 from wallet.channel import Channel, EnumTradeType, EnumTradeState, EnumTradeRole, Payment
-from wallet.Interface.gate_way import send_message
+from wallet.Interface.gate_way import send_message_async
 from .response import EnumResponseStatus
 from trinity import IS_SUPPORTED_ASSET_TYPE
 from wallet.event import event_machine
 from wallet.event.contract_event import ContractEventInterface
 from common.number import TrinityNumber
 
+# handlers of the received transaction messages
+message_registry = HandlerRegistry('TransactionMessage')
+
+
+def register_message(*message_types):
+    """
+    Description: class decorator to handle the message types by the message class
+    :param message_types: value of 'MessageType' in the message
+    :return:
+    """
+    def wrapper(cls):
+        for message_type in message_types:
+            message_registry.add(message_type, cls.handle_received)
+        return cls
+    return wrapper
+
+
 class MessageHeader(object):
     """
         Message header is used for event transaction.
@@ -116,13 +134,17 @@ class Message(object):
 
     @staticmethod
     def send(message):
-        send_message(message)
+        send_message_async(message)
 
     @staticmethod
     def create_message_header(sender:str, receiver:str, message_type:str, channel_name:str, asset_type:str, nonce:int,
                               nego_nonce=None):
         return MessageHeader(sender, receiver, message_type, channel_name, asset_type, nonce, nego_nonce).message_header
 
+    @classmethod
+    def handle_received(cls, message, wallet):
+        return cls(message, wallet).handle_message()
+
     def handle(self):
         LOG.info('Received Message<{}> from<{}> by channel<{}>'.format(self.message_type,
                                                                        self.sender_address,
@@ -321,7 +343,7 @@ class Message(object):
         """
         try:
             # get channel if trade has already existed
-            channel_set = Channel.query_channel(channel_name)[0]
+            channel_set = Channel.query_channel(channel_name, profile='balance')[0]
             expected_balance = int(channel_set.balance.get(address).get(asset_type))
             expected_peer_balance = int(channel_set.balance.get(peer_address).get(asset_type))
 
@@ -394,6 +416,7 @@ class TransactionBase(Message):
     """
     _htlc_sign_type_list = ['bytes32', 'address', 'address', 'uint256', 'uint256', 'bytes32']
     _rsmc_sign_type_list = ['bytes32', 'uint256', 'address', 'uint256', 'address', 'uint256', 'bytes32', 'bytes32']
+    _balance_update_retries = 3    # times to retry the balance update if it is changed concurrently
 
     def get_payer_and_payee_address(self):
         """"""
@@ -455,56 +478,72 @@ class TransactionBase(Message):
     def update_balance_for_channel(cls, channel_name, asset_type, payer_address, payee_address, payment,
                                    is_hlock_to_rsmc=False, is_htlc_type=False):
         """
-
+        Description: update the balance and hlock of the channel by one compare-and-set round trip. If the balance is
+                     changed by other trades in the meantime, the new values are calculated again and retried.
         :param channel_name:
         :param payer_address:
         :param payee_address:
         :param asset_type:
         :param payment:
         :param is_hlock_to_rsmc:
-        :return:
-        """
-        channel = Channel(channel_name)
+        :return: the channel after updated
+        """
+        asset_type = asset_type.upper()
+        for _ in range(cls._balance_update_retries):
+            try:
+                channel = Channel(channel_name)
+                channel_balance = channel.balance
+                channel_hlock = channel.hlock
+
+                # calculate the left balance
+                payer_balance = channel_balance.get(payer_address).get(asset_type)
+                payee_balance = channel_balance.get(payee_address).get(asset_type)
+                payer_hlock = channel_hlock.get(payer_address, {}).get(asset_type)
+
+                balance_field = 'balance.{}.{}'
+                hlock_field = 'hlock.{}.{}'.format(payer_address, asset_type)
+                expected = {balance_field.format(payer_address, asset_type): payer_balance,
+                            balance_field.format(payee_address, asset_type): payee_balance}
+                if is_hlock_to_rsmc or is_htlc_type:
+                    expected.update({hlock_field: payer_hlock})
+
+                changes = {}
+                if is_hlock_to_rsmc:
+                    payer_hlock = cls.big_number_calculate(payer_hlock, payment, False)
+                    if 0 > payer_hlock:
+                        raise GoTo(EnumResponseStatus.RESPONSE_TRADE_LOCKED_ASSET_LESS_THAN_PAYMENT,
+                                   'Why here? Payment<{}> should less than locked asset'.format(payment))
+                    changes.update({hlock_field: str(payer_hlock)})
+                    payee_balance = cls.big_number_calculate(payee_balance, payment)
+                elif is_htlc_type:
+                    payer_hlock = cls.big_number_calculate(payer_hlock, payment)
+                    changes.update({hlock_field: str(payer_hlock)})
+                    payer_balance = cls.big_number_calculate(payer_balance, payment, False)
+                else:
+                    payer_balance = cls.big_number_calculate(payer_balance, payment, False)
+                    payee_balance = cls.big_number_calculate(payee_balance, payment)
 
-        try:
-            asset_type = asset_type.upper()
-            channel_balance = channel.balance
-            channel_hlock = channel.hlock
-
-            # calculate the left balance
-            payer_balance = channel_balance.get(payer_address).get(asset_type)
-            payee_balance = channel_balance.get(payee_address).get(asset_type)
-
-            if is_hlock_to_rsmc:
-                payer_hlock = channel_hlock.get(payer_address).get(asset_type)
-                payer_hlock = cls.big_number_calculate(payer_hlock, payment, False)
-                if 0 > payer_hlock:
-                    raise GoTo(EnumResponseStatus.RESPONSE_TRADE_LOCKED_ASSET_LESS_THAN_PAYMENT,
-                               'Why here? Payment<{}> should less than locked asset'.format(payment))
-                channel_hlock.update({payer_address: {asset_type: str(payer_hlock)}})
-                payee_balance = cls.big_number_calculate(payee_balance, payment)
-            elif is_htlc_type:
-                payer_hlock = channel_hlock.get(payer_address).get(asset_type)
-                payer_hlock = cls.big_number_calculate(payer_hlock, payment)
-                channel_hlock.update({payer_address: {asset_type: str(payer_hlock)}})
-                payer_balance = cls.big_number_calculate(payer_balance, payment, False)
-            else:
-                payer_balance = cls.big_number_calculate(payer_balance, payment, False)
-                payee_balance = cls.big_number_calculate(payee_balance, payment)
-
-            if int(payer_balance) >= 0 and int(payee_balance) >= 0:
-                Channel.update_channel(channel_name,
-                                       balance={payer_address: {asset_type: str(payer_balance)},
-                                                payee_address: {asset_type: str(payee_balance)}},
-                                       hlock=channel_hlock)
-            else:
-                raise GoTo(EnumResponseStatus.RESPONSE_TRADE_NO_ENOUGH_BALANCE_FOR_PAYMENT,
-                           'Payer has not enough balance for this payment<{}>'.format(payment))
+                if int(payer_balance) < 0 or int(payee_balance) < 0:
+                    raise GoTo(EnumResponseStatus.RESPONSE_TRADE_NO_ENOUGH_BALANCE_FOR_PAYMENT,
+                               'Payer has not enough balance for this payment<{}>'.format(payment))
 
-        except Exception as error:
-            raise GoTo(EnumResponseStatus.RESPONSE_TRADE_BALANCE_UPDATE_FAILED,
-                       'Update channel<{}> balance error. payment<{}>. Exception: {}'.format(channel_name,
-                                                                                             payment, error))
+                changes.update({balance_field.format(payer_address, asset_type): str(payer_balance),
+                                balance_field.format(payee_address, asset_type): str(payee_balance)})
+
+                channel = Channel.compare_and_set_channel(channel_name, expected, changes)
+            except Exception as error:
+                raise GoTo(EnumResponseStatus.RESPONSE_TRADE_BALANCE_UPDATE_FAILED,
+                           'Update channel<{}> balance error. payment<{}>. Exception: {}'.format(channel_name,
+                                                                                                 payment, error))
+
+            if channel:
+                return channel
+
+            LOG.warning('Balance of channel<{}> was changed by others. Retry to update it.'.format(channel_name))
+
+        raise GoTo(EnumResponseStatus.RESPONSE_TRADE_BALANCE_UPDATE_FAILED,
+                   'Update channel<{}> balance error. payment<{}>. Balance is changed concurrently'.format(channel_name,
+                                                                                                         payment))
 
     @classmethod
     def big_number_calculate(cls, balance, payment, add=True):
@@ -814,7 +853,7 @@ class TransactionBase(Message):
         :return:
         """
         # to validate the negotiated nonce
-        valid_trade, valid_nonce = Channel.latest_valid_trade(self.channel_name)
+        valid_trade, valid_nonce = Channel.latest_valid_trade(self.channel_name, profile='nonce_state')
 
         nonce = self.nego_nonce or self.nonce
         if valid_nonce and valid_nonce+1 == nonce:
@@ -22,7 +22,7 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE."""
 from common.log import LOG
-from .message import Message
+from .message import Message, register_message
 from .response import EnumResponseStatus
 from wallet.channel import Channel, Payment
 from wallet.channel.trade import EnumTradeState
@@ -56,6 +56,7 @@ class PaymentAck(Message):
         Message.send(message)
 
 
+@register_message('PaymentLink')
 class PaymentLink(Message):
     """
     {
@@ -67,7 +68,7 @@ class PaymentLink(Message):
     }"""
     _message_name = 'PaymentLink'
 
-    def __init__(self, message):
+    def __init__(self, message, wallet=None):
         super(PaymentLink, self).__init__(message)
 
         self.payment = self.message_body.get('PaymentCount')
@@ -22,7 +22,7 @@ AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
 LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE."""
-from .message import TransactionBase
+from .message import TransactionBase, register_message
 from .response import EnumResponseStatus
 from .payment import PaymentAck
 
@@ -113,6 +113,7 @@ class RsmcBase(TransactionBase):
 
         return
 
+@register_message('Rsmc')
 class RsmcMessage(RsmcBase):
     """
     {
@@ -308,6 +309,7 @@ class RsmcMessage(RsmcBase):
         return None
 
 
+@register_message('RsmcSign', 'RsmcFail')
 class RsmcResponsesMessage(RsmcBase):
     """
     message = {
@@ -22,7 +22,7 @@ AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
 LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE."""
-from .message import Message
+from .message import Message, register_message
 from .response import EnumResponseStatus
 
 from common.log import LOG
@@ -115,6 +115,7 @@ class SettleBase(Message):
                 Channel.update_trade(channel_name, nonce, **kwargs)
 
 
+@register_message('Settle')
 class SettleMessage(SettleBase):
     """
     {
@@ -225,6 +226,7 @@ class SettleMessage(SettleBase):
         return
 
 
+@register_message('SettleSign', 'SettleFail')
 class SettleResponseMessage(SettleBase):
     """
     {
@@ -23,7 +23,7 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE."""
 
 from trinity import Configure
-from blockchain.interface import get_balance
+from blockchain.interface import get_balance, get_balances
 import re
 import hashlib
 from common.log import LOG
@@ -267,12 +267,7 @@ def get_wallet_info(wallet):
     :param wallet:
     :return: message dict
     """
-    balance = {}
-    # for i in Configure["AssetType"].keys():
-    #     b = get_balance(wallet.address, i.upper(), settings.TNC, settings.TNC)
-    #     balance[i] = b
-    balance["ETH"] = wallet.eth_balance
-    balance["TNC"] = wallet.tnc_balance
+    balance = get_balances(wallet.address, ["ETH", "TNC"])
     message = {
                    "Publickey": wallet.address,
                     "alias": Configure["alias"],